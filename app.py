@@ -8,8 +8,9 @@ import json # For CSS if loaded from JSON, or for debugging
 
 # Import from your new modules
 from utils import load_config, export_to_word, export_to_pdf, remove_problematic_chars
-from document_processing import process_rfp
+from extraction_cache import extract_uploaded_text
 from knowledge_base import ProposalKnowledgeBase #, HierarchicalEmbeddingModel (if instantiated directly here)
+from kb_registry import acquire_knowledge_base
 from generation_engine import EnhancedProposalGenerator, SpecialistRAGDrafter
 
 # Potentially other UI specific imports like pandas, matplotlib, plotly if visualizations are generated directly in app.py
@@ -734,7 +735,9 @@ input[type="radio"] {
         try:
             kb_dir = st.session_state.config["knowledge_base"]["directory"]
             embedding_model_name = st.session_state.config["knowledge_base"]["embedding_model"]
-            st.session_state.knowledge_base = ProposalKnowledgeBase(kb_dir, embedding_model_name)
+            # Shared by every session in this process (see kb_registry.py): one model, one index in RAM
+            st.session_state.kb_lease = acquire_knowledge_base(kb_dir, embedding_model_name, st.session_state.config["knowledge_base"])
+            st.session_state.knowledge_base = st.session_state.kb_lease.kb
         except Exception as e:
             st.error(f"Failed to initialize knowledge base: {str(e)}")
             st.session_state.knowledge_base = None
@@ -806,6 +809,21 @@ input[type="radio"] {
             st.warning("Scoring system weights not found in config. Using default weights.")
 
 
+    # Knowledge base status; a rebuild runs in the background and searches keep using
+    # the current snapshot until the new one is swapped in
+    if st.session_state.knowledge_base is not None:
+        with st.sidebar:
+            kb_holder = st.session_state.knowledge_base
+            status = kb_holder.rebuild_status
+            st.caption(f"Knowledge base snapshot {kb_holder.snapshot_id}: {len(kb_holder.file_hashes)} proposals")
+            if kb_holder.rebuilding:
+                st.info("Rebuilding knowledge base in the background...")
+            elif status["state"] == "failed":
+                st.error(f"Last knowledge base rebuild failed: {status['error']}")
+            if st.button("Rebuild knowledge base", disabled=kb_holder.rebuilding):
+                kb_holder.refresh()
+                st.rerun()
+
     # --- MODIFIED HEADER SECTION ---
     with st.container():
         col_title_1, col_title_2 = st.columns([1, 6]) # Adjust ratio as needed e.g. [1,5] or [1,7]
@@ -847,17 +865,9 @@ input[type="radio"] {
             uploaded_file = st.file_uploader("Upload RFP Document", type=["docx", "pdf", "txt", "md"])
 
             if uploaded_file is not None:
-                temp_file_path = ""
                 try:
-                    file_extension = os.path.splitext(uploaded_file.name)[1]
-                    if not file_extension:
-                        file_extension = ".tmp"
-                    
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file_obj:
-                        temp_file_obj.write(uploaded_file.getvalue())
-                        temp_file_path = temp_file_obj.name
-                    
-                    rfp_text = process_rfp(temp_file_path)
+                    # Runs on every rerun; only the first one for these bytes actually parses the file
+                    rfp_text = extract_uploaded_text(uploaded_file, st.session_state.config)
                     st.session_state.rfp_text = rfp_text
                     st.success(f"Successfully processed {uploaded_file.name}")
 
@@ -866,9 +876,6 @@ input[type="radio"] {
 
                 except Exception as e:
                     st.error(f"Error processing file: {str(e)}")
-                finally:
-                    if temp_file_path and os.path.exists(temp_file_path):
-                        os.unlink(temp_file_path)
 
         with col2_tab:
             st.markdown('<div class="info-box">', unsafe_allow_html=True)
@@ -953,18 +960,9 @@ input[type="radio"] {
             
             # Only process if it's a new file or file has changed
             if st.session_state.tab2_current_file != current_file_info:
-                temp_file_path = ""
                 try:
-                    file_extension = os.path.splitext(uploaded_file_tab2.name)[1]
-                    if not file_extension:
-                        file_extension = ".tmp"
-                    
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file_obj:
-                        temp_file_obj.write(uploaded_file_tab2.getvalue())
-                        temp_file_path = temp_file_obj.name
-                    
-                    # Process the RFP
-                    rfp_text = process_rfp(temp_file_path)
+                    # Process the RFP (cached by content, so the tab-1 upload of the same file is reused)
+                    rfp_text = extract_uploaded_text(uploaded_file_tab2, st.session_state.config)
                     st.session_state.tab2_rfp_text = rfp_text  # Store specifically for tab2
                     st.session_state.rfp_text = rfp_text  # Store in main session state as well
                     st.success(f"Successfully processed {uploaded_file_tab2.name}")
@@ -977,9 +975,6 @@ input[type="radio"] {
                     
                 except Exception as e:
                     st.error(f"Error processing file: {str(e)}")
-                finally:
-                    if temp_file_path and os.path.exists(temp_file_path):
-                        os.unlink(temp_file_path)
         
         # Reset states if no file is uploaded
         elif uploaded_file_tab2 is None:
@@ -1457,14 +1452,8 @@ input[type="radio"] {
                 # Process vendor proposal file (ensure it's only processed once or if file changes)
                 if (st.session_state.get('processed_vendor_file_name') != uploaded_vendor_proposal_file.name or
                     st.session_state.get('processed_vendor_file_size') != uploaded_vendor_proposal_file.size):
-                    temp_vendor_file_path = ""
                     try:
-                        vendor_file_ext = os.path.splitext(uploaded_vendor_proposal_file.name)[1] or ".tmp"
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=vendor_file_ext) as temp_vp_file:
-                            temp_vp_file.write(uploaded_vendor_proposal_file.getvalue())
-                            temp_vendor_file_path = temp_vp_file.name
-                        
-                        vendor_proposal_text_content = process_rfp(temp_vendor_file_path) # Reuses your RFP processing
+                        vendor_proposal_text_content = extract_uploaded_text(uploaded_vendor_proposal_file, st.session_state.config) # Reuses your RFP processing
                         st.session_state.vendor_proposal_text = vendor_proposal_text_content # Already cleaned
                         st.session_state.processed_vendor_file_name = uploaded_vendor_proposal_file.name
                         st.session_state.processed_vendor_file_size = uploaded_vendor_proposal_file.size
@@ -1474,9 +1463,6 @@ input[type="radio"] {
                         st.success(f"Processed vendor proposal: {uploaded_vendor_proposal_file.name}")
                     except Exception as e_vp:
                         st.error(f"Error processing vendor proposal: {e_vp}")
-                    finally:
-                        if temp_vendor_file_path and os.path.exists(temp_vendor_file_path):
-                            os.unlink(temp_vendor_file_path)
                 
                 if st.session_state.get('vendor_proposal_text'):
                     with st.expander("Preview Vendor Proposal Content", expanded=False):
@@ -1676,18 +1662,9 @@ input[type="radio"] {
             
             # Only process if it's a new file or file has changed
             if st.session_state.sow_current_file != current_file_info:
-                temp_file_path = ""
                 try:
-                    file_extension = os.path.splitext(uploaded_rfp_sow.name)[1]
-                    if not file_extension:
-                        file_extension = ".tmp"
-                    
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file_obj:
-                        temp_file_obj.write(uploaded_rfp_sow.getvalue())
-                        temp_file_path = temp_file_obj.name
-                    
-                    # Process the RFP
-                    rfp_text = process_rfp(temp_file_path)
+                    # Process the RFP (cached by content across tabs and sessions)
+                    rfp_text = extract_uploaded_text(uploaded_rfp_sow, st.session_state.config)
                     st.session_state.sow_rfp_text = rfp_text
                     st.session_state.sow_current_file = current_file_info
                     st.session_state.sow_rfp_processed = True
@@ -1699,9 +1676,6 @@ input[type="radio"] {
                 except Exception as e:
                     st.error(f"Error processing file: {str(e)}")
                     st.session_state.sow_rfp_processed = False
-                finally:
-                    if temp_file_path and os.path.exists(temp_file_path):
-                        os.unlink(temp_file_path)
         
         # Reset states if no file is uploaded
         elif uploaded_rfp_sow is None:
@@ -0,0 +1,107 @@
+"""Recall and latency of the approximate vector index backends against the exact flat index.
+
+The corpus embeddings come from the knowledge base (served by the embedding cache when it
+is warm). Larger corpus sizes are simulated by adding jittered copies of the real vectors,
+which keeps the cluster structure of real proposals instead of using uniform noise.
+Like the knowledge base (ProposalKnowledgeBase._build_index), every backend is built with
+the inner-product metric over L2-normalised vectors and queries, so scores are cosines.
+
+Usage (from the repository root):
+    python -m benchmarks.ann_recall --sizes 5000,20000,100000 --k 5 --queries 200
+"""
+import time
+import argparse
+import numpy as np
+import faiss
+from utils import load_config
+from knowledge_base import ProposalKnowledgeBase
+from vector_index import INDEX_BACKENDS, create_vector_index, describe_index
+
+
+def corpus_embeddings(kb):
+    texts = [kb.chunk_text(chunk_id) for chunk_id, doc_id in enumerate(kb.chunk_doc_ids) if doc_id >= 0]
+    if kb.embedding_cache is not None:
+        return kb.embedding_cache.encode(texts, kb.model.encode)
+    return np.asarray(kb.model.encode(texts), dtype='float32')
+
+
+def normalized(vectors):
+    """float32 copy with unit-length rows, as the knowledge base indexes them"""
+    vectors = np.array(vectors, dtype='float32', ndmin=2)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def scale_corpus(base, size, rng, jitter=0.05):
+    """Return ``size`` unit-length vectors: the real ones plus jittered copies"""
+    if size <= len(base):
+        return normalized(base[rng.choice(len(base), size, replace=False)])
+    picks = base[rng.integers(0, len(base), size - len(base))]
+    noise = rng.normal(0.0, jitter, picks.shape).astype('float32')
+    return normalized(np.vstack([base, picks + noise]))
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000.0
+
+
+def run(args):
+    kb_config = load_config().get("knowledge_base", {})
+    kb = ProposalKnowledgeBase(kb_config.get("directory", "markdown_responses"),
+                               kb_config.get("embedding_model", "all-MiniLM-L6-v2"),
+                               dict(kb_config, use_artifact=False))
+    base = normalized(corpus_embeddings(kb))
+    rng = np.random.default_rng(args.seed)
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    index_config = dict(kb_config.get("index", {}))
+
+    print(f"{'size':>8} {'backend':>8} {'recall@' + str(args.k):>9} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8}  index")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        vectors = scale_corpus(base, size, rng)
+        ids = np.arange(len(vectors), dtype='int64')
+        # Queries are perturbed corpus vectors, so each has meaningful near neighbours
+        queries = vectors[rng.integers(0, len(vectors), args.queries)]
+        queries = normalized(queries + rng.normal(0.0, 0.05, queries.shape).astype('float32'))
+
+        exact = create_vector_index(vectors.shape[1], dict(index_config, backend="flat"), vectors,
+                                    metric=faiss.METRIC_INNER_PRODUCT)
+        exact.add_with_ids(vectors, ids)
+        truth_scores, _ = exact.search(queries, args.k)
+        # A hit is any returned vector at least as similar as the exact k-th neighbour, so
+        # duplicate sections (ties) do not count as misses
+        kth_score = truth_scores[:, -1] - 1e-5
+
+        for backend in backends:
+            start = time.perf_counter()
+            index = create_vector_index(vectors.shape[1], dict(index_config, backend=backend), vectors,
+                                        metric=faiss.METRIC_INNER_PRODUCT)
+            index.add_with_ids(vectors, ids)
+            build_seconds = time.perf_counter() - start
+
+            latencies = []
+            hits = 0
+            for qi in range(len(queries)):
+                t0 = time.perf_counter()
+                _, found = index.search(queries[qi:qi + 1], args.k)
+                latencies.append(time.perf_counter() - t0)
+                found = found[0][found[0] >= 0]
+                # Exact cosines of what the ANN index returned (IVF-PQ reports approximate ones)
+                found_scores = vectors[found] @ queries[qi]
+                hits += int((found_scores >= kth_score[qi]).sum())
+            recall = hits / float(len(queries) * args.k)
+            print(f"{size:>8} {backend:>8} {recall:>9.3f} {percentile_ms(latencies, 50):>8.3f} "
+                  f"{percentile_ms(latencies, 99):>8.3f} {build_seconds:>8.2f}  {describe_index(index)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="5000,20000,100000", help="Comma separated corpus sizes")
+    parser.add_argument("--backends", default=",".join(INDEX_BACKENDS))
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Streaming DOCX extraction against the python-docx extractor it replaced.
+
+Without --docx a synthetic RFP is generated with python-docx: numbered headings, prose and
+large pricing tables with horizontally and vertically merged cells. Both extractors read it;
+reported are wall time, peak Python memory (tracemalloc), and structure checks: the lines
+the two outputs do not share should only be the rows with merged cells (python-docx repeats
+merged text per grid column and per merged row), and every table row should follow a heading.
+
+Usage (from the repository root):
+    python -m benchmarks.docx_extraction --sections 40 --table-rows 400
+    python -m benchmarks.docx_extraction --docx tenders/big_rfp.docx
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from collections import Counter
+from docx import Document
+from utils import remove_problematic_chars
+from docx_extraction import iter_docx_blocks
+
+
+def legacy_extract(file_path):
+    """document_processing.extract_text_from_docx before docx_extraction.py: all tables, then all paragraphs"""
+    doc = Document(file_path)
+    full_text = []
+    for table in doc.tables:
+        for row in table.rows:
+            row_text = []
+            for cell in row.cells:
+                cleaned_cell_text = remove_problematic_chars(cell.text.strip())
+                if cleaned_cell_text:
+                    row_text.append(cleaned_cell_text)
+            if row_text:
+                full_text.append(" | ".join(row_text))
+    for para in doc.paragraphs:
+        cleaned_para_text = remove_problematic_chars(para.text.strip())
+        if cleaned_para_text:
+            if para.style.name.startswith('Heading'):
+                heading_level = int(para.style.name[-1]) if para.style.name[-1].isdigit() else 1
+                full_text.append(f"{'#' * heading_level} {cleaned_para_text}")
+            else:
+                full_text.append(cleaned_para_text)
+    return '\n'.join(full_text)
+
+
+def streaming_extract(file_path):
+    return '\n'.join(iter_docx_blocks(file_path))
+
+
+def write_synthetic_docx(path, sections, table_rows, seed=0):
+    rng = random.Random(seed)
+    words = "vendor shall deliver hosting support licences training migration warranty services".split()
+    doc = Document()
+    for section in range(sections):
+        doc.add_heading(f"{section + 1}. Section {section + 1} \u2013 Scope", level=1)
+        doc.add_heading(f"Requirements of section {section + 1}", level=2)
+        for _ in range(5):
+            doc.add_paragraph(" ".join(rng.choice(words) for _ in range(40)).capitalize() + ".")
+        table = doc.add_table(rows=table_rows + 1, cols=5)
+        for column, title in enumerate(("Item", "Description", "Qty", "Unit price", "Total")):
+            table.cell(0, column).text = title
+        for row in range(1, table_rows + 1):
+            values = (f"{section}.{row}", " ".join(rng.choice(words) for _ in range(6)), str(rng.randint(1, 20)),
+                      f"AED {rng.randint(100, 9000):,}", f"AED {rng.randint(1000, 90000):,}")
+            for column, value in enumerate(values):
+                table.cell(row, column).text = value
+        # A merged "Subtotal" label across three columns and a merged item column down two rows
+        table.cell(table_rows, 0).merge(table.cell(table_rows, 2)).text = f"Subtotal section {section + 1}"
+        table.cell(1, 0).merge(table.cell(2, 0))
+        doc.add_paragraph(f"Closing notes for section {section + 1}.")
+    doc.save(path)
+
+
+def measure(function, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    text = function(path)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return text, elapsed, peak
+
+
+def run(args):
+    path = args.docx
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), f"synthetic_rfp_{args.sections}x{args.table_rows}.docx")
+        if not os.path.exists(path):
+            print(f"Writing a synthetic RFP ({args.sections} sections, {args.table_rows}-row tables) to {path}")
+            write_synthetic_docx(path, args.sections, args.table_rows, args.seed)
+    print(f"{path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+    legacy, legacy_s, legacy_peak = measure(legacy_extract, path)
+    streamed, streamed_s, streamed_peak = measure(streaming_extract, path)
+    print(f"{'extractor':>10} {'seconds':>8} {'peak MB':>8} {'lines':>7}")
+    print(f"{'python-docx':>10} {legacy_s:>8.2f} {legacy_peak / 1e6:>8.1f} {len(legacy.splitlines()):>7}")
+    print(f"{'streaming':>10} {streamed_s:>8.2f} {streamed_peak / 1e6:>8.1f} {len(streamed.splitlines()):>7}")
+    print(f"speed-up {legacy_s / streamed_s:.1f}x, peak memory {streamed_peak / max(legacy_peak, 1):.2f}x")
+
+    # Same lines, apart from merged cells python-docx repeats ("A | A | A" -> "A")
+    old_lines, new_lines = Counter(legacy.splitlines()), Counter(streamed.splitlines())
+    print(f"lines only in python-docx output: {sum((old_lines - new_lines).values())} (merged-cell repeats), "
+          f"only in streaming output: {sum((new_lines - old_lines).values())} (the same rows, merged cells once)")
+    lines = streamed.splitlines()
+    headings = [i for i, line in enumerate(lines) if line.startswith("# ")]
+    rows = [i for i, line in enumerate(lines) if " | " in line]
+    in_order = bool(headings) and all(any(h < r for h in headings) for r in rows)
+    print(f"document order kept (tables after their headings): {in_order}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docx", default=None, help="DOCX to extract; default: a generated synthetic RFP")
+    parser.add_argument("--sections", type=int, default=40)
+    parser.add_argument("--table-rows", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Throughput, query latency and retrieval drift of the embedding backends against torch fp32.
+
+Every backend embeds the same chunk texts of the knowledge base (no embedding cache) and
+a set of queries. Drift is reported two ways: mean cosine between a backend's vectors and
+the torch vectors of the same texts, and overlap@k of the chunks each backend retrieves
+for the queries by exact inner-product search.
+
+Usage (from the repository root):
+    python -m benchmarks.embedding_backends --backends torch,torch-int8,onnx,onnx-int8 --chunks 2000
+"""
+import time
+import random
+import argparse
+import numpy as np
+from utils import load_config
+from knowledge_base import ProposalKnowledgeBase
+from embedding_backends import EMBEDDING_BACKENDS, load_sentence_transformer
+
+
+def unit(vectors):
+    vectors = np.asarray(vectors, dtype='float32')
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+
+
+def run(args):
+    kb_config = load_config().get("knowledge_base", {})
+    model_name = kb_config.get("embedding_model", "all-MiniLM-L6-v2")
+    # Only used for its chunk texts and section names; the artifact avoids re-embedding
+    kb = ProposalKnowledgeBase(kb_config.get("directory", "markdown_responses"), model_name, kb_config)
+
+    rng = random.Random(args.seed)
+    chunk_ids = [chunk_id for chunk_id, doc_id in enumerate(kb.chunk_doc_ids) if doc_id >= 0]
+    chunk_ids = sorted(rng.sample(chunk_ids, min(args.chunks, len(chunk_ids))))
+    texts = [kb.chunk_text(chunk_id) for chunk_id in chunk_ids]
+    queries = rng.sample(sorted(kb.get_all_section_names()), min(args.queries, len(kb.section_map)))
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    if "torch" not in backends:
+        backends.insert(0, "torch") # the reference for drift
+    reference = None
+    print(f"{len(texts)} chunks, {len(queries)} queries, model={model_name}")
+    print(f"{'backend':>11} {'sent/s':>8} {'query p50 ms':>13} {'query p95 ms':>13} {'cos vs torch':>13} {'overlap@' + str(args.k):>11}")
+    for backend in backends:
+        model, loaded = load_sentence_transformer(model_name, backend)
+        if loaded != backend:
+            print(f"{backend:>11}  skipped (not available here)")
+            continue
+        model.encode(texts[:args.batch_size], batch_size=args.batch_size) # warm-up
+
+        started = time.perf_counter()
+        corpus = unit(model.encode(texts, batch_size=args.batch_size))
+        throughput = len(texts) / (time.perf_counter() - started)
+
+        latencies = []
+        query_vectors = []
+        for query in queries:
+            t0 = time.perf_counter()
+            query_vectors.append(model.encode([query])[0])
+            latencies.append(time.perf_counter() - t0)
+        query_vectors = unit(query_vectors)
+        top = np.argsort(-(query_vectors @ corpus.T), axis=1)[:, :args.k]
+
+        if reference is None:
+            reference = (corpus, top)
+            cosine, overlap = 1.0, 1.0
+        else:
+            cosine = float((corpus * reference[0]).sum(axis=1).mean())
+            overlap = float(np.mean([len(set(a) & set(b)) / args.k for a, b in zip(top, reference[1])]))
+        print(f"{backend:>11} {throughput:>8.1f} {np.percentile(latencies, 50) * 1000:>13.2f} "
+              f"{np.percentile(latencies, 95) * 1000:>13.2f} {cosine:>13.4f} {overlap:>11.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", default=",".join(EMBEDDING_BACKENDS))
+    parser.add_argument("--chunks", type=int, default=2000, help="Chunk texts embedded per backend")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
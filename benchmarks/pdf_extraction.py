@@ -0,0 +1,92 @@
+"""Per-page PDF extraction time of each backend, serial and through the process pool.
+
+For every backend that is installed: per-page latency of an in-process extraction
+(p50/p95/max), time to the first page of the streaming extractor, total wall time
+in-process and with the pool, and whether the pooled text equals the in-process text.
+Without --pdf a synthetic tender of --pages pages (prose plus pricing tables) is written
+with fpdf first.
+
+Usage (from the repository root):
+    python -m benchmarks.pdf_extraction --pages 300 --workers 4
+    python -m benchmarks.pdf_extraction --pdf tenders/big_rfp.pdf --backends pypdfium2,pypdf2
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import numpy as np
+from pdf_extraction import PDF_BACKENDS, iter_pdf_pages, resolve_pdf_config, time_pages
+
+WORDS = ("the contractor shall provide design development hosting maintenance support services for "
+         "the authority including reporting training warranty acceptance milestones deliverables").split()
+
+
+def write_synthetic_pdf(path: str, pages: int, seed: int = 0):
+    from fpdf import FPDF
+    rng = random.Random(seed)
+    pdf = FPDF()
+    pdf.set_auto_page_break(False)
+    for page in range(pages):
+        pdf.add_page()
+        pdf.set_font("Arial", 'B', 14)
+        pdf.cell(0, 10, txt=f"Section {page + 1}: Scope of Work", ln=True)
+        pdf.set_font("Arial", size=10)
+        for _ in range(18):
+            pdf.multi_cell(0, 5, txt=" ".join(rng.choice(WORDS) for _ in range(24)).capitalize() + ".")
+        for row in range(8): # a small pricing table
+            pdf.cell(60, 5, txt=f"Item {page}.{row}", border=1)
+            pdf.cell(40, 5, txt=f"{rng.randint(1, 50)} units", border=1)
+            pdf.cell(40, 5, txt=f"AED {rng.randint(1000, 90000):,}", border=1, ln=True)
+    pdf.output(path)
+
+
+def run(args):
+    path = args.pdf
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), f"synthetic_tender_{args.pages}p.pdf")
+        if not os.path.exists(path):
+            print(f"Writing a {args.pages}-page synthetic tender to {path}")
+            write_synthetic_pdf(path, args.pages, args.seed)
+    print(f"{path} ({os.path.getsize(path) / 1e6:.1f} MB), workers={args.workers}")
+
+    print(f"{'backend':>10} {'pages':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'first page ms':>14} "
+          f"{'serial s':>9} {'pool s':>8} {'speed-up':>9} {'same text':>10}")
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        if resolve_pdf_config({"backend": backend})["backend"] != backend:
+            print(f"{backend:>10}  skipped (not available here)")
+            continue
+        pages, timings = time_pages(path, backend)
+
+        serial_config = {"backend": backend, "workers": 1}
+        started = time.perf_counter()
+        stream = iter_pdf_pages(path, serial_config)
+        serial_text = [next(stream)]
+        first_page = time.perf_counter() - started
+        serial_text.extend(stream)
+        serial = time.perf_counter() - started
+
+        pool_config = {"backend": backend, "workers": args.workers, "pages_per_task": args.pages_per_task, "min_pages_for_pool": 1}
+        started = time.perf_counter()
+        pool_text = list(iter_pdf_pages(path, pool_config))
+        pooled = time.perf_counter() - started
+
+        timings_ms = np.array(timings) * 1000
+        same = pool_text == serial_text and len(pool_text) == pages
+        print(f"{backend:>10} {pages:>6} {np.percentile(timings_ms, 50):>8.2f} {np.percentile(timings_ms, 95):>8.2f} "
+              f"{timings_ms.max():>8.2f} {first_page * 1000:>14.1f} {serial:>9.2f} {pooled:>8.2f} {serial / pooled:>8.1f}x {str(same):>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", default=None, help="PDF to extract; default: a generated synthetic tender")
+    parser.add_argument("--pages", type=int, default=300, help="Pages of the synthetic tender")
+    parser.add_argument("--backends", default=",".join(PDF_BACKENDS))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Cost of the cross-encoder reranker next to the prompt tokens it saves.
+
+For each query the KB items that generate_section would put in its prompt (multi-hop
+results with score >= 0.5, truncated to 2000 characters) are built with and without the
+reranker, and their size is counted with the OpenAI tokenizer. Retrieval is warmed up
+first, so the latency columns isolate the reranker: cold (empty pair cache) and warm.
+
+Usage (from the repository root):
+    python -m benchmarks.rerank_cost --queries 50 --k 3 --budget-ms 250
+"""
+import time
+import random
+import argparse
+import numpy as np
+import tiktoken
+from utils import load_config
+from knowledge_base import ProposalKnowledgeBase
+from reranker import CrossEncoderReranker, resolve_reranker_config
+
+# Typical proposal sections, as generate_full_proposal queries them
+DEFAULT_QUERIES = [
+    "Executive Summary", "Understanding of Requirements", "Proposed Solution", "Technical Approach",
+    "Implementation Plan and Timeline", "Project Team and Expertise", "Commercial Proposal and Pricing",
+    "Social Media Strategy", "Website Design and Development", "SEO Packages", "Reporting and KPIs",
+    "Terms and Conditions",
+]
+
+PROMPT_CHAR_LIMIT = 2000 # generate_section truncates its KB block to this many characters
+
+
+def kb_block(results, limit=None):
+    """The KB items text the generation prompts are built from (see generate_section)"""
+    block = "\n\n".join(
+        f"--- {('Very Relevant' if item.get('score', 0) > 0.8 else 'Relevant')} PAST PROPOSAL ---\n"
+        f"From: {item['document']['filename']} | Section: {item['document']['section_name']}\n"
+        f"{item['document']['content']}"
+        for item in results if item.get('score', 0) >= 0.5
+    )
+    return block[:limit] if limit else block
+
+
+def timed_search(kb, queries, k):
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(kb.multi_hop_search_many([query], k=k)[0])
+        latencies.append(time.perf_counter() - started)
+    return results, np.array(latencies) * 1000.0
+
+
+def run(args):
+    kb_config = load_config().get("knowledge_base", {})
+    kb = ProposalKnowledgeBase(kb_config.get("directory", "markdown_responses"),
+                               kb_config.get("embedding_model", "all-MiniLM-L6-v2"),
+                               dict(kb_config, reranker={"enabled": False}))
+    reranker_config = resolve_reranker_config(dict(kb_config.get("reranker", {}), enabled=True))
+    if args.budget_ms is not None:
+        reranker_config["budget_ms"] = args.budget_ms
+    reranker = CrossEncoderReranker(reranker_config)
+    reranker.model # load outside the timed runs
+
+    section_names = sorted(kb.get_all_section_names())
+    rng = random.Random(args.seed)
+    queries = (DEFAULT_QUERIES + rng.sample(section_names, min(len(section_names), args.queries)))[:args.queries]
+    encoding = tiktoken.get_encoding(args.encoding)
+
+    kb.reranker = None
+    timed_search(kb, queries, args.k) # warm the query embedding and search result caches
+    baseline, baseline_ms = timed_search(kb, queries, args.k)
+
+    kb.reranker = reranker
+    reranker.pair_cache.clear()
+    reranked, cold_ms = timed_search(kb, queries, args.k)
+    _, warm_ms = timed_search(kb, queries, args.k)
+
+    def tokens(results_per_query, limit):
+        return np.array([len(encoding.encode(kb_block(results, limit))) for results in results_per_query])
+
+    print(f"{len(queries)} queries, k={args.k}, model={reranker.model_name}, budget={reranker_config['budget_ms']} ms, "
+          f"candidates={reranker_config['candidates']}")
+    print(f"{'':>28} {'baseline':>10} {'reranked':>10} {'saved':>8}")
+    for label, limit in (("prompt tokens (generate_section)", PROMPT_CHAR_LIMIT), ("prompt tokens (untruncated)", None)):
+        before, after = tokens(baseline, limit), tokens(reranked, limit)
+        print(f"{label:>28} {before.mean():>10.1f} {after.mean():>10.1f} {before.mean() - after.mean():>8.1f}  (mean per query)")
+    items_before = np.mean([sum(r.get('score', 0) >= 0.5 for r in results) for results in baseline])
+    items_after = np.mean([sum(r.get('score', 0) >= 0.5 for r in results) for results in reranked])
+    print(f"{'KB items sent':>28} {items_before:>10.2f} {items_after:>10.2f} {items_before - items_after:>8.2f}")
+    print(f"{'latency ms p50 / p95':>28} {np.percentile(baseline_ms, 50):>5.1f}/{np.percentile(baseline_ms, 95):<5.1f}"
+          f" cold {np.percentile(cold_ms, 50):.1f}/{np.percentile(cold_ms, 95):.1f}"
+          f"  warm {np.percentile(warm_ms, 50):.1f}/{np.percentile(warm_ms, 95):.1f}")
+    extra_ms = cold_ms.mean() - baseline_ms.mean()
+    saved = tokens(baseline, None).mean() - tokens(reranked, None).mean()
+    if saved > 0:
+        print(f"Reranker cost: {extra_ms:.1f} ms per query cold for {saved:.0f} fewer prompt tokens ({extra_ms / saved:.3f} ms per token saved)")
+    else:
+        print(f"Reranker cost: {extra_ms:.1f} ms per query cold; no prompt tokens saved on these queries")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=3, help="Results per section, as in generate_full_proposal")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Override the configured per-query budget")
+    parser.add_argument("--encoding", default="cl100k_base", help="tiktoken encoding used to count prompt tokens")
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
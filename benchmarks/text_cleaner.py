@@ -0,0 +1,118 @@
+"""Throughput of the single-pass text cleaner against the old chained-replace cleaner.
+
+Both cleaners run over the largest markdown responses in the knowledge base (whole files,
+then their sections one by one, as the KB sees them), over Arabic-heavy bilingual text as
+found in UAE tenders, and over randomly generated text full of characters they change.
+Every output must be byte-identical to the old cleaner's.
+
+Usage (from the repository root):
+    python -m benchmarks.text_cleaner --files 5 --repeat 20
+"""
+import os
+import re
+import time
+import random
+import argparse
+from utils import load_config
+from kb_ingest import split_into_sections
+from text_cleaner import clean_text, clean_texts, CleanText, REPLACEMENTS
+
+ARABIC_WORDS = ("\u0627\u0644\u0645\u0646\u0627\u0642\u0635\u0629", "\u0639\u0631\u0636", "\u0627\u0644\u0633\u0639\u0631",
+                "\u0627\u0644\u0646\u0637\u0627\u0642", "\u0627\u0644\u062e\u062f\u0645\u0627\u062a")
+
+_LEGACY_REGEX = re.compile(r'[^\x20-\x7E\n\r\t\u00A0]')
+
+
+def legacy_clean(text):
+    """utils.remove_problematic_chars as it was before text_cleaner.py"""
+    if not isinstance(text, str):
+        return text
+    cleaned_text = text
+    for char, replacement in REPLACEMENTS.items():
+        cleaned_text = cleaned_text.replace(char, replacement)
+    try:
+        cleaned_text = cleaned_text.encode('latin-1', errors='ignore').decode('latin-1')
+    except UnicodeEncodeError:
+        cleaned_text = cleaned_text.encode('utf-8', errors='replace').decode('utf-8')
+    return _LEGACY_REGEX.sub('', cleaned_text)
+
+
+def random_text(rng, length):
+    """Mostly ASCII prose with typographic characters, control characters, latin-1,
+    CJK, emoji and lone surrogates mixed in"""
+    pools = [
+        "abcdefghijklmnopqrstuvwxyz ABCDEFGHIJ 0123456789 .,;:!?-\n\t",
+        "".join(REPLACEMENTS),
+        "".join(chr(c) for c in range(0x00, 0x20)) + "\x7f",
+        "".join(chr(c) for c in range(0x80, 0x100)),
+        "\u4e2d\u6587\u0627\u0644\u20ac\u00a0\ufeff\U0001F600\U0001F680\ud800\udfff",
+    ]
+    weights = [80, 6, 4, 5, 5]
+    return "".join(rng.choice(rng.choices(pools, weights)[0]) for _ in range(length))
+
+
+def bilingual_text(rng, words):
+    """Arabic prose with English terms, prices and typographic dashes mixed in"""
+    english = ("Scope of Work", "AED 12,500", "\u2013", "Phase 1", "\n")
+    return " ".join(rng.choice(english) if rng.random() < 0.15 else rng.choice(ARABIC_WORDS) for _ in range(words))
+
+
+def timed(function, texts, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            function(text)
+    return time.perf_counter() - started
+
+
+def run(args):
+    kb_directory = load_config().get("knowledge_base", {}).get("directory", "markdown_responses")
+    paths = [os.path.join(kb_directory, name) for name in os.listdir(kb_directory) if name.endswith(".md")]
+    paths = sorted(paths, key=os.path.getsize, reverse=True)[:args.files]
+    files = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            files.append(f.read())
+    split = [split_into_sections(text) for text in files]
+    sections = [section for sections in split for section in sections.values()]
+    names = [name for sections in split for name in sections]
+    rng = random.Random(args.seed)
+    bilingual = [bilingual_text(rng, rng.randint(50, 5000)) for _ in range(args.random_texts)]
+    generated = [random_text(rng, rng.randint(1, 4000)) for _ in range(args.random_texts)]
+
+    # Correctness first: byte-identical output on everything
+    mismatches = 0
+    for texts in (files, sections, names, bilingual, generated):
+        expected = [legacy_clean(text) for text in texts]
+        mismatches += sum(a.encode('utf-8') != b.encode('utf-8') for a, b in zip(expected, clean_texts(texts)))
+    print(f"{len(files)} files ({sum(map(len, files)) / 1e6:.2f}M chars), {len(sections)} sections, {len(names)} section names, "
+          f"{len(bilingual)} bilingual and {len(generated)} random texts: {'byte-identical' if not mismatches else f'{mismatches} MISMATCHES'}")
+
+    # Clean text as plain str measures the scan; as CleanText (what the KB stores) it is not rescanned
+    marked_sections = clean_texts(sections)
+    cleaned_sections = [str(text) for text in marked_sections]
+    print(f"{'input':>19} {'old MB/s':>10} {'new MB/s':>10} {'speed-up':>9}")
+    for label, texts in (("whole files", files), ("sections", sections), ("cleaned sections", cleaned_sections), ("CleanText sections", marked_sections),
+                         ("section names", names), ("Arabic bilingual", bilingual), ("random (stress)", generated)):
+        size = sum(len(text.encode('utf-8', errors='surrogatepass')) for text in texts) * args.repeat / 1e6
+        old = timed(legacy_clean, texts, args.repeat)
+        new = timed(clean_text, texts, args.repeat)
+        print(f"{label:>19} {size / old:>10.1f} {size / new:>10.1f} {old / new:>8.1f}x")
+    # What marking costs: clean_text returns a CleanText copy even when nothing changed
+    wrap = timed(CleanText, cleaned_sections, args.repeat)
+    print(f"CleanText copy: {100 * wrap / timed(clean_text, cleaned_sections, args.repeat):.0f}% of cleaning the cleaned sections")
+    if mismatches:
+        raise SystemExit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=5, help="Largest markdown responses to clean")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--random-texts", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
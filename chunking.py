@@ -0,0 +1,47 @@
+import re
+from typing import List, Tuple, Optional, Any
+
+# Fallback tokenisation when the embedding model exposes no fast tokenizer: words and punctuation
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def token_offsets(text: str, tokenizer: Optional[Any] = None) -> List[Tuple[int, int]]:
+    """Character (start, end) offsets of every token in ``text``.
+
+    Uses the model's own (fast) tokenizer so chunk budgets match what the encoder
+    actually sees; falls back to a word/punctuation split otherwise.
+    """
+    if tokenizer is not None:
+        try:
+            encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, truncation=False)
+            offsets = [tuple(span) for span in encoding["offset_mapping"] if span[1] > span[0]]
+            if offsets or not text.strip():
+                return offsets
+        except Exception:
+            # Slow (python) tokenizers do not return offsets
+            pass
+    return [(match.start(), match.end()) for match in _WORD_PATTERN.finditer(text)]
+
+
+def chunk_spans(text: str, max_tokens: int, overlap: int, tokenizer: Optional[Any] = None) -> List[Tuple[int, int]]:
+    """Split ``text`` into overlapping windows of at most ``max_tokens`` tokens.
+
+    Returns character spans into ``text``, so chunks are slices of the stored section
+    rather than re-joined tokens. Consecutive windows share ``overlap`` tokens.
+    Whitespace-only text yields no chunks.
+    """
+    offsets = token_offsets(text, tokenizer)
+    if not offsets:
+        return []
+    max_tokens = max(1, int(max_tokens))
+    stride = max(1, max_tokens - max(0, int(overlap)))
+
+    spans = []
+    start_token = 0
+    while True:
+        end_token = min(start_token + max_tokens, len(offsets))
+        spans.append((offsets[start_token][0], offsets[end_token - 1][1]))
+        if end_token >= len(offsets):
+            break
+        start_token += stride
+    return spans
@@ -1,50 +1,24 @@
 import re
-from docx import Document
-import PyPDF2
 from utils import remove_problematic_chars
+from text_cleaner import mark_clean
+from pdf_extraction import iter_pdf_pages
+from docx_extraction import iter_docx_blocks
+
+# Part of the extraction cache key (extraction_cache.py): bump it when extraction output changes
+EXTRACTOR_VERSION = 3
 
 
 # Document processing functions
 def extract_text_from_docx(file_path):
-    """Extract text from DOCX files including tables and headers"""
-    doc = Document(file_path)
-    full_text = []
-
-    for table in doc.tables:
-        for row in table.rows:
-            row_text = []
-            for cell in row.cells:
-                # Apply cleaning to cell text
-                cleaned_cell_text = remove_problematic_chars(cell.text.strip())
-                if cleaned_cell_text:
-                    row_text.append(cleaned_cell_text)
-            if row_text:
-                full_text.append(" | ".join(row_text))
-
-    for para in doc.paragraphs:
-        # Apply cleaning to paragraph text
-        cleaned_para_text = remove_problematic_chars(para.text.strip())
-        if cleaned_para_text:
-            if para.style.name.startswith('Heading'):
-                heading_level = int(para.style.name[-1]) if para.style.name[-1].isdigit() else 1
-                prefix = '#' * heading_level + ' '
-                full_text.append(f"{prefix}{cleaned_para_text}")
-            else:
-                full_text.append(cleaned_para_text)
-
-    return '\n'.join(full_text) # Text is already cleaned
-
-
-def extract_text_from_pdf(file_path):
-    """Extract text from PDF documents"""
-    with open(file_path, 'rb') as file:
-        reader = PyPDF2.PdfReader(file)
-        text = []
-        for page in reader.pages:
-            # Apply cleaning to extracted page text
-            cleaned_page_text = remove_problematic_chars(page.extract_text())
-            text.append(cleaned_page_text)
-    return '\n'.join(text) # Text is already cleaned
+    """Extract text from DOCX files: headings, paragraphs and tables in document order"""
+    # Streamed from word/document.xml and cleaned block by block, see docx_extraction.py
+    return mark_clean('\n'.join(iter_docx_blocks(file_path))) # Text is already cleaned
+
+
+def extract_text_from_pdf(file_path, pdf_config=None):
+    """Extract text from PDF documents (backend and parallelism from pdf_config, see pdf_extraction.py)"""
+    # Pages arrive cleaned and in order; long PDFs are read by a process pool
+    return mark_clean('\n'.join(iter_pdf_pages(file_path, pdf_config))) # Text is already cleaned
 
 
 def extract_sections_from_rfp(rfp_text):
@@ -68,7 +42,8 @@ def extract_sections_from_rfp(rfp_text):
             match = re.match(pattern, line.strip())
             if match:
                 if current_content:
-                    sections[current_section] = '\n'.join(current_content)
+                    # Lines of the cleaned text, so the section is clean too
+                    sections[current_section] = mark_clean('\n'.join(current_content))
                     current_content = []
 
                 current_section = match.group(1).strip()
@@ -79,16 +54,20 @@ def extract_sections_from_rfp(rfp_text):
             current_content.append(line)
 
     if current_content:
-        sections[current_section] = '\n'.join(current_content)
+        sections[current_section] = mark_clean('\n'.join(current_content))
 
     return sections
 
-def process_rfp(file_path):
-    """Extract text from uploaded RFP document"""
+def process_rfp(file_path, options=None):
+    """Extract text from uploaded RFP document.
+
+    ``options`` is config.json -> document_processing (e.g. {"pdf": {"backend": "pypdfium2"}}).
+    """
+    options = options or {}
     if file_path.endswith('.docx'):
         return extract_text_from_docx(file_path)
     elif file_path.endswith('.pdf'):
-        return extract_text_from_pdf(file_path)
+        return extract_text_from_pdf(file_path, options.get("pdf"))
     elif file_path.endswith('.md') or file_path.endswith('.txt'):
         # Added errors='replace' to handle problematic characters during reading
         with open(file_path, 'r', encoding='utf-8', errors='replace') as file:
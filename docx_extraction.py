@@ -0,0 +1,119 @@
+import zipfile
+import posixpath
+from typing import Dict, Iterator, List
+from lxml import etree
+from text_cleaner import clean_text
+
+# Streaming DOCX text extraction straight from the zip: word/document.xml is iterparsed
+# and every heading, paragraph and table row is emitted in body order as soon as it ends,
+# then its elements are dropped, so memory stays bounded by the largest table row rather
+# than the document. Output lines match the python-docx extractor used before:
+#   "## Heading text"       paragraphs whose style is "Heading N" ('#' * N)
+#   "Paragraph text"        other non-empty paragraphs
+#   "cell | cell | cell"    one line per table row, empty cells left out
+# Each cell is read once: a horizontally merged cell (gridSpan) is one w:tc, and the
+# continuation cells of a vertical merge are empty, so merged text is not repeated.
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+
+_P, _TBL, _TR, _TC, _BODY = W + "p", W + "tbl", W + "tr", W + "tc", W + "body"
+_RUN = W + "r"
+# Run content that python-docx's paragraph.text turns into characters
+_RUN_CHARACTERS = {W + "tab": "\t", W + "br": "\n", W + "cr": "\n", W + "noBreakHyphen": "-"}
+
+
+def _main_document_path(archive: zipfile.ZipFile) -> str:
+    """word/document.xml, or wherever _rels/.rels says the main part is"""
+    try:
+        relationships = etree.fromstring(archive.read("_rels/.rels"))
+        for relationship in relationships.iter(_REL + "Relationship"):
+            if relationship.get("Type") == _OFFICE_DOCUMENT:
+                return posixpath.normpath(relationship.get("Target").lstrip("/"))
+    except KeyError:
+        pass
+    return "word/document.xml"
+
+
+def heading_levels(archive: zipfile.ZipFile) -> Dict[str, int]:
+    """Paragraph style id -> heading level, from word/styles.xml (style ids differ from
+    names, e.g. in localized documents, so the names are what is matched)"""
+    try:
+        styles = etree.fromstring(archive.read("word/styles.xml"))
+    except KeyError:
+        return {}
+    levels = {}
+    for style in styles.iter(W + "style"):
+        name = style.find(W + "name")
+        if style.get(W + "type") != "paragraph" or name is None:
+            continue
+        name = name.get(W + "val", "")
+        if name.lower().startswith("heading"):
+            levels[style.get(W + "styleId")] = int(name[-1]) if name[-1].isdigit() else 1
+    return levels
+
+
+def _release(element):
+    # Drop a processed element and the already processed siblings before it
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def iter_docx_blocks(file_path: str) -> Iterator[str]:
+    """Cleaned headings, paragraphs and table rows of a DOCX file, in document order"""
+    with zipfile.ZipFile(file_path) as archive:
+        levels = heading_levels(archive)
+        with archive.open(_main_document_path(archive)) as document:
+            paragraphs: List[Dict] = [] # open paragraphs (text boxes nest them)
+            tables: List[Dict] = []     # open tables (cells can hold tables)
+            for event, element in etree.iterparse(document, events=("start", "end")):
+                tag = element.tag
+                if event == "start":
+                    if tag == _P:
+                        paragraphs.append({"parts": [], "style": None})
+                    elif tag == _TBL:
+                        tables.append({"rows": [], "cells": [], "paragraphs": []})
+                    continue
+
+                if tag == W + "t" and paragraphs:
+                    paragraphs[-1]["parts"].append(element.text or "")
+                elif tag in _RUN_CHARACTERS and paragraphs and element.getparent().tag == _RUN:
+                    paragraphs[-1]["parts"].append(_RUN_CHARACTERS[tag])
+                elif tag == W + "pStyle" and paragraphs:
+                    paragraphs[-1]["style"] = element.get(W + "val")
+                elif tag == _P:
+                    paragraph = paragraphs.pop()
+                    text = "".join(paragraph["parts"])
+                    if tables:
+                        tables[-1]["paragraphs"].append(text)
+                    else:
+                        cleaned = clean_text(text.strip())
+                        if cleaned:
+                            level = levels.get(paragraph["style"])
+                            yield f"{'#' * level} {cleaned}" if level else cleaned
+                elif tag == _TC and tables:
+                    table = tables[-1]
+                    # cell.text: the cell's paragraphs, one per line
+                    table["cells"].append("\n".join(table["paragraphs"]))
+                    table["paragraphs"] = []
+                elif tag == _TR and tables:
+                    table = tables[-1]
+                    row = " | ".join(cell for cell in (clean_text(text.strip()) for text in table["cells"]) if cell)
+                    table["cells"] = []
+                    if len(tables) == 1:
+                        if row:
+                            yield row
+                        _release(element)
+                    elif row:
+                        table["rows"].append(row)
+                elif tag == _TBL and tables:
+                    table = tables.pop()
+                    if tables:
+                        # A table inside a cell: its rows become lines of that cell
+                        tables[-1]["paragraphs"].extend(table["rows"])
+
+                if element.getparent() is not None and element.getparent().tag == _BODY:
+                    _release(element)
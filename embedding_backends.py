@@ -0,0 +1,95 @@
+import os
+from typing import Dict, Any, Optional, Tuple
+from sentence_transformers import SentenceTransformer
+from embedding_cache import _model_slug
+
+# Backends selectable through config.json -> knowledge_base -> embedding_backend
+#   torch       PyTorch fp32 (the original behaviour)
+#   torch-int8  PyTorch with Linear layers dynamically quantized to int8
+#   onnx        ONNX Runtime, fp32 (sentence-transformers exports the model on first load)
+#   onnx-int8   ONNX Runtime with a dynamically quantized int8 export, cached on disk
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+DEFAULT_BACKEND_OPTIONS = {
+    "onnx_quantization": "avx2",  # avx2 | avx512 | avx512_vnni | arm64, match the CPUs you deploy on
+    "export_dir": None,           # where onnx-int8 exports are kept; default ~/.cache/rfp_onnx
+}
+
+
+def _load_torch(model_name: str) -> SentenceTransformer:
+    # Explicitly set the device; CPU is what these boxes have
+    try:
+        model = SentenceTransformer(model_name, device='cpu')
+        print(f"SentenceTransformer loaded on CPU for model: {model_name}")
+    except Exception as e:
+        print(f"Error loading SentenceTransformer on CPU: {e}. Trying local files only.")
+        model = SentenceTransformer(model_name, local_files_only=True)
+        print(f"SentenceTransformer loaded with local_files_only=True (default device)")
+    return model
+
+
+def _load_torch_int8(model_name: str) -> SentenceTransformer:
+    import torch
+    model = _load_torch(model_name)
+    # Weights of every Linear layer stored as int8, activations quantized on the fly
+    torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    print(f"Quantized {model_name} Linear layers to int8 (dynamic)")
+    return model
+
+
+def _load_onnx(model_name: str) -> SentenceTransformer:
+    model = SentenceTransformer(model_name, device='cpu', backend='onnx')
+    print(f"SentenceTransformer loaded with ONNX Runtime for model: {model_name}")
+    return model
+
+
+def _load_onnx_int8(model_name: str, options: Dict[str, Any]) -> SentenceTransformer:
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+    quantization = options["onnx_quantization"]
+    export_root = options["export_dir"] or os.path.join(os.path.expanduser("~"), ".cache", "rfp_onnx")
+    export_dir = os.path.join(export_root, _model_slug(model_name))
+    file_name = f"onnx/model_qint8_{quantization}.onnx"
+    if not os.path.exists(os.path.join(export_dir, file_name)):
+        # One-off: export fp32 ONNX next to the tokenizer/config, then quantize it
+        print(f"Exporting int8 ONNX model for {model_name} to {export_dir} ({quantization})")
+        fp32 = _load_onnx(model_name)
+        fp32.save(export_dir)
+        export_dynamic_quantized_onnx_model(fp32, quantization, export_dir)
+    model = SentenceTransformer(export_dir, device='cpu', backend='onnx', model_kwargs={"file_name": file_name})
+    print(f"SentenceTransformer loaded with ONNX Runtime int8 ({file_name}) for model: {model_name}")
+    return model
+
+
+def load_sentence_transformer(model_name: str, backend: str = "torch", options: Optional[Dict[str, Any]] = None) -> Tuple[SentenceTransformer, str]:
+    """Load ``model_name`` for ``backend``; returns (model, backend actually used).
+
+    Backends that cannot be loaded here (onnxruntime/optimum missing, export failure)
+    fall back to torch with a printed reason, like the index backends do.
+    """
+    resolved = dict(DEFAULT_BACKEND_OPTIONS)
+    resolved.update(options or {})
+    if backend not in EMBEDDING_BACKENDS:
+        print(f"Unknown embedding backend '{backend}'. Falling back to 'torch'. Choose one of {', '.join(EMBEDDING_BACKENDS)}.")
+        backend = "torch"
+    try:
+        if backend == "torch-int8":
+            return _load_torch_int8(model_name), backend
+        if backend == "onnx":
+            return _load_onnx(model_name), backend
+        if backend == "onnx-int8":
+            return _load_onnx_int8(model_name, resolved), backend
+    except Exception as e:
+        print(f"Could not load embedding backend '{backend}' ({e}); using 'torch'.")
+    return _load_torch(model_name), "torch"
+
+
+def backend_cache_key(model_name: str, backend: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """Name under which a backend's vectors are cached; torch keeps the bare model name so
+    existing caches stay valid. Options that change the vectors (the int8 ONNX quantization
+    target) are part of the name unless they are the default."""
+    if backend == "torch":
+        return model_name
+    quantization = (options or {}).get("onnx_quantization", DEFAULT_BACKEND_OPTIONS["onnx_quantization"])
+    if backend == "onnx-int8" and quantization != DEFAULT_BACKEND_OPTIONS["onnx_quantization"]:
+        return f"{model_name}@{backend}-{quantization}"
+    return f"{model_name}@{backend}"
@@ -0,0 +1,112 @@
+import os
+import re
+import numpy as np
+from typing import List, Dict, Callable, Iterable
+from kb_files import content_hash
+
+
+def _model_slug(model_name: str) -> str:
+    """Turn a model name such as 'sentence-transformers/all-MiniLM-L6-v2' into a safe directory name"""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name).strip('_') or "default"
+
+
+class EmbeddingCache:
+    """On-disk embedding cache keyed by (model name, content hash of the cleaned text).
+
+    Vectors for one model live in a single ``embeddings.npz`` file (hashes + float32 matrix)
+    under ``<cache_dir>/<model slug>/``. The file is replaced atomically on save, so a
+    concurrent reader always sees either the old or the new cache, never a partial one.
+    """
+
+    FILE_NAME = "embeddings.npz"
+
+    def __init__(self, cache_dir: str, model_name: str):
+        self.model_name = model_name
+        self.cache_dir = os.path.join(cache_dir, _model_slug(model_name))
+        self.path = os.path.join(self.cache_dir, self.FILE_NAME)
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def _load(self):
+        """Read the cache file if present; a corrupt or foreign file is ignored"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["model_name"]) != self.model_name:
+                    print(f"Embedding cache at {self.path} belongs to another model. Ignoring it.")
+                    return
+                hashes = data["hashes"]
+                vectors = data["vectors"].astype('float32', copy=False)
+            self._vectors = {str(h): vectors[i] for i, h in enumerate(hashes)}
+        except Exception as e:
+            print(f"Warning: could not read embedding cache {self.path}: {e}. Starting with an empty cache.")
+            self._vectors = {}
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray], prune: bool = False) -> np.ndarray:
+        """Return embeddings for ``texts``, encoding only the ones missing from the cache.
+
+        ``encode_fn`` is called at most once, with the list of uncached texts.
+        Texts are expected to be cleaned already; the hash is taken over them as given.
+        With ``prune=True`` the texts are treated as the whole corpus and every other
+        entry is dropped, so the cache does not grow with deleted or edited sections.
+        """
+        keys = [content_hash(text) for text in texts]
+        if prune:
+            self.prune(keys)
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in self._vectors and key not in missing:
+                missing[key] = text
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            new_vectors = np.asarray(encode_fn(list(missing.values())), dtype='float32')
+            for key, vector in zip(missing.keys(), new_vectors):
+                self._vectors[key] = vector
+            self._dirty = True
+
+        if not keys:
+            return np.zeros((0, 0), dtype='float32')
+        return np.vstack([self._vectors[key] for key in keys])
+
+    def prune(self, keep_hashes: Iterable[str]):
+        """Drop every entry whose hash is not in ``keep_hashes`` (e.g. sections that were deleted)"""
+        keep = set(keep_hashes)
+        stale = [key for key in self._vectors if key not in keep]
+        for key in stale:
+            del self._vectors[key]
+        if stale:
+            self._dirty = True
+
+    def save(self):
+        """Persist the cache if anything changed since it was loaded"""
+        if not self._dirty:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        hashes = np.array(list(self._vectors.keys()), dtype='U64')
+        if self._vectors:
+            vectors = np.vstack(list(self._vectors.values())).astype('float32')
+        else:
+            vectors = np.zeros((0, 0), dtype='float32')
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, model_name=np.array(self.model_name), hashes=hashes, vectors=vectors)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            print(f"Warning: could not write embedding cache {self.path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._vectors), "hits": self.hits, "misses": self.misses}
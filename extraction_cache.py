@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from typing import Dict, Any, Tuple, Optional
+from cachetools import LRUCache
+from document_processing import process_rfp, EXTRACTOR_VERSION
+
+# Text extracted from uploaded documents, keyed by the SHA-256 of the uploaded bytes. Every
+# Streamlit rerun (a button, a slider, a text area) re-runs the upload blocks; with this
+# cache a document is parsed once per process, whichever tab or session uploads it, and
+# later reruns only hash the bytes. The cache is bounded by the total size of the cached
+# texts and evicts the least recently used ones.
+DEFAULT_EXTRACTION_CACHE_MB = 256
+
+
+def upload_key(data: bytes, filename: str, options: Optional[Dict[str, Any]] = None) -> Tuple[str, str, int, str]:
+    """(SHA-256 of the bytes, file extension, extractor version, extraction options);
+    the extension picks the parser and the options its backend"""
+    extension = os.path.splitext(filename)[1].lower() or ".tmp"
+    settings = {key: value for key, value in (options or {}).items() if key != "extraction_cache_mb"}
+    return (hashlib.sha256(data).hexdigest(), extension, EXTRACTOR_VERSION, json.dumps(settings, sort_keys=True, default=str))
+
+
+class ExtractionCache:
+    """Size-bounded LRU of extracted texts, shared by all sessions of the process.
+
+    Two sessions uploading the same document at once parse it once: the second waits for
+    the first, as with the shared knowledge base in kb_registry.py.
+    """
+
+    def __init__(self, max_mb: float = DEFAULT_EXTRACTION_CACHE_MB):
+        self.max_chars = max(1, int(max_mb * 1024 * 1024))
+        # Sized by text length: extracted text is almost all ASCII, so chars ~ bytes
+        self._cache = LRUCache(maxsize=self.max_chars, getsizeof=len)
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str, int, str], threading.Event] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def extract(self, data: bytes, filename: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """Text of an uploaded document (process_rfp), from the cache when these bytes were seen before.
+
+        ``options`` is config.json -> document_processing. Extraction errors propagate and
+        nothing is cached for them.
+        """
+        key = upload_key(data, filename, options)
+        while True:
+            with self._lock:
+                text = self._cache.get(key)
+                if text is not None:
+                    self.hits += 1
+                    return text
+                waiting = self._pending.get(key)
+                if waiting is None:
+                    self.misses += 1
+                    self._pending[key] = threading.Event()
+                    break
+            waiting.wait() # another session is parsing these bytes; then look again
+
+        try:
+            text = self._extract_uncached(data, key[1], options)
+            with self._lock:
+                if len(text) <= self.max_chars: # LRUCache refuses larger values
+                    self._cache[key] = text
+            return text
+        finally:
+            with self._lock:
+                self._pending.pop(key).set()
+
+    @staticmethod
+    def _extract_uncached(data: bytes, extension: str, options: Optional[Dict[str, Any]]) -> str:
+        # The parsers read from a path, so the upload is written to a temporary file
+        temp_file_path = ""
+        try:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=extension) as temp_file_obj:
+                temp_file_obj.write(data)
+                temp_file_path = temp_file_obj.name
+            return process_rfp(temp_file_path, options)
+        finally:
+            if temp_file_path and os.path.exists(temp_file_path):
+                os.unlink(temp_file_path)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._cache),
+                "mb": self._cache.currsize / (1024 * 1024),
+                "max_mb": self.max_chars / (1024 * 1024),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_extraction_cache(max_mb: float = DEFAULT_EXTRACTION_CACHE_MB) -> ExtractionCache:
+    """The process-wide cache, created on first use (its size is fixed by the first caller)"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ExtractionCache(max_mb)
+        return _shared
+
+
+def extract_uploaded_text(uploaded_file, config: Optional[Dict[str, Any]] = None) -> str:
+    """process_rfp for a Streamlit UploadedFile, through the shared extraction cache"""
+    options = (config or {}).get("document_processing", {})
+    max_mb = options.get("extraction_cache_mb", DEFAULT_EXTRACTION_CACHE_MB)
+    return get_extraction_cache(max_mb).extract(uploaded_file.getvalue(), uploaded_file.name, options)
@@ -0,0 +1,96 @@
+import numpy as np
+from typing import Dict, Any, Optional, Tuple
+
+# Modes selectable through config.json -> knowledge_base -> fusion -> mode
+FUSION_MODES = ("rrf", "weighted")
+
+DEFAULT_FUSION_CONFIG = {
+    "mode": "rrf",
+    "rrf_k": 60,          # RRF: damping constant from Cormack et al.; larger flattens the rank curve
+    "dense_weight": 0.5,  # weighted: share of the dense score, the sparse score gets the rest
+}
+
+
+def resolve_fusion_config(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge a user supplied fusion block over the defaults and validate the mode"""
+    resolved = dict(DEFAULT_FUSION_CONFIG)
+    resolved.update(config or {})
+    if resolved["mode"] not in FUSION_MODES:
+        print(f"Unknown fusion mode '{resolved['mode']}'. Falling back to 'rrf'. Choose one of {', '.join(FUSION_MODES)}.")
+        resolved["mode"] = "rrf"
+    return resolved
+
+
+def _ranks_in(candidates: np.ndarray, ranked_ids: np.ndarray) -> np.ndarray:
+    """0-based rank of every candidate in ``ranked_ids`` (which has no duplicates), -1 if absent"""
+    ranks = np.full(len(candidates), -1, dtype='int64')
+    if len(ranked_ids) == 0:
+        return ranks
+    sorter = np.argsort(ranked_ids, kind='stable')
+    positions = np.searchsorted(ranked_ids, candidates, sorter=sorter)
+    positions = np.clip(positions, 0, len(ranked_ids) - 1)
+    found = ranked_ids[sorter[positions]] == candidates
+    ranks[found] = sorter[positions[found]]
+    return ranks
+
+
+def _calibrated(scores: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+    """Similarity of each candidate in [0, 1]; candidates a retriever did not return get its lowest returned score"""
+    if len(scores) == 0:
+        return np.zeros(len(ranks), dtype='float32')
+    clipped = np.clip(scores, 0.0, 1.0)
+    return np.where(ranks >= 0, clipped[np.maximum(ranks, 0)], clipped.min())
+
+
+def dense_relevance(section_ids: np.ndarray, dense_ids: np.ndarray, dense_scores: np.ndarray) -> np.ndarray:
+    """Query similarity of each section on the dense cosine scale, for absolute relevance cut-offs.
+
+    Fused scores rank well but are not comparable across queries (under RRF they only encode
+    ranks: a section only one retriever returned, second, scores 0.49). This is the dense
+    score where the dense retriever returned the section, otherwise its lowest returned score,
+    which bounds the section's similarity from above.
+    """
+    section_ids = np.asarray(section_ids, dtype='int64')
+    dense_ids = np.asarray(dense_ids, dtype='int64')
+    return _calibrated(np.asarray(dense_scores, dtype='float32'), _ranks_in(section_ids, dense_ids)).astype('float32')
+
+
+def fuse_rankings(dense_ids: np.ndarray, dense_scores: np.ndarray,
+                  sparse_ids: np.ndarray, sparse_scores: np.ndarray,
+                  config: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Fuse two best-first rankings of section ids into one, in a single vectorised pass.
+
+    Both score arrays are "higher is better": dense cosine similarities and sparse BM25
+    scores that the caller has divided by the query's best BM25 score. Returns
+    (ids, scores) sorted by fused score, descending, with every score in [0, 1]:
+
+    - ``rrf``: reciprocal rank fusion, sum of 1 / (rrf_k + rank) over the retrievers, scaled so
+      that a section ranked first by both retrievers scores 1.0. Only ranks matter, so the two
+      score scales never have to be compared.
+    - ``weighted``: dense_weight * dense + (1 - dense_weight) * sparse over scores clipped to
+      [0, 1]; a candidate missing from one list is given that list's lowest returned score.
+
+    Use fused scores for ordering; thresholds belong on dense_relevance.
+    """
+    config = resolve_fusion_config(config)
+    dense_ids = np.asarray(dense_ids, dtype='int64')
+    sparse_ids = np.asarray(sparse_ids, dtype='int64')
+    candidates = np.unique(np.concatenate([dense_ids, sparse_ids]))
+    if len(candidates) == 0:
+        return candidates, np.zeros(0, dtype='float32')
+
+    dense_ranks = _ranks_in(candidates, dense_ids)
+    sparse_ranks = _ranks_in(candidates, sparse_ids)
+
+    if config["mode"] == "weighted":
+        weight = float(config["dense_weight"])
+        fused = (weight * _calibrated(np.asarray(dense_scores, dtype='float32'), dense_ranks)
+                 + (1.0 - weight) * _calibrated(np.asarray(sparse_scores, dtype='float32'), sparse_ranks))
+    else:
+        rrf_k = float(config["rrf_k"])
+        fused = (np.where(dense_ranks >= 0, 1.0 / (rrf_k + dense_ranks + 1), 0.0)
+                 + np.where(sparse_ranks >= 0, 1.0 / (rrf_k + sparse_ranks + 1), 0.0))
+        fused = fused * (rrf_k + 1) / 2.0
+
+    order = np.argsort(-fused, kind='stable')
+    return candidates[order], fused[order].astype('float32')
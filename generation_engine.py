@@ -5,16 +5,27 @@ import re
 from openai import OpenAI
 import streamlit as st # For st.error, st.warning
 from typing import List, Dict, Any, Tuple, Optional
-from utils import remove_problematic_chars # Assuming utils.py is in the same directory
+from utils import remove_problematic_chars, remove_problematic_chars_many # Assuming utils.py is in the same directory
 from document_processing import extract_sections_from_rfp # Assuming document_processing.py is in the same directory
 from knowledge_base import ProposalKnowledgeBase # For type hinting and potential direct use if necessary, or pass kb instance
 from sklearn.feature_extraction.text import TfidfVectorizer # For identify_gaps_and_risks
 from sklearn.metrics.pairwise import cosine_similarity # For identify_gaps_and_risks
 # expand_query might be called from here, ensure it's accessible (e.g., from knowledge_base.py or utils.py)
 from knowledge_base import expand_query
+from search_hits import SearchHit
+from text_cleaner import mark_clean
 
 
 
+def source_label(document: Dict[str, Any]) -> str:
+    """Filename of a KB result, plus the other proposals a collapsed boilerplate section came from"""
+    filename = remove_problematic_chars(document.get('filename', ''))
+    others = sorted({source['filename'] for source in document.get('sources', [])[1:]} - {document.get('filename')})
+    if others:
+        return f"{filename} (also in {', '.join(remove_problematic_chars(name) for name in others)})"
+    return filename
+
+
 class SpecialistRAGDrafter:
     def __init__(self, openai_key=None):
         self.client = OpenAI(api_key=openai_key or os.environ.get("OPENAI_API_KEY"))
@@ -26,8 +37,9 @@ class SpecialistRAGDrafter:
         cleaned_client_name = remove_problematic_chars(client_name) if client_name else ""
 
         kb_blob = "\n\n".join([
-            f"--- {('Very Relevant' if item['score']>0.7 else 'Relevant')} PAST PROPOSAL ---\n"
-            f"From: {remove_problematic_chars(item['document']['filename'])} | Section: {remove_problematic_chars(item['document']['section_name'])}\n"
+            # relevance: cosine-scale similarity (fused scores are rank-based, see fusion.dense_relevance)
+            f"--- {('Very Relevant' if item.get('relevance', item['score'])>0.7 else 'Relevant')} PAST PROPOSAL ---\n"
+            f"From: {source_label(item['document'])} | Section: {remove_problematic_chars(item['document']['section_name'])}\n"
             f"{remove_problematic_chars(item['document']['content'])}"
             for item in relevant_kb_content
         ])
@@ -550,8 +562,8 @@ class EnhancedProposalGenerator:
             mandatory_criteria = []
             for line in requirements_text.split('\n'):
                 if line.strip() and ("must" in line.lower() or "required" in line.lower()):
-                    # Clean each extracted criterion
-                    mandatory_criteria.append(remove_problematic_chars(line.strip()))
+                    # A line of the cleaned analysis: clean already
+                    mandatory_criteria.append(mark_clean(line.strip()))
 
             return mandatory_criteria
         except:
@@ -571,7 +583,7 @@ class EnhancedProposalGenerator:
                 if line.strip():
                     match = re.match(r'^(.*?)(\s+\((\d+)%\))?', line.strip())
                     if match:
-                        criterion = remove_problematic_chars(match.group(1).strip()) # Clean criterion text
+                        criterion = mark_clean(match.group(1).strip()) # Part of the cleaned analysis
                         weight = int(match.group(3)) if match.group(3) else 100 # Default to 100 if weight not specified
                         weighted_criteria.append((criterion, weight))
             # Default weights if none are found explicitly in RFP analysis
@@ -596,8 +608,8 @@ class EnhancedProposalGenerator:
             deadlines = []
             for line in timeline_text.split('\n'):
                 if line.strip() and any(term in line.lower() for term in ["deadline", "date", "due"]):
-                    # Clean each extracted deadline
-                    deadlines.append(remove_problematic_chars(line.strip()))
+                    # A line of the cleaned analysis: clean already
+                    deadlines.append(mark_clean(line.strip()))
 
             return deadlines
         except:
@@ -615,8 +627,8 @@ class EnhancedProposalGenerator:
             deliverables = []
             for line in deliverables_text.split('\n'):
                 if line.strip():
-                    # Clean each extracted deliverable
-                    deliverables.append(remove_problematic_chars(line.strip()))
+                    # A line of the cleaned analysis: clean already
+                    deliverables.append(mark_clean(line.strip()))
 
             return deliverables
         except:
@@ -633,7 +645,7 @@ class EnhancedProposalGenerator:
 
             # Ensure internal capabilities strings are cleaned
             cleaned_internal_capabilities = {
-                key: [remove_problematic_chars(item) for item in value]
+                key: remove_problematic_chars_many(value)
                 for key, value in internal_capabilities.items()
             }
 
@@ -678,8 +690,8 @@ class EnhancedProposalGenerator:
             sections_start = cleaned_rfp_analysis.find("REQUIRED SECTIONS") + len("REQUIRED SECTIONS")
             sections_end = cleaned_rfp_analysis.find("\n\n", sections_start)
             sections_text = cleaned_rfp_analysis[sections_start:sections_end].strip()
-            # Clean each extracted section name
-            sections = [remove_problematic_chars(s.strip()) for s in sections_text.split("\n") if s.strip()]
+            # Lines of the cleaned analysis: marked clean, not cleaned again
+            sections = [mark_clean(s.strip()) for s in sections_text.split("\n") if s.strip()]
             return sections
         except:
             return []
@@ -699,14 +711,17 @@ class EnhancedProposalGenerator:
         cleaned_evaluation_criteria = remove_problematic_chars(evaluation_criteria) if evaluation_criteria else ""
         cleaned_client_name = remove_problematic_chars(client_name) if client_name else ""
 
-        # relevant_kb_content is a list of dicts; ensure content within is cleaned
+        # KB search hits (search_hits.SearchHit) carry content cleaned once at ingest and are used as they are;
+        # plain result dicts from other callers are cleaned into new dicts, never edited in place
         cleaned_relevant_kb_content = []
         for item in relevant_kb_content:
-            if isinstance(item, dict) and 'document' in item and isinstance(item['document'], dict):
-                 item['document']['filename'] = remove_problematic_chars(item['document'].get('filename', ''))
-                 item['document']['section_name'] = remove_problematic_chars(item['document'].get('section_name', ''))
-                 item['document']['content'] = remove_problematic_chars(item['document'].get('content', ''))
-                 cleaned_relevant_kb_content.append(item)
+            if isinstance(item, SearchHit):
+                cleaned_relevant_kb_content.append(item)
+            elif isinstance(item, dict) and isinstance(item.get('document'), dict):
+                document = dict(item['document'])
+                for key in ('filename', 'section_name', 'content'):
+                    document[key] = remove_problematic_chars(document.get(key, ''))
+                cleaned_relevant_kb_content.append({**item, 'document': document})
             # else: skip malformed items
 
 
@@ -722,12 +737,28 @@ class EnhancedProposalGenerator:
             else:
                 try:
                     prices = self.kb.extract_pricing_from_kb() # Method returns list of ints
-                    if prices:
+                    if prices and hasattr(self.kb, 'pricing_summary'):
+                        # Precomputed per currency and service type; no KB files are read here
+                        by_service = self.kb.pricing_summary(group_by_service=True)
+                        lines = [
+                            f"- {currency}: {stats['count']} quoted amounts from {stats['min']:,.0f} "
+                            f"to {stats['max']:,.0f}, median {stats['median']:,.0f} {currency}"
+                            for (currency,), stats in self.kb.pricing_summary().items()
+                        ]
+                        lines += [
+                            f"  - {service_type}: median {stats['median']:,.0f} {currency} ({stats['count']} amounts)"
+                            for (currency, service_type), stats in by_service.items()
+                        ]
+                        pricing_block = (
+                            f"\n\n## PRICING INSIGHT\n"
+                            f"Prices quoted in the commercial sections of past proposals:\n" + "\n".join(lines)
+                        )
+                    elif prices:
                         avg = sum(prices) / len(prices)
                         pricing_block = (
                             f"\n\n## PRICING INSIGHT\n"
-                            f"Based on {len(prices)} past proposals, prices ranged from ₹{min(prices):,} "
-                            f"to ₹{max(prices):,}, with an average of ₹{avg:,.0f}."
+                            f"Based on {len(prices)} past proposals, prices ranged from {min(prices):,} "
+                            f"to {max(prices):,}, with an average of {avg:,.0f}."
                         )
                     else:
                         pricing_block = "\n\n## PRICING INSIGHT\nNo past pricing data found in KB."
@@ -739,12 +770,13 @@ class EnhancedProposalGenerator:
         else:
              prices = [] # Ensure prices is defined if not a pricing section
 
-        # Prepare KB items string from the cleaned list
+        # Prepare KB items string from the cleaned list. The cut-offs are on the cosine scale they were
+        # tuned for: KB hits carry it as 'relevance' (fused scores only encode ranks); plain dicts use 'score'
         kb_items = "\n\n".join([
-             f"--- {('Very Relevant' if item.get('score', 0)>0.8 else 'Relevant')} PAST PROPOSAL ---\n"
-             f"From: {item['document']['filename']} | Section: {item['document']['section_name']}\n"
+             f"--- {('Very Relevant' if item.get('relevance', item.get('score', 0))>0.8 else 'Relevant')} PAST PROPOSAL ---\n"
+             f"From: {source_label(item['document'])} | Section: {item['document']['section_name']}\n"
              f"{item['document']['content']}" # Content is already cleaned
-             for item in cleaned_relevant_kb_content if item.get('score', 0) >= 0.5
+             for item in cleaned_relevant_kb_content if item.get('relevance', item.get('score', 0)) >= 0.5
         ])[:2000] # Limit length
 
         # Ensure all parts of the prompt are cleaned strings
@@ -766,7 +798,7 @@ class EnhancedProposalGenerator:
         {cleaned_differentiators}
 
         REFERENCE MATERIAL:
-        {remove_problematic_chars(kb_items)}
+        {kb_items}
 
         GENERATION INSTRUCTIONS:
         1. Address RFP requirements for '{cleaned_section_name}'.
@@ -1100,7 +1132,7 @@ class EnhancedProposalGenerator:
 
         # --- ADDED CHECK ---
         # Check if the Knowledge Base is initialized and has the required methods
-        if not self.kb or not hasattr(self.kb, 'multi_hop_search') or not hasattr(self.kb, 'extract_pricing_from_kb'):
+        if not self.kb or not hasattr(self.kb, 'multi_hop_search_many') or not hasattr(self.kb, 'extract_pricing_from_kb'):
             st.error("Knowledge Base is not properly initialized within the Proposal Generator. Cannot generate full proposal.")
             # Return an error structure consistent with the expected output
             return {
@@ -1157,25 +1189,30 @@ class EnhancedProposalGenerator:
         # Extract sections from the cleaned RFP text once before the loop
         rfp_sections_content_map = extract_sections_from_rfp(cleaned_rfp_text)
 
+        # Resolve the RFP content and KB query for every section first, so the KB can
+        # retrieve context for the whole proposal in one batched call
+        section_inputs = []
         for section_name in required_sections: # required_sections are already cleaned
-            print(f"Generating section: {section_name}")
-
             # Find corresponding RFP section content (case-insensitive matching)
             rfp_section_content_for_llm = next((content for rfp_sec_name, content in rfp_sections_content_map.items() if section_name.lower() in rfp_sec_name.lower() or rfp_sec_name.lower() in section_name.lower()), "")
             # Content is already cleaned by extract_sections_from_rfp
 
             cleaned_rfp_section_content = remove_problematic_chars(rfp_section_content_for_llm) if rfp_section_content_for_llm else ""
             expanded_query = expand_query(section_name + " " + cleaned_rfp_section_content)
+            section_inputs.append((section_name, cleaned_rfp_section_content, expanded_query))
 
-            # --- ADDED TRY-EXCEPT around KB search ---
-            relevant_kb_content = [] # Default to empty list
-            try:
-                # Assuming self.kb was validated at the start of the method
-                relevant_kb_content = self.kb.multi_hop_search(expanded_query, k=3) # multi_hop_search returns cleaned content
-            except Exception as kb_error:
-                st.error(f"Error searching Knowledge Base for section '{section_name}': {kb_error}")
-                # Continue generation with empty KB content
-            # --- END TRY-EXCEPT ---
+        # --- ADDED TRY-EXCEPT around KB search ---
+        kb_results_per_section = [[] for _ in section_inputs] # Default to empty lists
+        try:
+            # Assuming self.kb was validated at the start of the method
+            kb_results_per_section = self.kb.multi_hop_search_many([query for _, _, query in section_inputs], k=3) # returns cleaned content
+        except Exception as kb_error:
+            st.error(f"Error searching Knowledge Base for proposal sections: {kb_error}")
+            # Continue generation with empty KB content
+        # --- END TRY-EXCEPT ---
+
+        for (section_name, cleaned_rfp_section_content, _), relevant_kb_content in zip(section_inputs, kb_results_per_section):
+            print(f"Generating section: {section_name}")
 
             # Call generate_section (which now also has KB checks for pricing)
             # All inputs passed here should be cleaned versions
@@ -1307,7 +1344,7 @@ class EnhancedProposalGenerator:
         # Clean proposal section names (keys) for sending to LLM
         cleaned_proposal_sections_keys = [remove_problematic_chars(name) for name in proposal_data["sections"].keys()]
         cleaned_internal_capabilities = {
-            key: [remove_problematic_chars(item) for item in value]
+            key: remove_problematic_chars_many(value)
             for key, value in internal_capabilities.items()
         }
         cleaned_client_name = remove_problematic_chars(client_name) if client_name else ""
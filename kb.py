@@ -0,0 +1,61 @@
+"""Command line tools for the proposal knowledge base.
+
+Usage:
+    python kb.py build [--kb-dir DIR] [--model NAME] [--backend NAME] [--backend-options JSON] [--artifact-dir DIR]
+"""
+import sys
+import json
+import time
+import argparse
+from utils import load_config
+from knowledge_base import ProposalKnowledgeBase
+from embedding_backends import EMBEDDING_BACKENDS
+
+
+def build(args, kb_config):
+    """Embed the corpus and write a memory-mappable artifact that the app opens at startup"""
+    # Always build from the markdown files, never from a previous artifact
+    build_config = dict(kb_config, use_artifact=False)
+    if args.artifact_dir:
+        build_config["artifact_dir"] = args.artifact_dir
+    # The app only opens an artifact whose vectors its own model would produce, so the
+    # backend and its options default to the app's config (knowledge_base -> embedding_backend*)
+    build_config["embedding_backend"] = args.backend
+    build_config["embedding_backend_options"] = args.backend_options
+    if (args.backend, args.backend_options) != (kb_config.get("embedding_backend", "torch"), kb_config.get("embedding_backend_options") or {}):
+        print(f"Building with embedding backend '{args.backend}' {args.backend_options}; config.json asks for "
+              f"'{kb_config.get('embedding_backend', 'torch')}' {kb_config.get('embedding_backend_options') or {}}, "
+              f"so the app will not open this artifact until they match.")
+
+    start = time.time()
+    kb = ProposalKnowledgeBase(args.kb_dir, args.model, build_config)
+    if not kb.documents:
+        print(f"No .md or .txt files found in {args.kb_dir}; nothing to build.")
+        return 1
+    build_dir = kb.build_artifact()
+    print(f"Built KB artifact {build_dir}: {len(kb.file_hashes)} files, {len(kb.documents)} sections in {time.time() - start:.1f}s")
+    return 0
+
+
+def main(argv=None):
+    kb_config = load_config().get("knowledge_base", {})
+
+    parser = argparse.ArgumentParser(description="Proposal knowledge base tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build the prebuilt index artifact from the knowledge base directory")
+    build_parser.add_argument("--kb-dir", default=kb_config.get("directory", "markdown_responses"))
+    build_parser.add_argument("--model", default=kb_config.get("embedding_model", "all-MiniLM-L6-v2"))
+    build_parser.add_argument("--backend", default=kb_config.get("embedding_backend", "torch"), choices=EMBEDDING_BACKENDS,
+                              help="Embedding inference backend; the app must use the same one to open the artifact")
+    build_parser.add_argument("--backend-options", type=json.loads, default=kb_config.get("embedding_backend_options") or {},
+                              help="JSON object of backend options (see embedding_backends.py); defaults to the config's")
+    build_parser.add_argument("--artifact-dir", default=kb_config.get("artifact_dir"))
+    build_parser.set_defaults(func=build)
+
+    args = parser.parse_args(argv)
+    return args.func(args, kb_config)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import shutil
+import numpy as np
+import faiss
+from datetime import datetime
+from typing import Dict, Any, Optional
+from kb_files import content_hash, read_corpus_file, is_corpus_file
+from sparse_index import BM25Index, BM25_ARRAYS
+
+# Bump whenever the on-disk layout changes; older artifacts are then ignored and rebuilt
+ARTIFACT_FORMAT_VERSION = 7
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "faiss.index"
+DOCUMENTS_FILE = "documents.json"
+SECTION_MAP_FILE = "section_map.json"
+BM25_VOCABULARY_FILE = "bm25_vocabulary.json"
+PROPOSAL_VECTORS_FILE = "proposal_vectors.npy"
+CHUNK_ARRAYS = ("doc_ids", "starts", "ends")
+
+# Number of older builds kept next to the current one, so processes that still
+# have them memory-mapped are not pulled out from under
+KEEP_PREVIOUS_BUILDS = 1
+# A <build>.tmp directory is another build still being written, unless it is older than
+# this (left behind by a build that crashed)
+ABANDONED_BUILD_SECONDS = 24 * 3600
+
+
+def corpus_fingerprint(kb_directory: str) -> Dict[str, str]:
+    """Map every knowledge base file to the content hash of its text"""
+    if not os.path.exists(kb_directory):
+        return {}
+    return {
+        filename: content_hash(read_corpus_file(os.path.join(kb_directory, filename)))
+        for filename in sorted(os.listdir(kb_directory)) if is_corpus_file(filename)
+    }
+
+
+def current_build_dir(artifact_dir: str) -> Optional[str]:
+    """Directory of the build that CURRENT points to, or None if there is no usable build"""
+    current_path = os.path.join(artifact_dir, CURRENT_FILE)
+    if not os.path.exists(current_path):
+        return None
+    with open(current_path, 'r') as f:
+        build_id = f.read().strip()
+    build_dir = os.path.join(artifact_dir, build_id)
+    return build_dir if build_id and os.path.isdir(build_dir) else None
+
+
+def read_manifest(build_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(build_dir, MANIFEST_FILE), 'r') as f:
+        return json.load(f)
+
+
+def write_artifact(kb, artifact_dir: str, file_hashes: Optional[Dict[str, str]] = None,
+                   build_settings: Optional[Dict[str, Any]] = None) -> str:
+    """Write the in-memory state of ``kb`` as a new versioned build under ``artifact_dir``.
+
+    Each build gets its own directory; the ``CURRENT`` pointer file is switched with an
+    atomic rename once the build is complete, so readers never open a half-written build.
+    Returns the build directory.
+    """
+    if kb.index is None or not kb.documents:
+        raise ValueError("Knowledge base is empty; nothing to write.")
+
+    file_hashes = file_hashes if file_hashes is not None else corpus_fingerprint(kb.kb_directory)
+    build_id = datetime.now().strftime("%Y%m%d%H%M%S%f") + "-" + content_hash(json.dumps(file_hashes, sort_keys=True))[:8]
+    build_dir = os.path.join(artifact_dir, build_id)
+    tmp_dir = build_dir + ".tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    faiss.write_index(kb.index, os.path.join(tmp_dir, INDEX_FILE))
+
+    with open(os.path.join(tmp_dir, DOCUMENTS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(kb.documents, f)
+    with open(os.path.join(tmp_dir, SECTION_MAP_FILE), 'w', encoding='utf-8') as f:
+        json.dump(kb.section_map, f)
+
+    # Chunk table: parent section id (-1 when removed) and character span of every chunk
+    spans = np.array(kb.chunk_spans, dtype='int64').reshape(-1, 2)
+    chunk_arrays = {"doc_ids": np.array(kb.chunk_doc_ids, dtype='int64'), "starts": spans[:, 0], "ends": spans[:, 1]}
+    for name in CHUNK_ARRAYS:
+        np.save(os.path.join(tmp_dir, f"chunk_{name}.npy"), chunk_arrays[name])
+
+    # BM25: vocabulary in term id order plus the compacted postings
+    bm25_arrays, bm25_vocabulary, bm25_stats = kb.sparse_index.to_arrays()
+    with open(os.path.join(tmp_dir, BM25_VOCABULARY_FILE), 'w', encoding='utf-8') as f:
+        json.dump(bm25_vocabulary, f)
+    for name in BM25_ARRAYS:
+        np.save(os.path.join(tmp_dir, f"bm25_{name}.npy"), bm25_arrays[name])
+
+    # Document-level (one per file) embeddings for two-stage search; row i is proposal id i
+    np.save(os.path.join(tmp_dir, PROPOSAL_VECTORS_FILE), kb.proposal_vectors())
+
+    manifest = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "build_id": build_id,
+        "created_at": datetime.now().isoformat(),
+        "embedding_model": kb.model.cache_key, # model name, plus the backend (and its options) unless torch
+        "num_documents": sum(1 for doc in kb.documents if doc is not None),
+        "dimension": kb.index.d,
+        "settings": build_settings or {},
+        "bm25": bm25_stats,
+        "files": file_hashes,
+        # Raw filename -> section ids; the documents only carry the cleaned filename
+        "file_documents": kb.file_documents,
+        "proposal_files": kb.proposal_files,
+        # Near-duplicate section id -> canonical section id; duplicates have no chunks
+        "near_duplicates": kb.near_duplicates.to_mapping(),
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    os.rename(tmp_dir, build_dir)
+    current_tmp = os.path.join(artifact_dir, CURRENT_FILE + ".tmp")
+    with open(current_tmp, 'w') as f:
+        f.write(build_id)
+    os.replace(current_tmp, os.path.join(artifact_dir, CURRENT_FILE))
+
+    _remove_old_builds(artifact_dir, keep={build_id})
+    return build_dir
+
+
+def _remove_old_builds(artifact_dir: str, keep):
+    """Prune finished builds other than ``keep``, CURRENT and the KEEP_PREVIOUS_BUILDS newest.
+
+    Another 'kb.py build' may be writing its <build>.tmp directory (or may have just moved
+    CURRENT to its own build) at the same time, so neither is touched; only .tmp directories
+    older than ABANDONED_BUILD_SECONDS are treated as left over and removed.
+    """
+    current = current_build_dir(artifact_dir)
+    keep = set(keep) | ({os.path.basename(current)} if current else set())
+    builds = []
+    for name in os.listdir(artifact_dir):
+        path = os.path.join(artifact_dir, name)
+        if not os.path.isdir(path) or name in keep:
+            continue
+        if name.endswith(".tmp"):
+            try:
+                abandoned = time.time() - os.path.getmtime(path) > ABANDONED_BUILD_SECONDS
+            except OSError:
+                continue # finished (renamed) or removed meanwhile
+            if abandoned:
+                shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            builds.append(name)
+    builds.sort() # build ids start with their creation time
+    stale = builds[:-KEEP_PREVIOUS_BUILDS] if KEEP_PREVIOUS_BUILDS else builds
+    for name in stale:
+        shutil.rmtree(os.path.join(artifact_dir, name), ignore_errors=True)
+
+
+def open_artifact(build_dir: str, bm25_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Open a build with memory-mapping; nothing is re-embedded or refitted.
+
+    The FAISS index and the BM25 postings are mapped read-only, so several processes
+    opening the same build share the same physical pages.
+    """
+    manifest = read_manifest(build_dir)
+
+    mmap_flags = faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    index = faiss.read_index(os.path.join(build_dir, INDEX_FILE), mmap_flags)
+
+    with open(os.path.join(build_dir, DOCUMENTS_FILE), 'r', encoding='utf-8') as f:
+        documents = json.load(f)
+    with open(os.path.join(build_dir, SECTION_MAP_FILE), 'r', encoding='utf-8') as f:
+        section_map = json.load(f)
+    with open(os.path.join(build_dir, BM25_VOCABULARY_FILE), 'r', encoding='utf-8') as f:
+        vocabulary = json.load(f)
+
+    arrays = {name: np.load(os.path.join(build_dir, f"bm25_{name}.npy"), mmap_mode='r') for name in BM25_ARRAYS}
+    chunks = {name: np.load(os.path.join(build_dir, f"chunk_{name}.npy")) for name in CHUNK_ARRAYS}
+    sparse_index = BM25Index.from_arrays(arrays, vocabulary, manifest["bm25"], bm25_config)
+
+    return {
+        "manifest": manifest,
+        "index": index,
+        "documents": documents,
+        "section_map": section_map,
+        "sparse_index": sparse_index,
+        "proposal_vectors": np.load(os.path.join(build_dir, PROPOSAL_VECTORS_FILE)),
+        "chunk_doc_ids": chunks["doc_ids"].tolist(),
+        "chunk_spans": list(zip(chunks["starts"].tolist(), chunks["ends"].tolist())),
+    }
+
+
+def find_fresh_build(artifact_dir: str, kb_directory: str, embedding_model: str,
+                     build_settings: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Return the current build if it matches the corpus and model, otherwise None (with the reason printed)"""
+    build_dir = current_build_dir(artifact_dir)
+    if build_dir is None:
+        return None
+    try:
+        manifest = read_manifest(build_dir)
+    except Exception as e:
+        print(f"Could not read KB artifact manifest in {build_dir}: {e}")
+        return None
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        print(f"KB artifact {build_dir} has format {manifest.get('format_version')}, expected {ARTIFACT_FORMAT_VERSION}.")
+        return None
+    if manifest.get("embedding_model") != embedding_model:
+        print(f"KB artifact {build_dir} was built with {manifest.get('embedding_model')}, not {embedding_model}.")
+        return None
+    if manifest.get("settings") != (build_settings or {}):
+        print(f"KB artifact {build_dir} was built with settings {manifest.get('settings')}; the config asks for {build_settings}.")
+        return None
+    if manifest.get("files") != corpus_fingerprint(kb_directory):
+        print(f"KB artifact {build_dir} is out of date with {kb_directory}. Run 'python kb.py build' to refresh it.")
+        return None
+    return build_dir
@@ -0,0 +1,20 @@
+import hashlib
+
+# Reading and hashing knowledge base files. Standard library only: kb_ingest's pool
+# workers import this, and every heavy import here (numpy, faiss, sklearn) would be paid
+# again by each spawned worker before it reads a single file.
+
+
+def content_hash(text: str) -> str:
+    """Stable SHA-256 hex digest of an (already cleaned) text"""
+    return hashlib.sha256(text.encode('utf-8', errors='replace')).hexdigest()
+
+
+def read_corpus_file(file_path: str) -> str:
+    """Read a knowledge base file exactly the way ProposalKnowledgeBase.load_documents does"""
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as file:
+        return file.read()
+
+
+def is_corpus_file(filename: str) -> bool:
+    return filename.endswith('.md') or filename.endswith('.txt')
@@ -0,0 +1,142 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+# Standard library modules only (text_cleaner, not utils; kb_files, not kb_artifact or
+# embedding_cache): spawned workers import this module, and numpy/faiss/sklearn/streamlit
+# would cost each of them seconds before it reads a file
+from text_cleaner import clean_text, mark_clean
+from kb_files import content_hash, read_corpus_file
+
+# Corpus bytes each worker must have to earn its start-up. A spawned worker re-imports the
+# parent's __main__ (app.py or kb.py, which load faiss and sklearn): seconds per process,
+# while reading and cleaning runs at about 30 MB/s in-process. Smaller corpora run serially.
+MIN_BYTES_PER_WORKER = 128 * 1024 * 1024
+
+
+def split_into_sections(content: str) -> Dict[str, str]:
+    """Split a document into sections based on '# ' and '## ' headers.
+
+    ``content`` must already be cleaned; headers and bodies are slices of it, so they are clean too.
+    """
+    sections = {}
+    current_section = "Introduction"
+    current_content = []
+
+    for line in content.split('\n'):
+        if line.startswith('# '):
+            if current_content:
+                sections[current_section] = '\n'.join(current_content)
+                current_content = []
+            current_section = line[2:].strip()
+        elif line.startswith('## '):
+            if current_content:
+                sections[current_section] = '\n'.join(current_content)
+                current_content = []
+            current_section = line[3:].strip()
+        else:
+            current_content.append(line)
+
+    if current_content:
+        sections[current_section] = '\n'.join(current_content)
+
+    return sections
+
+
+def make_section_documents(filename: str, content: str) -> List[Dict[str, Any]]:
+    """Clean one file once and split it into section documents (without ids)"""
+    cleaned_content = clean_text(content)
+    cleaned_filename = clean_text(filename)
+
+    metadata = {
+        "client_industry": "general",
+        "proposal_success": True,
+        "project_size": "medium",
+        "key_differentiators": ["quality", "experience"]
+    }
+    if "_success_" in cleaned_filename:
+        metadata["proposal_success"] = cleaned_filename.split("_success_")[1].split("_")[0] == "True"
+    if "_industry_" in cleaned_filename:
+        metadata["client_industry"] = cleaned_filename.split("_industry_")[1].split("_")[0]
+    if "_size_" in cleaned_filename:
+        metadata["project_size"] = cleaned_filename.split("_size_")[1].split("_")[0]
+
+    return [
+        {
+            "filename": cleaned_filename,
+            # Slices of the cleaned file: marked clean so later steps do not clean them again
+            "section_name": mark_clean(section_name),
+            "content": mark_clean(section_content),
+            # Each section gets its own copy so later edits to one do not leak into the others
+            "metadata": {**metadata, "key_differentiators": list(metadata["key_differentiators"])},
+        }
+        for section_name, section_content in split_into_sections(cleaned_content).items()
+    ]
+
+
+def ingest_file(kb_directory: str, filename: str) -> Dict[str, Any]:
+    """Read, hash, clean and section one KB file. Runs in a worker process, so it only
+    returns plain picklable data."""
+    file_path = os.path.join(kb_directory, filename)
+    started = time.perf_counter()
+    content = read_corpus_file(file_path) # utf-8 with errors='replace'
+    stat = os.stat(file_path)
+    read_done = time.perf_counter()
+    documents = make_section_documents(filename, content)
+    finished = time.perf_counter()
+    return {
+        "filename": filename,
+        "file_hash": content_hash(content),
+        "stat": (stat.st_mtime_ns, stat.st_size),
+        "documents": documents,
+        "timing": {
+            "read_s": read_done - started,
+            "clean_split_s": finished - read_done,
+            "chars": len(content),
+            "sections": len(documents),
+            "pid": os.getpid(),
+        },
+    }
+
+
+def _ingest_batch(kb_directory: str, filenames: List[str]) -> List[Dict[str, Any]]:
+    return [ingest_file(kb_directory, filename) for filename in filenames]
+
+
+def ingest_directory(kb_directory: str, filenames: List[str], workers: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Ingest ``filenames`` across a process pool; results come back in the order given.
+
+    ``workers`` caps the pool (default: the number of cores); the pool only gets one worker
+    per MIN_BYTES_PER_WORKER of corpus, so a typical KB is read in-process. 1 always runs serially.
+    Returns (results, stats) where stats carries the wall time and per-file timings.
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    total_bytes = sum(os.path.getsize(os.path.join(kb_directory, filename)) for filename in filenames)
+    workers = max(1, min(int(workers), len(filenames), total_bytes // MIN_BYTES_PER_WORKER))
+
+    results = None
+    if workers > 1:
+        # Contiguous batches, a few per worker to even out file sizes; map() keeps them in order
+        batch_size = max(1, len(filenames) // (workers * 4))
+        batches = [filenames[i:i + batch_size] for i in range(0, len(filenames), batch_size)]
+        try:
+            # spawn, not fork: this runs from Streamlit script threads and the kb-rebuild thread
+            # while the embedding model is loaded (see kb_snapshots.py)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                results = [result for batch in pool.map(_ingest_batch, [kb_directory] * len(batches), batches) for result in batch]
+        except (OSError, RuntimeError) as e:
+            # e.g. no /dev/shm or a sandbox that cannot start processes; the serial path gives the same result
+            print(f"Parallel KB ingestion unavailable ({e}); loading files serially.")
+    if results is None:
+        workers = 1
+        results = _ingest_batch(kb_directory, filenames)
+
+    stats = {
+        "workers": workers,
+        "bytes": total_bytes,
+        "wall_s": time.perf_counter() - started,
+        "files": {result["filename"]: result["timing"] for result in results},
+    }
+    return results, stats
@@ -0,0 +1,165 @@
+import os
+import json
+import weakref
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+from knowledge_base import HierarchicalEmbeddingModel
+from kb_snapshots import KnowledgeBaseSnapshots
+
+# One knowledge base (and one copy of each embedding model) per process, shared by every
+# Streamlit session. Sessions get the snapshot holder (kb_snapshots.py), so a rebuild
+# started by one session is picked up by all of them. Sessions hold a lease; when the last
+# lease on a KB is released the KB is kept around idle so a page reload does not rebuild
+# it, up to MAX_IDLE_KNOWLEDGE_BASES.
+MAX_IDLE_KNOWLEDGE_BASES = 1
+
+_lock = threading.Lock()
+_knowledge_bases: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+_models: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+_idle_order = [] # keys of unreferenced knowledge bases, oldest first
+# Lease releases waiting for the registry lock. Leases are released from weakref finalizers,
+# which the garbage collector can run on any thread, including one that holds _lock, so a
+# release never waits for the lock: it is queued and applied by whoever takes the lock next.
+_pending_releases = deque()
+
+
+def _config_key(value) -> str:
+    return json.dumps(value or {}, sort_keys=True, default=str)
+
+
+def knowledge_base_key(kb_directory: str, embedding_model: str, config: Optional[Dict[str, Any]]) -> Tuple[str, str, str]:
+    """(kb directory, model, settings) - sessions asking for the same triple share one KB"""
+    return (os.path.abspath(kb_directory), embedding_model, _config_key(config))
+
+
+def get_embedding_model(model_name: str, backend: str = "torch", backend_options: Optional[Dict[str, Any]] = None) -> HierarchicalEmbeddingModel:
+    """The process-wide instance of a model/backend pair, loaded on first use.
+
+    The model is loaded outside the registry lock (it takes seconds); sessions asking for
+    the same model meanwhile wait for that load instead of starting their own.
+    """
+    key = (model_name, backend, _config_key(backend_options))
+    with _lock:
+        _drain_releases()
+        entry = _models.get(key)
+        if entry is None:
+            entry = {"model": None, "ready": threading.Event(), "error": None}
+            _models[key] = entry
+            loader = True
+        else:
+            loader = False
+
+    if loader:
+        try:
+            entry["model"] = HierarchicalEmbeddingModel(model_name, backend, backend_options)
+        except Exception as e:
+            entry["error"] = e
+            with _lock:
+                _models.pop(key, None) # let the next session try again
+            raise
+        finally:
+            entry["ready"].set()
+    else:
+        entry["ready"].wait()
+        if entry["error"] is not None:
+            raise entry["error"]
+    return entry["model"]
+
+
+class KnowledgeBaseLease:
+    """A session's hold on a shared knowledge base; release() (or garbage collection of the
+    lease together with the session state) drops the reference"""
+
+    def __init__(self, key: Tuple[str, str, str], kb: KnowledgeBaseSnapshots):
+        self.key = key
+        self.kb = kb
+        self._finalizer = weakref.finalize(self, _release, key)
+
+    @property
+    def released(self) -> bool:
+        return not self._finalizer.alive
+
+    def release(self):
+        self._finalizer() # runs _release at most once
+
+
+def acquire_knowledge_base(kb_directory: str, embedding_model: str, config: Optional[Dict[str, Any]] = None) -> KnowledgeBaseLease:
+    """Lease the shared knowledge base for these settings, building it if no session has yet.
+
+    Sessions arriving while it is being built wait for that build instead of starting their own.
+    """
+    config = config or {}
+    key = knowledge_base_key(kb_directory, embedding_model, config)
+    with _lock:
+        _drain_releases()
+        entry = _knowledge_bases.get(key)
+        if entry is None:
+            entry = {"kb": None, "refcount": 0, "ready": threading.Event(), "error": None}
+            _knowledge_bases[key] = entry
+            builder = True
+        else:
+            builder = False
+        entry["refcount"] += 1
+        if key in _idle_order:
+            _idle_order.remove(key)
+
+    if builder:
+        try:
+            model = get_embedding_model(embedding_model, config.get("embedding_backend", "torch"),
+                                        config.get("embedding_backend_options"))
+            entry["kb"] = KnowledgeBaseSnapshots(kb_directory, embedding_model, config, model=model)
+        except Exception as e:
+            entry["error"] = e
+            with _lock:
+                _knowledge_bases.pop(key, None) # let the next session try again
+            raise
+        finally:
+            entry["ready"].set()
+    else:
+        entry["ready"].wait()
+        if entry["error"] is not None:
+            raise entry["error"]
+    return KnowledgeBaseLease(key, entry["kb"])
+
+
+def _release(key: Tuple[str, str, str]):
+    _pending_releases.append(key)
+    # Never block here (see _pending_releases); if the lock is busy, its holder or the next
+    # acquire applies the release
+    if _lock.acquire(blocking=False):
+        try:
+            _drain_releases()
+        finally:
+            _lock.release()
+
+
+def _drain_releases():
+    """Apply queued lease releases; the caller holds _lock"""
+    while _pending_releases:
+        key = _pending_releases.popleft()
+        entry = _knowledge_bases.get(key)
+        if entry is None:
+            continue
+        entry["refcount"] -= 1
+        if entry["refcount"] > 0:
+            continue
+        _idle_order.append(key)
+        while len(_idle_order) > MAX_IDLE_KNOWLEDGE_BASES:
+            evicted = _idle_order.pop(0)
+            _knowledge_bases.pop(evicted, None)
+            print(f"Released shared knowledge base {evicted[0]} ({evicted[1]})")
+
+
+def registry_stats() -> Dict[str, Any]:
+    """Shared knowledge bases with their reference counts, and the loaded models"""
+    with _lock:
+        _drain_releases()
+        return {
+            "knowledge_bases": [
+                {"kb_directory": key[0], "embedding_model": key[1], "refcount": entry["refcount"],
+                 "ready": entry["ready"].is_set(), "idle": key in _idle_order}
+                for key, entry in _knowledge_bases.items()
+            ],
+            "models": [{"model": key[0], "backend": key[1], "ready": entry["ready"].is_set()} for key, entry in _models.items()],
+        }
@@ -0,0 +1,128 @@
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional
+from knowledge_base import ProposalKnowledgeBase, HierarchicalEmbeddingModel
+
+# Methods that change a knowledge base in place; a published snapshot is never changed,
+# so on the snapshot holder they are refused in favour of refresh()
+MUTATING_METHODS = {"load_documents", "add_document", "update_document", "remove_document", "sync_directory", "batch_updates"}
+
+REBUILD_MODES = ("thread", "process")
+
+
+def build_artifact_in_process(kb_directory: str, embedding_model: str, config: Dict[str, Any]) -> str:
+    """Worker for process rebuilds: embed the corpus and write a new artifact build"""
+    kb = ProposalKnowledgeBase(kb_directory, embedding_model, dict(config, use_artifact=False))
+    return kb.build_artifact()
+
+
+class KnowledgeBaseSnapshots:
+    """Versioned, read-only ProposalKnowledgeBase snapshots behind one reference.
+
+    Attribute access is forwarded to the current snapshot, so this stands in for a
+    ProposalKnowledgeBase (hybrid_search, multi_hop_search_many, ...). refresh() builds the
+    next snapshot in the background and publishes it with a single reference assignment:
+    a search never waits for a rebuild and never sees a half-built index, and searches
+    already running finish on the snapshot they started with. build_artifact() writes its
+    artifact from the next snapshot before it is published, never from the one serving.
+    """
+
+    def __init__(self, kb_directory: str, embedding_model: str, config: Optional[Dict[str, Any]] = None,
+                 model: Optional[HierarchicalEmbeddingModel] = None):
+        self.kb_directory = kb_directory
+        self.embedding_model_name = embedding_model
+        self.config = config or {}
+        self.rebuild_mode = self.config.get("rebuild_mode", "thread")
+        if self.rebuild_mode not in REBUILD_MODES:
+            print(f"Unknown rebuild_mode '{self.rebuild_mode}'. Falling back to 'thread'. Choose one of {', '.join(REBUILD_MODES)}.")
+            self.rebuild_mode = "thread"
+        self._current = ProposalKnowledgeBase(kb_directory, embedding_model, self.config, model=model)
+        self.snapshot_id = 1
+        self._rebuild_lock = threading.Lock() # one rebuild at a time
+        self._rebuild_thread = None
+        self.rebuild_status = {"state": "idle", "snapshot_id": 1, "started_at": None, "duration_s": None, "error": None,
+                               "build_dir": None}
+
+    def snapshot(self) -> ProposalKnowledgeBase:
+        """The current snapshot; hold on to it to make several calls against one version"""
+        return self._current
+
+    def __getattr__(self, name):
+        # Only reached for names not defined on the holder itself
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in MUTATING_METHODS:
+            raise AttributeError(f"Knowledge base snapshots are read-only; '{name}' is not available. "
+                                 f"Change the files in {self.kb_directory} and call refresh().")
+        return getattr(self._current, name)
+
+    @property
+    def rebuilding(self) -> bool:
+        return self._rebuild_thread is not None and self._rebuild_thread.is_alive()
+
+    def refresh(self, wait: bool = False) -> bool:
+        """Rebuild from the KB directory in the background and swap the result in.
+
+        Returns False if a rebuild is already running. With wait=True, returns once the
+        new snapshot is published (or the rebuild failed).
+        """
+        if not self._rebuild_lock.acquire(blocking=False):
+            return False
+        self._start_rebuild()
+        self._rebuild_thread = threading.Thread(target=self._rebuild, name="kb-rebuild", daemon=True)
+        self._rebuild_thread.start()
+        if wait:
+            self._rebuild_thread.join()
+        return True
+
+    def build_artifact(self) -> str:
+        """Rebuild from the KB directory, write the new snapshot's artifact, then publish it.
+
+        Runs in the calling thread (after any rebuild already running). The artifact is written
+        from the new snapshot before the swap, so the serving one is not locked at all.
+        Returns the build directory.
+        """
+        self._rebuild_lock.acquire()
+        self._start_rebuild()
+        self._rebuild(write_artifact=True)
+        if self.rebuild_status["state"] == "failed":
+            raise RuntimeError(f"Knowledge base artifact build failed: {self.rebuild_status['error']}")
+        return self.rebuild_status["build_dir"]
+
+    def _start_rebuild(self):
+        self.rebuild_status = {"state": "building", "snapshot_id": self.snapshot_id, "started_at": time.time(),
+                               "duration_s": None, "error": None, "build_dir": None}
+
+    def _rebuild(self, write_artifact: bool = False):
+        """Build the next snapshot and publish it; the caller holds _rebuild_lock, released here"""
+        started = time.perf_counter()
+        build_dir = None
+        try:
+            if self.rebuild_mode == "process":
+                # Embedding runs outside this interpreter; the new build is then opened memory-mapped.
+                # spawn, not fork: forking a process that holds a loaded model can deadlock
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    build_dir = pool.submit(build_artifact_in_process, self.kb_directory, self.embedding_model_name, self.config).result()
+                config = dict(self.config, use_artifact=True)
+            else:
+                # Unchanged sections come from the embedding cache; only new text is encoded
+                config = self.config
+            snapshot = ProposalKnowledgeBase(self.kb_directory, self.embedding_model_name, config, model=self._current.model)
+            if write_artifact and build_dir is None:
+                # Not published yet: nothing else can be searching it
+                build_dir = snapshot.build_artifact()
+            # The swap: one reference assignment, atomic under the GIL
+            self._current = snapshot
+            self.snapshot_id += 1
+            self.rebuild_status = dict(self.rebuild_status, state="idle", snapshot_id=self.snapshot_id,
+                                       duration_s=time.perf_counter() - started, build_dir=build_dir)
+            print(f"Published knowledge base snapshot {self.snapshot_id} ({len(snapshot.file_hashes)} files) "
+                  f"in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            # Readers keep the previous snapshot
+            print(f"Knowledge base rebuild failed: {e}")
+            self.rebuild_status = dict(self.rebuild_status, state="failed", duration_s=time.perf_counter() - started, error=str(e))
+        finally:
+            self._rebuild_lock.release()
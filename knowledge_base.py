@@ -1,13 +1,27 @@
 import os
-import re
-import glob
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from contextlib import contextmanager
 from typing import List, Dict, Any, Tuple, Optional
-from utils import remove_problematic_chars # Assuming utils.py is in the same directory
+from utils import remove_problematic_chars, remove_problematic_chars_many # Assuming utils.py is in the same directory
+from embedding_cache import EmbeddingCache
+from embedding_backends import load_sentence_transformer, backend_cache_key
+from kb_artifact import find_fresh_build, open_artifact, write_artifact
+from kb_files import content_hash, read_corpus_file, is_corpus_file
+from vector_index import create_vector_index, configure_search, supports_removal, resolve_index_config, describe_index, index_build_signature, search_subset
+from chunking import chunk_spans
+from fusion import fuse_rankings, dense_relevance, resolve_fusion_config
+from query_cache import QueryCache, normalize_query
+from sparse_index import BM25Index, resolve_bm25_config
+from pricing_index import PricingIndex
+from near_duplicates import NearDuplicateIndex
+from section_names import SectionNameIndex
+from metadata_store import MetadataStore, FILTER_FIELDS, load_files_index, files_index_hash, proposal_metadata, normalize_filters
+from reranker import CrossEncoderReranker, resolve_reranker_config
+from kb_ingest import ingest_directory, make_section_documents, split_into_sections
+from rwlock import ReadWriteLock, read_locked, write_locked
+from search_hits import SearchHit, DocumentView
+from text_cleaner import mark_clean
 
 
 
@@ -35,24 +49,16 @@ def expand_query(query: str) -> str:
 
 class HierarchicalEmbeddingModel:
     """Model for hierarchical embeddings (document and section level)"""
-    def __init__(self, model_name: str):
-    # --- CHANGE HERE ---
-    # Explicitly set the device. Use 'cuda' if you have a configured GPU,
-    # otherwise 'cpu' is safer.
-        try:
-            # Try loading directly to CPU first, often resolves this.
-            self.model = SentenceTransformer(model_name, device='cpu') # Modified line
-            print(f"SentenceTransformer loaded on CPU for model: {model_name} (local files only)")
-        except Exception as e:
-            print(f"Error loading SentenceTransformer on CPU with local_files_only=True: {e}. Trying default loading.")
-            # Fallback logic - if you want the fallback to *also* be local-only:
-            try:
-                    self.model = SentenceTransformer(model_name, local_files_only=True) # Add here too
-                    print(f"SentenceTransformer loaded with local_files_only=True (default device)")
-            except Exception as fallback_e:
-                    print(f"Error loading SentenceTransformer even with fallback and local_files_only=True: {fallback_e}")
-                    # Depending on your strictness, you might want to raise an error or handle this failure.
-                    raise fallback_e # Re-raise if strictly local-only loading is mandatory
+    def __init__(self, model_name: str, backend: str = "torch", backend_options: Optional[Dict[str, Any]] = None):
+        # CPU inference; backend picks PyTorch fp32, int8 or ONNX Runtime (see embedding_backends.py)
+        self.model_name = model_name
+        self.backend_options = dict(backend_options or {})
+        self.model, self.backend = load_sentence_transformer(model_name, backend, backend_options)
+
+    @property
+    def cache_key(self) -> str:
+        """Identifies the vectors this model produces (model name plus non-default backend and options)"""
+        return backend_cache_key(self.model_name, self.backend, self.backend_options)
 
     def encode(self, texts: List[str], level: str = 'section') -> np.ndarray:
         """Generate embeddings with different pooling strategies based on level"""
@@ -60,203 +66,862 @@ class HierarchicalEmbeddingModel:
         cleaned_texts = [remove_problematic_chars(text) for text in texts]
 
         if level == 'document':
-            embeddings = self.model.encode(cleaned_texts, convert_to_tensor=True)
-            # Use weighted pooling for document-level embeddings
-            weights = np.linspace(0.1, 1.0, len(embeddings))
-            weighted_embeddings = embeddings * weights[:, np.newaxis]
-            return np.mean(weighted_embeddings, axis=0)
+            # texts are the sections of one document; numpy output so the pooling weights apply
+            return self.pool_document(self.model.encode(cleaned_texts, convert_to_numpy=True))
         else:
             return self.model.encode(cleaned_texts)
 
+    @staticmethod
+    def pool_document(section_embeddings: np.ndarray) -> np.ndarray:
+        """One unit-length vector for a document from its section (or chunk) embeddings, in document order"""
+        section_embeddings = np.asarray(section_embeddings, dtype='float32')
+        section_embeddings = section_embeddings.reshape(-1, section_embeddings.shape[-1])
+        # Use weighted pooling for document-level embeddings
+        weights = np.linspace(0.1, 1.0, len(section_embeddings), dtype='float32')
+        pooled = (section_embeddings * weights[:, np.newaxis]).sum(axis=0) / weights.sum()
+        norm = np.linalg.norm(pooled)
+        return pooled / norm if norm > 0 else pooled
+
+    @property
+    def tokenizer(self):
+        """The model's word-piece tokenizer, used to size chunks (None if unavailable)"""
+        return getattr(self.model, "tokenizer", None)
+
+    @property
+    def max_seq_length(self) -> int:
+        """Tokens the encoder reads before truncating"""
+        return int(getattr(self.model, "max_seq_length", None) or 256)
+
 class ProposalKnowledgeBase:
-    def __init__(self, kb_directory="markdown_responses", embedding_model="all-MiniLM-L6-v2"):
+    def __init__(self, kb_directory="markdown_responses", embedding_model="all-MiniLM-L6-v2", config=None,
+                 model: Optional[HierarchicalEmbeddingModel] = None):
+        # config is the "knowledge_base" block of config.json; every key is optional
+        self.config = config or {}
+        # Searches run concurrently (one KB is shared by every session, see kb_registry.py);
+        # anything that mutates the indexes takes this as the only writer
+        self._rwlock = ReadWriteLock()
         self.kb_directory = kb_directory
-        self.model = HierarchicalEmbeddingModel(embedding_model)
+        self.embedding_model_name = embedding_model
+        self.index_config = resolve_index_config(self.config.get("index"))
+        self.fusion_config = resolve_fusion_config(self.config.get("fusion"))
+        self.bm25_config = resolve_bm25_config(self.config.get("bm25"))
+        # An already loaded model can be passed in so several knowledge bases share one copy
+        self.model = model or HierarchicalEmbeddingModel(embedding_model, self.config.get("embedding_backend", "torch"),
+                                                         self.config.get("embedding_backend_options"))
+        # Chunks must fit the encoder window (minus [CLS]/[SEP]) or their tail is never embedded
+        self.chunk_tokens = min(int(self.config.get("chunk_tokens", 256)), self.model.max_seq_length - 2)
+        self.chunk_overlap = min(int(self.config.get("chunk_overlap", 32)), self.chunk_tokens // 2)
+        self.chunk_fetch_factor = max(1, int(self.config.get("chunk_fetch_factor", 4)))
+        # "hybrid" searches every chunk; "two_stage" first picks the closest proposals
+        # (files) from a small document-level index and then searches only their chunks
+        self.search_mode = self.config.get("search_mode", "hybrid")
+        self.two_stage_documents = max(1, int(self.config.get("two_stage_documents", 5)))
+        # Optional cross-encoder pass over the top retrieval results (see reranker.py)
+        reranker_config = resolve_reranker_config(self.config.get("reranker"))
+        self.reranker = CrossEncoderReranker(reranker_config) if reranker_config["enabled"] else None
         self.documents = []
         self.section_map = {}
         self.metadata = []
+        # The dense and sparse indexes are built over chunks; chunk id -> parent section id
+        # (-1 once removed) and (start, end) character span into that section's content
+        self.chunk_doc_ids = []
+        self.chunk_spans = []
+        self.document_chunks = [] # section id -> chunk ids
+        self._chunk_parent_array = None # numpy copy of chunk_doc_ids for vectorised lookups
+        # Document-level index: one pooled embedding per file, id -> filename in proposal_files
+        self.proposal_index = None
+        self.proposal_files = []
+        self._proposal_ids = {} # filename -> id in proposal_index
         self.index = None
-        self.tfidf_vectorizer = TfidfVectorizer()
+        self.sparse_index = BM25Index(self.bm25_config) # Inverted index over the same chunk ids as FAISS
+        self._stale_vector_ids = set() # Tombstoned chunk ids still inside an index that cannot delete (HNSW)
+        self._index_writable = True
+        self.file_hashes = {}
+        self.file_stats = {}
+        self.file_documents = {} # filename -> section ids
+        self.pricing_index = PricingIndex() # Every quoted price, kept in step with the sections
+        # Boilerplate repeated across proposals is chunked and indexed once (see near_duplicates.py)
+        self.near_duplicates = NearDuplicateIndex(self.config.get("near_duplicates"))
+        # Header variants ("Scope of Work", "SCOPE OF WORKS") grouped, with section counts
+        self.section_names = SectionNameIndex(self.config.get("section_names"))
+        # Client/project per file from files_index.json, and the filterable columns built from it
+        self.files_index = load_files_index(kb_directory)
+        self.metadata_store = MetadataStore()
+        self.artifact_build = None # Build directory when opened from a prebuilt artifact
+        self.ingest_stats = {"workers": 0, "wall_s": 0.0, "files": {}} # Timings of the last load_documents()
+        # Bumped on every index change; part of every search-result cache key
+        self.version = 0
+
+        # Query embeddings depend only on the model; search results also on the KB version
+        cache_config = self.config.get("query_cache", {})
+        cache_entries = cache_config.get("max_entries", 1024)
+        cache_ttl = cache_config.get("ttl_seconds", 3600)
+        self.query_embedding_cache = QueryCache(cache_entries, cache_ttl)
+        self.search_result_cache = QueryCache(cache_entries, cache_ttl)
 
         if not os.path.exists(kb_directory):
             os.makedirs(kb_directory)
 
-        self.load_documents()
-
+        self.embedding_cache = None
+        self._cache_batch_depth = 0 # > 0 inside batch_updates(), which saves the embedding cache once at its end
+        if self.config.get("embedding_cache", True):
+            cache_dir = self.config.get("embedding_cache_dir") or os.path.join(kb_directory, "_embedding_cache")
+            self.embedding_cache = EmbeddingCache(cache_dir, self.model.cache_key)
+
+        # Prefer a prebuilt artifact ('python kb.py build') when it matches the corpus
+        self.artifact_dir = self.config.get("artifact_dir") or os.path.join(kb_directory, "_kb_artifact")
+        build_dir = None
+        if self.config.get("use_artifact", True):
+            build_dir = find_fresh_build(self.artifact_dir, kb_directory, self.model.cache_key, self.build_settings())
+        if build_dir:
+            self._load_artifact(build_dir)
+        else:
+            self.load_documents()
+
+    def build_settings(self) -> Dict[str, Any]:
+        """Settings that shape the indexes; a prebuilt artifact is only reused if they match"""
+        return {
+            "index": index_build_signature(self.index_config),
+            "chunking": {"chunk_tokens": self.chunk_tokens, "chunk_overlap": self.chunk_overlap},
+            "near_duplicates": self.near_duplicates.config,
+            # Section metadata comes from files_index.json, which the corpus fingerprint does not cover
+            "files_index": files_index_hash(self.kb_directory),
+        }
+
+    @write_locked
     def load_documents(self):
         """Load all documents from the knowledge base directory"""
         self.documents = []
         self.section_map = {}
         self.metadata = []
+        self.document_chunks = []
+        # The chunk tables and indexes go too: _build_index returns early for an empty
+        # directory, and later add_document calls must not append to the old chunk ids
+        self.chunk_doc_ids = []
+        self.chunk_spans = []
+        self._chunk_parent_array = None
+        self.index = None
+        self._index_writable = True
+        self._stale_vector_ids = set()
+        self.sparse_index = BM25Index(self.bm25_config)
+        self.proposal_index = None
+        self.proposal_files = []
+        self._proposal_ids = {}
+        self.file_hashes = {}
+        self.file_stats = {}
+        self.file_documents = {}
+        self.pricing_index = PricingIndex()
+        self.near_duplicates = NearDuplicateIndex(self.config.get("near_duplicates"))
+        self.section_names = SectionNameIndex(self.config.get("section_names"))
+        self.files_index = load_files_index(self.kb_directory)
+        self.metadata_store = MetadataStore()
+        self.artifact_build = None
 
         if not os.path.exists(self.kb_directory):
             return
 
-        for filename in os.listdir(self.kb_directory):
-            if filename.endswith('.md') or filename.endswith('.txt'):
-                file_path = os.path.join(self.kb_directory, filename)
-                # Added errors='replace' here too for reading
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as file:
-                    content = file.read()
-
-                # Clean content immediately after reading
-                cleaned_content = remove_problematic_chars(content)
-
-                # Call the internal method using self
-                sections = self._split_into_sections(cleaned_content) # Use cleaned content
-
-                for section_name, section_content in sections.items():
-                    doc_id = len(self.documents)
-                    metadata = {
-                        "client_industry": "general",
-                        "proposal_success": True,
-                        "project_size": "medium",
-                        "key_differentiators": ["quality", "experience"]
-                    }
-
-                    # Apply cleaning to metadata strings if they come from filenames or external sources
-                    cleaned_filename = remove_problematic_chars(filename)
-                    if "_success_" in cleaned_filename:
-                        metadata["proposal_success"] = cleaned_filename.split("_success_")[1].split("_")[0] == "True"
-                    if "_industry_" in cleaned_filename:
-                        metadata["client_industry"] = remove_problematic_chars(cleaned_filename.split("_industry_")[1].split("_")[0])
-                    if "_size_" in cleaned_filename:
-                        metadata["project_size"] = remove_problematic_chars(cleaned_filename.split("_size_")[1].split("_")[0])
-
-                    self.documents.append({
-                        "id": doc_id,
-                        "filename": cleaned_filename, # Store cleaned filename
-                        "section_name": remove_problematic_chars(section_name), # Store cleaned section name
-                        "content": remove_problematic_chars(section_content), # Store cleaned content
-                        "metadata": metadata
-                    })
-
-                    # Use cleaned section name for mapping
-                    cleaned_section_name = remove_problematic_chars(section_name)
-                    if cleaned_section_name not in self.section_map:
-                        self.section_map[cleaned_section_name] = []
-                    self.section_map[cleaned_section_name].append(doc_id)
-                    self.metadata.append(metadata)
+        # Read, clean and section files across processes; results are merged in sorted
+        # filename order, so section ids do not depend on which worker finished first
+        filenames = [filename for filename in sorted(os.listdir(self.kb_directory)) if is_corpus_file(filename)]
+        results, self.ingest_stats = ingest_directory(self.kb_directory, filenames, self.config.get("ingest_workers"))
+        for result in results:
+            self._register_sections(result["filename"], result["documents"], result["file_hash"], result["stat"])
+        self._report_ingest_stats()
+        stats = self.near_duplicates.stats()
+        if stats["duplicates"]:
+            print(f"Collapsed {stats['duplicates']} near-duplicate sections into {stats['canonical_with_duplicates']} canonical ones")
 
         self._build_index()
+        self._bump_version()
+
+    def _report_ingest_stats(self, slowest: int = 5):
+        stats = self.ingest_stats
+        files = stats["files"]
+        if not files:
+            return
+        busy = sum(timing["read_s"] + timing["clean_split_s"] for timing in files.values())
+        print(f"Ingested {len(files)} KB files ({sum(t['sections'] for t in files.values())} sections) in "
+              f"{stats['wall_s']:.2f}s wall / {busy:.2f}s busy with {stats['workers']} worker(s)")
+        for filename, timing in sorted(files.items(), key=lambda item: -(item[1]["read_s"] + item[1]["clean_split_s"]))[:slowest]:
+            print(f"  {filename}: read {timing['read_s'] * 1000:.1f} ms, clean+split {timing['clean_split_s'] * 1000:.1f} ms, "
+                  f"{timing['chars']} chars, {timing['sections']} sections")
+
+    def _bump_version(self):
+        """Mark the indexes as changed so cached search results are no longer served"""
+        self.version += 1
+        # Entries keyed on older versions can never hit again; free them right away
+        self.search_result_cache.clear()
+
+    def _file_stat(self, file_path: str) -> Tuple[int, int]:
+        """(mtime_ns, size) used by sync_directory to skip files that were not touched"""
+        stat = os.stat(file_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _make_section_documents(self, filename: str, content: str) -> List[Dict[str, Any]]:
+        """Clean and split one file into section documents (without ids)"""
+        return make_section_documents(filename, content)
+
+    def _register_file(self, filename: str, content: str, stat: Optional[Tuple[int, int]] = None) -> List[int]:
+        """Clean, split and register one file's sections; returns their ids"""
+        return self._register_sections(filename, self._make_section_documents(filename, content), content_hash(content), stat)
+
+    def _register_sections(self, filename: str, section_documents: List[Dict[str, Any]], file_hash: str,
+                           stat: Optional[Tuple[int, int]] = None) -> List[int]:
+        """Assign ids to a file's sections and add them to documents, section_map and metadata.
+
+        Ids are positions in self.documents and are never reused: removed sections leave a
+        None tombstone until the next full load_documents(), so FAISS ids stay stable.
+        """
+        doc_ids = []
+        proposal = proposal_metadata(filename, self.files_index.get(filename), self.config.get("client_industries"))
+        for document in section_documents:
+            doc_id = len(self.documents)
+            document = {"id": doc_id, **document, "metadata": {**document["metadata"], **proposal}}
+            self.documents.append(document)
+
+            # Use cleaned section name for mapping
+            self.section_map.setdefault(document["section_name"], []).append(doc_id)
+            self.section_names.add(document["section_name"])
+            self.metadata.append(document["metadata"])
+            self.document_chunks.append([])
+            self.near_duplicates.add(doc_id, document["content"])
+            doc_ids.append(doc_id)
+
+        self.file_hashes[filename] = file_hash
+        self.file_documents[filename] = doc_ids
+        self.pricing_index.add_file(filename, [self.documents[doc_id] for doc_id in doc_ids])
+        self.metadata_store.set_sections(doc_ids, [self.documents[doc_id]["metadata"] for doc_id in doc_ids])
+        if stat is not None:
+            self.file_stats[filename] = stat
+        return doc_ids
 
-    # Moved this function inside the class
     def _split_into_sections(self, content):
         """Split a document into sections based on headers"""
         # Input content is assumed to be already cleaned
-        sections = {}
-        current_section = "Introduction"
-        current_content = []
-
-        for line in content.split('\n'):
-            if line.startswith('# '):
-                if current_content:
-                    sections[remove_problematic_chars(current_section)] = '\n'.join(current_content)
-                    current_content = []
-                current_section = line[2:].strip()
-            elif line.startswith('## '):
-                if current_content:
-                    sections[remove_problematic_chars(current_section)] = '\n'.join(current_content)
-                    current_content = []
-                current_section = line[3:].strip()
-            else:
-                current_content.append(line)
-
-        if current_content:
-            sections[remove_problematic_chars(current_section)] = '\n'.join(current_content)
-
-        return sections
+        return split_into_sections(content)
 
     def _build_index(self):
         """Build a FAISS index for fast similarity search"""
         if not self.documents:
             return
+        self.chunk_doc_ids = []
+        self.chunk_spans = []
+        self.document_chunks = [[] for _ in self.documents]
+        chunk_ids = self._chunk_documents([doc["id"] for doc in self.documents if doc is not None])
+        if not chunk_ids:
+            return
         # Ensure texts for indexing are cleaned
-        texts = [remove_problematic_chars(doc["content"]) for doc in self.documents]
-        embeddings = self.model.encode(texts)
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(np.array(embeddings).astype('float32'))
-        self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(texts)
-
-    def hybrid_search(self, query, k=5):
-        """Hybrid search combining dense and sparse retrieval"""
-        if not self.index or not self.documents:
+        texts = [remove_problematic_chars(self.chunk_text(chunk_id)) for chunk_id in chunk_ids]
+        embeddings = self._encode_sections(texts, prune_cache=True)
+        # Every backend takes explicit ids, so incremental updates can add and remove chunks by id.
+        # Vectors are unit length, so inner product is cosine similarity (higher is better)
+        self.index = create_vector_index(embeddings.shape[1], self.index_config, embeddings, metric=faiss.METRIC_INNER_PRODUCT)
+        self.index.add_with_ids(embeddings, np.array(chunk_ids, dtype='int64'))
+        self._index_writable = True
+        self._stale_vector_ids = set()
+        self.proposal_index = None
+        self.proposal_files = []
+        self._proposal_ids = {}
+        self._refresh_proposals(list(self.file_documents), chunk_ids, embeddings)
+        print(f"Built vector index {describe_index(self.index)} over {len(chunk_ids)} chunks of {len(self.documents)} sections")
+        self.sparse_index = BM25Index(self.bm25_config)
+        self.sparse_index.add(chunk_ids, texts)
+        self.sparse_index.compact()
+
+    def _file_chunk_ids(self, filename: str) -> List[int]:
+        """A file's chunks in document order (pool_document weights by position); a collapsed
+        section is represented by its canonical section's chunks"""
+        chunk_ids = {}
+        for doc_id in self.file_documents.get(filename, []):
+            chunk_ids.update(dict.fromkeys(self.document_chunks[self.near_duplicates.canonical(doc_id)]))
+        return list(chunk_ids)
+
+    def _refresh_proposals(self, filenames: List[str], chunk_ids: List[int], embeddings: Optional[np.ndarray]):
+        """(Re)compute the document-level vector of each file and put it in the proposal index.
+
+        The one code path for full builds and incremental updates: a file's vector always
+        pools the embeddings of every chunk _file_chunk_ids gives it (its own sections' and
+        those of the canonical copies its collapsed sections point at), in document order.
+        Embeddings computed by the caller are used as they are; any other chunk is encoded
+        again, which the embedding cache answers without running the model.
+        """
+        file_chunks = {filename: self._file_chunk_ids(filename) for filename in filenames}
+        row_of = {chunk_id: row for row, chunk_id in enumerate(chunk_ids)}
+        missing = sorted({chunk_id for ids in file_chunks.values() for chunk_id in ids if chunk_id not in row_of})
+        if missing:
+            extra = self._encode_sections([self.chunk_text(chunk_id) for chunk_id in missing])
+            row_of.update({chunk_id: len(chunk_ids) + row for row, chunk_id in enumerate(missing)})
+            embeddings = extra if embeddings is None or not len(chunk_ids) else np.vstack([embeddings, extra])
+
+        vectors, ids = [], []
+        for filename, ids_of_file in file_chunks.items():
+            proposal_id = self._proposal_ids.pop(filename, None)
+            if proposal_id is not None:
+                self.proposal_index.remove_ids(np.array([proposal_id], dtype='int64'))
+                self.proposal_files[proposal_id] = None
+            if not ids_of_file:
+                continue # no indexable text
+            # A file keeps its proposal id across updates
+            if proposal_id is None:
+                proposal_id = len(self.proposal_files)
+                self.proposal_files.append(None)
+            self.proposal_files[proposal_id] = filename
+            self._proposal_ids[filename] = proposal_id
+            ids.append(proposal_id)
+            vectors.append(self.model.pool_document(embeddings[[row_of[chunk_id] for chunk_id in ids_of_file]]))
+        if not vectors:
+            return
+        if self.proposal_index is None:
+            self.proposal_index = faiss.IndexIDMap2(faiss.IndexFlatIP(len(vectors[0])))
+        self.proposal_index.add_with_ids(np.vstack(vectors).astype('float32'), np.array(ids, dtype='int64'))
+
+    def proposal_vectors(self) -> np.ndarray:
+        """Document-level vectors by proposal id (zero rows for removed files), for persistence"""
+        dimension = self.proposal_index.d if self.proposal_index is not None else (self.index.d if self.index else 0)
+        vectors = np.zeros((len(self.proposal_files), dimension), dtype='float32')
+        for proposal_id, filename in enumerate(self.proposal_files):
+            if filename is not None:
+                vectors[proposal_id] = self.proposal_index.reconstruct(proposal_id)
+        return vectors
+
+    def _load_proposals(self, proposal_files: List[Optional[str]], vectors: np.ndarray):
+        self.proposal_files = list(proposal_files)
+        self._proposal_ids = {filename: i for i, filename in enumerate(self.proposal_files) if filename is not None}
+        self.proposal_index = None
+        if self._proposal_ids:
+            ids = np.array(sorted(self._proposal_ids.values()), dtype='int64')
+            self.proposal_index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+            self.proposal_index.add_with_ids(np.ascontiguousarray(vectors[ids], dtype='float32'), ids)
+
+    def _chunk_documents(self, doc_ids: List[int]) -> List[int]:
+        """Split sections into overlapping token windows; returns the new chunk ids.
+
+        Near-duplicate sections get no chunks of their own.
+        """
+        new_chunk_ids = []
+        for doc_id in doc_ids:
+            if self.near_duplicates.is_duplicate(doc_id):
+                continue
+            content = self.documents[doc_id]["content"]
+            for span in chunk_spans(content, self.chunk_tokens, self.chunk_overlap, self.model.tokenizer):
+                chunk_id = len(self.chunk_doc_ids)
+                self.chunk_doc_ids.append(doc_id)
+                self.chunk_spans.append(span)
+                self.document_chunks[doc_id].append(chunk_id)
+                new_chunk_ids.append(chunk_id)
+        self._chunk_parent_array = None
+        return new_chunk_ids
+
+    def _chunk_parents(self) -> np.ndarray:
+        """chunk_doc_ids as an int64 array (-1 for removed chunks), rebuilt only after changes"""
+        if self._chunk_parent_array is None:
+            self._chunk_parent_array = np.array(self.chunk_doc_ids, dtype='int64')
+        return self._chunk_parent_array
+
+    def chunk_text(self, chunk_id: int) -> str:
+        """Text of one chunk: a slice of its parent section, no copy is stored"""
+        start, end = self.chunk_spans[chunk_id]
+        return mark_clean(self.documents[self.chunk_doc_ids[chunk_id]]["content"][start:end])
+
+    def _load_artifact(self, build_dir: str):
+        """Open a prebuilt, memory-mapped artifact instead of re-embedding the corpus"""
+        artifact = open_artifact(build_dir, self.bm25_config)
+        self.documents = artifact["documents"]
+        for doc in self.documents:
+            if doc is not None:
+                # documents.json holds text cleaned at ingest; JSON does not keep the CleanText mark
+                for key in ("filename", "section_name", "content"):
+                    doc[key] = mark_clean(doc[key])
+        self.section_map = artifact["section_map"]
+        self.metadata = [doc["metadata"] if doc else None for doc in self.documents]
+        self.chunk_doc_ids = artifact["chunk_doc_ids"]
+        self._chunk_parent_array = None
+        self.chunk_spans = artifact["chunk_spans"]
+        self.document_chunks = [[] for _ in self.documents]
+        for chunk_id, doc_id in enumerate(self.chunk_doc_ids):
+            if doc_id >= 0:
+                self.document_chunks[doc_id].append(chunk_id)
+        self.index = artifact["index"]
+        configure_search(self.index, self.index_config)
+        self._index_writable = False # Memory-mapped; copied on the first incremental update
+        self.sparse_index = artifact["sparse_index"]
+        self._load_proposals(artifact["manifest"]["proposal_files"], artifact["proposal_vectors"])
+        removed_chunks = {chunk_id for chunk_id, doc_id in enumerate(self.chunk_doc_ids) if doc_id < 0}
+        self._stale_vector_ids = set() if supports_removal(self.index) else removed_chunks
+        self.file_hashes = artifact["manifest"]["files"]
+        self.file_stats = {}
+        self.file_documents = artifact["manifest"]["file_documents"]
+        self.near_duplicates = NearDuplicateIndex(self.config.get("near_duplicates"))
+        self.near_duplicates.restore(artifact["manifest"].get("near_duplicates", {}), self.documents)
+        # In section id order, so the groups come out as they do after load_documents()
+        self.section_names = SectionNameIndex(self.config.get("section_names"))
+        for doc in self.documents:
+            if doc is not None:
+                self.section_names.add(doc["section_name"])
+        # The documents already carry their files_index.json metadata
+        self.metadata_store = MetadataStore()
+        live = [doc for doc in self.documents if doc is not None]
+        self.metadata_store.set_sections([doc["id"] for doc in live], [doc["metadata"] for doc in live])
+        # Rebuilt from the loaded sections: a regex pass over memory, no file reads
+        self.pricing_index = PricingIndex()
+        for filename, doc_ids in self.file_documents.items():
+            self.pricing_index.add_file(filename, [self.documents[doc_id] for doc_id in doc_ids])
+        self.artifact_build = build_dir
+        self._bump_version()
+        print(f"Opened KB artifact {build_dir} ({len(self.documents)} sections)")
+
+    @read_locked
+    def build_artifact(self) -> str:
+        """Write the current index as a new artifact build and return its directory.
+
+        Only reads the knowledge base, so searches keep running while it is written."""
+        return write_artifact(self, self.artifact_dir, self.file_hashes, self.build_settings())
+
+    def _encode_sections(self, texts: List[str], prune_cache: bool = False) -> np.ndarray:
+        """Embed chunk texts as unit vectors, serving unchanged ones from the on-disk cache"""
+        if self.embedding_cache is None:
+            embeddings = self.model.encode(texts)
+        else:
+            # With prune_cache, texts is the whole corpus and sections that no longer exist are dropped
+            embeddings = self.embedding_cache.encode(texts, self.model.encode, prune=prune_cache)
+            self._save_embedding_cache()
+            stats = self.embedding_cache.stats()
+            print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses ({stats['entries']} entries)")
+        return self._normalize(embeddings)
+
+    def _save_embedding_cache(self):
+        """Write the embedding cache file (a full rewrite), unless a batch saves it once at its end"""
+        if self.embedding_cache is not None and not self._cache_batch_depth:
+            self.embedding_cache.save()
+
+    @staticmethod
+    def _normalize(embeddings) -> np.ndarray:
+        """float32 copy with unit-length rows, so inner product equals cosine similarity"""
+        embeddings = np.array(embeddings, dtype='float32', ndmin=2)
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+    # --- Incremental updates ---
+
+    def _ensure_writable_index(self):
+        """Replace a memory-mapped (read-only) FAISS index with an in-memory copy before mutating it"""
+        if not self._index_writable:
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            self._index_writable = True
+
+    def _index_new_documents(self, doc_ids: List[int]):
+        """Chunk freshly registered (or promoted) sections, add the chunks to the FAISS and BM25
+        indexes and refresh the document-level vectors that include them"""
+        chunk_ids = self._chunk_documents(doc_ids)
+        embeddings = None
+        if chunk_ids:
+            texts = [self.chunk_text(chunk_id) for chunk_id in chunk_ids]
+            embeddings = self._encode_sections(texts)
+            if self.index is None:
+                self.index = create_vector_index(embeddings.shape[1], self.index_config, embeddings, metric=faiss.METRIC_INNER_PRODUCT)
+                self._index_writable = True
+            self._ensure_writable_index()
+            self.index.add_with_ids(embeddings, np.array(chunk_ids, dtype='int64'))
+            # New terms get fresh postings, so they are searchable right away
+            self.sparse_index.add(chunk_ids, texts)
+        # Files with one of these sections, or with a copy collapsed into one (a promoted
+        # section replaces the removed canonical copy in those files' vectors too)
+        new_docs = set(doc_ids)
+        affected = [filename for filename, ids in self.file_documents.items()
+                    if any(doc_id in new_docs or self.near_duplicates.canonical(doc_id) in new_docs for doc_id in ids)]
+        self._refresh_proposals(affected, chunk_ids, embeddings)
+        self._bump_version()
+
+    def _unregister_file(self, filename: str) -> List[int]:
+        """Tombstone a file's sections and chunks and drop them from section_map, metadata, FAISS and BM25"""
+        proposal_id = self._proposal_ids.pop(filename, None)
+        if proposal_id is not None:
+            self.proposal_index.remove_ids(np.array([proposal_id], dtype='int64'))
+            self.proposal_files[proposal_id] = None
+        doc_ids = self.file_documents.pop(filename, [])
+        # Copies of removed canonical sections that live in other files take their place
+        promoted = self.near_duplicates.remove(doc_ids, lambda doc_id: self.documents[doc_id]["content"])
+        removed_chunks = []
+        for doc_id in doc_ids:
+            section_name = self.documents[doc_id]["section_name"]
+            self.section_names.remove(section_name)
+            ids = self.section_map.get(section_name, [])
+            if doc_id in ids:
+                ids.remove(doc_id)
+            if not ids:
+                self.section_map.pop(section_name, None)
+            for chunk_id in self.document_chunks[doc_id]:
+                self.chunk_doc_ids[chunk_id] = -1
+                removed_chunks.append(chunk_id)
+            self._chunk_parent_array = None
+            self.document_chunks[doc_id] = []
+            self.documents[doc_id] = None
+            self.metadata[doc_id] = None
+        if removed_chunks and self.index is not None:
+            if supports_removal(self.index):
+                self._ensure_writable_index()
+                self.index.remove_ids(np.array(removed_chunks, dtype='int64'))
+            else:
+                self._stale_vector_ids.update(removed_chunks)
+        self.sparse_index.remove(removed_chunks)
+        self.pricing_index.remove_documents(doc_ids)
+        self.metadata_store.remove(doc_ids)
+        self.file_hashes.pop(filename, None)
+        self.file_stats.pop(filename, None)
+        if promoted:
+            self._index_new_documents(promoted)
+        if doc_ids:
+            self._bump_version()
+        return doc_ids
+
+    @write_locked
+    def add_document(self, filename: str, content: Optional[str] = None) -> List[int]:
+        """Add one file to the knowledge base without rebuilding; returns the new section ids.
+
+        The file is read from the KB directory unless ``content`` is given.
+        """
+        if filename in self.file_documents:
+            return self.update_document(filename, content)
+        stat = None
+        if content is None:
+            file_path = os.path.join(self.kb_directory, filename)
+            content = read_corpus_file(file_path)
+            stat = self._file_stat(file_path)
+        doc_ids = self._register_file(filename, content, stat)
+        self._index_new_documents(doc_ids)
+        return doc_ids
+
+    @write_locked
+    def update_document(self, filename: str, content: Optional[str] = None) -> List[int]:
+        """Re-index one file whose content changed; unchanged content is a no-op"""
+        stat = None
+        if content is None:
+            file_path = os.path.join(self.kb_directory, filename)
+            content = read_corpus_file(file_path)
+            stat = self._file_stat(file_path)
+        if self.file_hashes.get(filename) == content_hash(content) and filename in self.file_documents:
+            if stat is not None:
+                self.file_stats[filename] = stat
+            return self.file_documents[filename]
+        self._unregister_file(filename)
+        doc_ids = self._register_file(filename, content, stat)
+        self._index_new_documents(doc_ids)
+        return doc_ids
+
+    @write_locked
+    def remove_document(self, filename: str) -> int:
+        """Remove one file's sections from every index; returns how many sections were removed"""
+        return len(self._unregister_file(filename))
+
+    @contextmanager
+    def batch_updates(self):
+        """Group several add/update/remove_document calls: the embedding cache file (a full
+        rewrite) is saved once at the end instead of after every file"""
+        self._rwlock.acquire_write()
+        self._cache_batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._cache_batch_depth -= 1
+            try:
+                self._save_embedding_cache()
+            finally:
+                self._rwlock.release_write()
+
+    @write_locked
+    def sync_directory(self) -> Dict[str, List[str]]:
+        """Bring the indexes in line with the KB directory, touching only files that changed.
+
+        A file whose (mtime, size) is unchanged is skipped without being read; otherwise its
+        content hash decides whether it is re-indexed.
+        """
+        changes = {"added": [], "updated": [], "removed": []}
+        if not os.path.exists(self.kb_directory):
+            return changes
+        # New files pick up their client/project; already indexed ones keep theirs until they change
+        self.files_index = load_files_index(self.kb_directory)
+
+        on_disk = {filename for filename in os.listdir(self.kb_directory) if is_corpus_file(filename)}
+        # The embedding cache file is written once after the last file, not per changed file
+        with self.batch_updates():
+            for filename in sorted(on_disk):
+                file_path = os.path.join(self.kb_directory, filename)
+                stat = self._file_stat(file_path)
+                if filename not in self.file_documents:
+                    self.add_document(filename)
+                    changes["added"].append(filename)
+                elif self.file_stats.get(filename) != stat:
+                    previous_hash = self.file_hashes.get(filename)
+                    self.update_document(filename)
+                    if self.file_hashes.get(filename) != previous_hash:
+                        changes["updated"].append(filename)
+
+            for filename in sorted(set(self.file_documents) - on_disk):
+                self.remove_document(filename)
+                changes["removed"].append(filename)
+
+        if any(changes.values()):
+            print(f"KB sync: {len(changes['added'])} added, {len(changes['updated'])} updated, {len(changes['removed'])} removed")
+        return changes
+
+    def hybrid_search(self, query, k=5, filters: Optional[Dict[str, Any]] = None):
+        """Hybrid search combining dense and sparse retrieval.
+
+        Dense (cosine over chunk embeddings) and sparse (BM25 over an inverted index) chunk rankings are
+        folded to sections and fused with the configured mode (see fusion.py); result
+        scores are in [0, 1], higher is better.
+
+        ``filters`` restricts the search to proposals by client, project, industry,
+        service_line or year, e.g. {"industry": "education", "year": [2024, 2025]}.
+        """
+        return self.hybrid_search_many([query], k=k, filters=filters)[0]
+
+    @read_locked
+    def hybrid_search_many(self, queries: List[str], k=5, rerank: Optional[bool] = None,
+                           filters: Optional[Dict[str, Any]] = None) -> List[List[SearchHit]]:
+        """hybrid_search for several queries at once: one batched encode, one batched FAISS
+        search and one BM25 pass for all of them. Returns one result list per query.
+
+        With a reranker configured (or rerank=True) the top reranker candidates are
+        re-ordered by the cross-encoder before being cut to k.
+        """
+        filters = normalize_filters(filters)
+        use_reranker = self.reranker is not None and rerank is not False
+        if not use_reranker:
+            return self._retrieve_many(queries, k, filters)
+        fetch_k = max(k, int(self.reranker.config["candidates"]))
+        return [
+            self.reranker.rerank(remove_problematic_chars(query), results, top_k=k)
+            for query, results in zip(queries, self._retrieve_many(queries, fetch_k, filters))
+        ]
+
+    def _retrieve_many(self, queries: List[str], k: int, filters: Optional[Tuple] = None) -> List[List[SearchHit]]:
+        """Hybrid retrieval with the search result cache, before any reranking"""
+        if not queries:
             return []
-        # Clean the query before encoding and vectorizing
-        cleaned_query = remove_problematic_chars(query)
-        query_embedding = self.model.encode([cleaned_query])
-        dense_scores, dense_indices = self.index.search(np.array(query_embedding).astype('float32'), k)
-        query_tfidf = self.tfidf_vectorizer.transform([cleaned_query])
-        sparse_scores = cosine_similarity(query_tfidf, self.tfidf_matrix).flatten()
-        sparse_indices = np.argsort(-sparse_scores)[:k]
-        combined = []
-        seen = set()
-        for idx in dense_indices[0]:
-            if idx not in seen:
-                combined.append((dense_scores[0][list(dense_indices[0]).index(idx)], idx))
-                seen.add(idx)
-        for idx in sparse_indices:
-            if idx not in seen:
-                combined.append((sparse_scores[idx], idx))
-                seen.add(idx)
-        combined.sort(key=lambda x: x[0], reverse=True)
-        # Ensure document content in results is cleaned
-        results = [{"score": float(score), "document": {
-            "id": self.documents[idx]["id"],
-            "filename": self.documents[idx]["filename"], # Already cleaned
-            "section_name": self.documents[idx]["section_name"], # Already cleaned
-            "content": remove_problematic_chars(self.documents[idx]["content"]), # Ensure content is cleaned
-            "metadata": self.documents[idx]["metadata"] # Metadata should also be cleaned on load
-        }} for score, idx in combined[:k]]
-        return results
-
+        if not self.index or not self.documents:
+            return [[] for _ in queries]
+        # Clean the queries before encoding and vectorizing
+        normalized_queries = [normalize_query(remove_problematic_chars(query)) for query in queries]
+        version = self.version
+
+        all_results = [None] * len(queries)
+        pending = {} # normalized query -> positions still to search
+        for position, query in enumerate(normalized_queries):
+            cached = self.search_result_cache.get((query, k, version, filters))
+            if cached is not None:
+                # Hits are read-only, so the cached ones are handed out as they are
+                all_results[position] = list(cached)
+            else:
+                pending.setdefault(query, []).append(position)
+
+        if pending:
+            unique_queries = list(pending)
+            for query, results in zip(unique_queries, self._search_uncached(unique_queries, k, filters)):
+                self.search_result_cache.put((query, k, version, filters), results)
+                for position in pending[query]:
+                    all_results[position] = list(results)
+        return all_results
+
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Unit query embeddings, encoding only queries not in the LRU embedding cache"""
+        vectors = [self.query_embedding_cache.get((self.model.cache_key, query)) for query in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self._normalize(self.model.encode([queries[i] for i in missing]))
+            for i, vector in zip(missing, encoded):
+                self.query_embedding_cache.put((self.model.cache_key, queries[i]), vector)
+                vectors[i] = vector
+        return np.vstack(vectors).astype('float32')
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counters of the query embedding, search result and rerank pair caches"""
+        stats = {
+            "query_embeddings": self.query_embedding_cache.stats(),
+            "search_results": self.search_result_cache.stats(),
+            "kb_version": self.version,
+        }
+        if self.reranker is not None:
+            stats["rerank_pairs"] = self.reranker.pair_cache.stats()
+        return stats
+
+    def _search_uncached(self, cleaned_queries: List[str], k: int, filters: Optional[Tuple] = None) -> List[List[SearchHit]]:
+        """The actual batched dense + sparse search behind hybrid_search_many"""
+        section_mask, allowed = None, None
+        if filters:
+            # Pre-filter: only chunks of matching proposals are ever scored
+            section_mask, allowed = self._filter_chunks(filters)
+            if len(allowed) == 0:
+                return [[] for _ in cleaned_queries]
+        query_embeddings = self._encode_queries(cleaned_queries)
+        # Several chunks can belong to one section, so fetch more chunks than sections wanted
+        chunk_k = k * self.chunk_fetch_factor
+        if self.search_mode == "two_stage" and self.proposal_index is not None and self.proposal_index.ntotal > self.two_stage_documents:
+            return self._search_two_stage(cleaned_queries, query_embeddings, k, chunk_k, allowed, section_mask)
+
+        if allowed is not None:
+            # FAISS ID selector (IVF/PQ) or exact scoring of just the allowed vectors (flat/HNSW)
+            dense_scores, dense_chunks = search_subset(self.index, query_embeddings, allowed, chunk_k, self.index_config)
+            sparse_hits = [self.sparse_index.search(query, chunk_k, allowed=allowed) for query in cleaned_queries]
+        else:
+            # Also over-fetch by the number of removed chunks an HNSW index still returns
+            dense_k = min(chunk_k + len(self._stale_vector_ids), max(self.index.ntotal, 1))
+            dense_scores, dense_chunks = self.index.search(query_embeddings, dense_k)
+            # BM25 only touches chunks that share a term with the query; removed chunks never come back
+            sparse_hits = self.sparse_index.search_many(cleaned_queries, chunk_k)
+
+        return [
+            self._fuse_chunk_rankings(dense_chunks[qi], dense_scores[qi], *sparse_hits[qi], k, section_mask)
+            for qi in range(len(cleaned_queries))
+        ]
+
+    def _filter_chunks(self, filters: Tuple) -> Tuple[np.ndarray, np.ndarray]:
+        """(mask of sections matching the filters, sorted ids of the chunks that may be searched)"""
+        section_mask = np.zeros(len(self.documents), dtype=bool)
+        matches = self.metadata_store.mask(filters)
+        section_mask[:len(matches)] = matches[:len(section_mask)]
+        # A matching section collapsed into another proposal's copy is searched through that copy
+        owners = section_mask.copy()
+        for doc_id, canonical in self.near_duplicates.canonical_of.items():
+            if section_mask[doc_id]:
+                owners[canonical] = True
+        parents = self._chunk_parents()
+        allowed = np.flatnonzero((parents >= 0) & owners[np.maximum(parents, 0)]).astype('int64')
+        return section_mask, allowed
+
+    def _search_two_stage(self, cleaned_queries: List[str], query_embeddings: np.ndarray, k: int, chunk_k: int,
+                          allowed: Optional[np.ndarray] = None, section_mask: Optional[np.ndarray] = None) -> List[List[SearchHit]]:
+        """Coarse-to-fine: the closest proposals by document embedding, then a hybrid search
+        over their chunks only, so the fine stage scales with proposal size, not corpus size"""
+        if section_mask is None:
+            _, proposal_ids = self.proposal_index.search(query_embeddings, self.two_stage_documents)
+        else:
+            # Coarse stage over the proposals that have at least one matching section
+            matching = np.array(sorted(proposal_id for filename, proposal_id in self._proposal_ids.items()
+                                       if section_mask[self.file_documents[filename]].any()), dtype='int64')
+            _, proposal_ids = search_subset(self.proposal_index, query_embeddings, matching, self.two_stage_documents)
+        all_results = []
+        for qi, query in enumerate(cleaned_queries):
+            # A set: proposals that share a collapsed section share its chunks
+            candidates = np.array(sorted({
+                chunk_id for proposal_id in proposal_ids[qi] if proposal_id >= 0
+                for chunk_id in self._file_chunk_ids(self.proposal_files[proposal_id])
+            }), dtype='int64')
+            if allowed is not None:
+                candidates = np.intersect1d(candidates, allowed, assume_unique=True)
+            dense_scores, dense_chunks = search_subset(self.index, query_embeddings[qi:qi + 1], candidates, chunk_k, self.index_config)
+            sparse_chunks, bm25_scores = self.sparse_index.search(query, chunk_k, allowed=candidates)
+            all_results.append(self._fuse_chunk_rankings(dense_chunks[0], dense_scores[0], sparse_chunks, bm25_scores, k, section_mask))
+        return all_results
+
+    def _fuse_chunk_rankings(self, dense_chunks: np.ndarray, dense_scores: np.ndarray,
+                             sparse_chunks: np.ndarray, bm25_scores: np.ndarray, k: int,
+                             section_mask: Optional[np.ndarray] = None) -> List[SearchHit]:
+        """Fold one query's dense and sparse chunk hits to sections and fuse them into k results"""
+        chunk_parents = self._chunk_parents()
+        dense_ids, dense_values = self._fold_to_sections(dense_chunks, dense_scores, chunk_parents)
+        # BM25 is unbounded; scale by the best hit so weighted fusion sees [0, 1] like the cosines
+        # (a best score of zero or less would flip or blow up the scale; drop the sparse side then)
+        if len(bm25_scores) and bm25_scores[0] > 0:
+            bm25_scores = bm25_scores / bm25_scores[0]
+        else:
+            sparse_chunks, bm25_scores = sparse_chunks[:0], bm25_scores[:0]
+        sparse_ids, sparse_values = self._fold_to_sections(sparse_chunks, bm25_scores, chunk_parents)
+
+        section_ids, fused = fuse_rankings(dense_ids, dense_values, sparse_ids, sparse_values, self.fusion_config)
+        section_ids, fused = section_ids[:k], fused[:k]
+        # Fused scores order the hits; relevance cut-offs (generate_section) use the cosine scale
+        relevance = dense_relevance(section_ids, dense_ids, dense_values)
+        if section_mask is not None:
+            # Show the copy of a collapsed section that belongs to a matching proposal
+            section_ids = [idx if section_mask[idx] else next(d for d in self.near_duplicates.copies(idx) if section_mask[d])
+                           for idx in section_ids]
+        return [self._make_result(score, idx, rel) for score, idx, rel in zip(fused, section_ids, relevance)]
+
+    def _make_result(self, score, idx, relevance=None) -> SearchHit:
+        # A view of the stored section: its content was cleaned once at ingest and is not copied
+        return SearchHit(float(score), DocumentView(self.documents[idx], self),
+                         relevance=None if relevance is None else float(relevance))
+
+    def source_refs(self, doc_id: int) -> List[Dict[str, Any]]:
+        """Every section collapsed into this one, itself first: where the text was used"""
+        return [{"id": idx, "filename": self.documents[idx]["filename"], "section_name": self.documents[idx]["section_name"]}
+                for idx in self.near_duplicates.copies(doc_id) if self.documents[idx] is not None]
+
+    @staticmethod
+    def _fold_to_sections(chunk_ids: np.ndarray, scores: np.ndarray, chunk_parents: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Map a best-first chunk ranking to a best-first section ranking (best chunk per section)"""
+        chunk_ids = np.asarray(chunk_ids, dtype='int64')
+        valid = chunk_ids >= 0 # FAISS pads with -1 when fewer chunks are indexed
+        chunk_ids = chunk_ids[valid]
+        scores = np.asarray(scores)[valid]
+        parents = chunk_parents[chunk_ids]
+        live = parents >= 0 # removed chunks an HNSW index still returns
+        parents, scores = parents[live], scores[live]
+        _, first = np.unique(parents, return_index=True)
+        first.sort()
+        return parents[first], scores[first]
+
+    @read_locked
     def get_common_section_names(self, top_n=15):
-        return []
-
-    def multi_hop_search(self, initial_query, k=5):
-        # Clean the initial query
-        cleaned_initial_query = remove_problematic_chars(initial_query)
-        first = self.hybrid_search(cleaned_initial_query, k=3*k)
+        """The top_n most frequent section headers, variants counted together"""
+        return self.section_names.common(top_n)
+
+    def multi_hop_search(self, initial_query, k=5, filters: Optional[Dict[str, Any]] = None):
+        return self.multi_hop_search_many([initial_query], k=k, filters=filters)[0]
+
+    @read_locked
+    def multi_hop_search_many(self, initial_queries: List[str], k=5, filters: Optional[Dict[str, Any]] = None) -> List[List[SearchHit]]:
+        """multi_hop_search for several queries, with both hops batched across all of them
+        (and both restricted by ``filters``, see hybrid_search)"""
+        # Clean the initial queries
+        cleaned_initial_queries = [remove_problematic_chars(query) for query in initial_queries]
+        first_hops = self.hybrid_search_many(cleaned_initial_queries, k=3*k, rerank=False, filters=filters)
         # Ensure content used for refined query is cleaned
-        refined_query = cleaned_initial_query + " " + " ".join([remove_problematic_chars(r["document"]["content"])[ :200] for r in first[:3]])
-        second = self.hybrid_search(refined_query, k=k)
-        all_r = {r["document"]["id"]: r for r in first+second}
-        topk = sorted(all_r.values(), key=lambda x: x["score"], reverse=True)[:k]
-        return topk
+        refined_queries = [
+            cleaned_query + " " + " ".join([r.content[:200] for r in first[:3]])
+            for cleaned_query, first in zip(cleaned_initial_queries, first_hops)
+        ]
+        second_hops = self.hybrid_search_many(refined_queries, k=k, rerank=False, filters=filters)
+        results = []
+        for cleaned_query, first, second in zip(cleaned_initial_queries, first_hops, second_hops):
+            all_r = {r.id: r for r in first+second}
+            merged = sorted(all_r.values(), key=lambda x: x.score, reverse=True)
+            # Rerank the merged candidates of both hops against the original query
+            if self.reranker is not None:
+                merged = self.reranker.rerank(cleaned_query, merged)
+            results.append(merged[:k])
+        return results
 
-    def get_section_documents(self, section_name):
+    @read_locked
+    def get_section_documents(self, section_name) -> List[DocumentView]:
+        """Sections under this header or any variant of it ("Scope of Work", "SCOPE OF WORKS", ...)"""
         # Ensure section name is cleaned for lookup
         cleaned_section_name = remove_problematic_chars(section_name)
-        # Ensure returned document content is cleaned
-        return [{
-            "id": self.documents[idx]["id"],
-            "filename": self.documents[idx]["filename"],
-            "section_name": self.documents[idx]["section_name"],
-            "content": remove_problematic_chars(self.documents[idx]["content"]),
-            "metadata": self.documents[idx]["metadata"]
-        } for idx in self.section_map.get(cleaned_section_name, [])]
+        variants = self.section_names.variants(cleaned_section_name) or [cleaned_section_name]
+        doc_ids = sorted(idx for name in variants for idx in self.section_map.get(name, []))
+        # Read-only views; the stored content is already cleaned
+        return [DocumentView(self.documents[idx], self) for idx in doc_ids if self.documents[idx] is not None]
+
+    @read_locked
+    def metadata_filter_values(self) -> Dict[str, List[str]]:
+        """Values each hybrid_search filter can take in the current knowledge base"""
+        return {field: self.metadata_store.values(field) for field in FILTER_FIELDS}
 
+    @read_locked
     def get_all_section_names(self):
         # Return cleaned section names
-        return [remove_problematic_chars(name) for name in self.section_map.keys()]
-
-    def extract_pricing_from_kb(self) -> List[int]:
-        prices = []
-        pattern = re.compile(r'(?:₹|Rs\.?)[\s]*([0-9,]+)')
-        md_paths = glob.glob(os.path.join(self.kb_directory, '*.md'))
-        for path in md_paths:
-            # Added errors='replace' here too for reading
-            text = open(path, 'r', encoding='utf-8', errors='replace').read()
-            text = remove_problematic_chars(text) # Clean text after reading
-            # Ensure regex matching is done on cleaned text
-            parts = re.split(r'^#{1,3}\s*COMMERCIAL PROPOSAL\s*$', text, flags=re.IGNORECASE | re.MULTILINE)
-            if len(parts) < 2:
-                continue
-            body = re.split(r'^#{1,3}\s+\w', parts[1], flags=re.MULTILINE)[0]
-            for m in pattern.finditer(body):
-                val = int(m.group(1).replace(',', ''))
-                prices.append(val)
-        return prices
-    
-   
\ No newline at end of file
+        return remove_problematic_chars_many(list(self.section_map.keys()))
+
+    @read_locked
+    def extract_pricing_from_kb(self, currency: Optional[str] = None) -> List[int]:
+        """Amounts quoted in the commercial sections of past proposals, optionally for one currency.
+
+        Served from the pricing index; see pricing_summary() for per-currency statistics.
+        """
+        return [int(amount) for amount in self.pricing_index.amounts(currency=currency)]
+
+    @read_locked
+    def pricing_summary(self, group_by_service: bool = False) -> Dict[Tuple[str, ...], Dict[str, Any]]:
+        """count/min/max/median of quoted prices per currency (and service type)"""
+        return self.pricing_index.summary(group_by_service=group_by_service)
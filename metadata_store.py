@@ -0,0 +1,188 @@
+import os
+import re
+import json
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple, Union
+from pricing_index import detect_service_type
+from embedding_cache import content_hash
+
+FILES_INDEX_NAME = "files_index.json"
+
+# Filterable fields and the section metadata key each one is read from
+FILTER_FIELDS = {
+    "client": "client",
+    "project": "project",
+    "industry": "client_industry",
+    "service_line": "service_line",
+    "year": "year",
+}
+UNKNOWN = "unknown"
+
+# Used when neither files_index.json nor config.json -> knowledge_base -> client_industries
+# names a client's industry; matched against the client, project and original file name
+INDUSTRY_KEYWORDS = (
+    ("finance", ("exchange", "securities", "bank", "capital", "insurance", "invest")),
+    ("education", ("school", "education", "scholarship", "university", "academy", "skills")),
+    ("energy", ("energy", "power", "solar", "petroleum", "oil and gas")),
+    ("food and hospitality", ("food", "hospitality", "restaurant", "cafe", "caff")),
+    ("retail", ("retail", "mall", "store")),
+    ("real estate", ("real estate", "properties", "property", "community", "harbour", "residences", "developer")),
+    ("logistics", ("logistics", "cargo", "shipping", "freight")),
+    ("aviation", ("airline", "aviation", "airport")),
+    ("non-profit", ("humanitarian", "charity", "foundation", "non-profit")),
+)
+
+_YEAR_RE = re.compile(r"(?<!\d)(20\d{2})(?!\d)")
+_SHORT_DATE_RE = re.compile(r"(?<!\d)\d{1,2}[._]\d{1,2}[._](\d{2})(?!\d)") # 27.01.25, 18_02_25
+_SERVICE_LINE_RE = re.compile(r"\(([^)]+)\)") # "DHL - RFP (Digital Marketing)"
+
+
+def load_files_index(kb_directory: str) -> Dict[str, Dict[str, Any]]:
+    """files_index.json entries keyed by markdown filename ({} when the file is missing)"""
+    path = os.path.join(kb_directory, FILES_INDEX_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except Exception as e:
+        print(f"Could not read {path}: {e}. Proposal metadata falls back to defaults.")
+        return {}
+    # markdown_file is written on Windows ("markdown_responses\\name.md"); keep the base name
+    return {re.split(r"[\\/]", entry.get("markdown_file", ""))[-1]: entry for entry in entries if entry.get("markdown_file")}
+
+
+def files_index_hash(kb_directory: str) -> Optional[str]:
+    """Content hash of files_index.json, part of the artifact build settings"""
+    path = os.path.join(kb_directory, FILES_INDEX_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return content_hash(f.read())
+
+
+def _year(*texts: str) -> str:
+    for text in texts:
+        match = _YEAR_RE.search(text)
+        if match:
+            return match.group(1)
+    for text in texts:
+        match = _SHORT_DATE_RE.search(text)
+        if match:
+            return "20" + match.group(1)
+    return UNKNOWN
+
+
+def _industry(text: str) -> Optional[str]:
+    text = text.lower()
+    for industry, keywords in INDUSTRY_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return industry
+    return None
+
+
+def proposal_metadata(filename: str, entry: Optional[Dict[str, Any]] = None,
+                      client_industries: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """client, project, client_industry, service_line and year of one proposal file"""
+    entry = entry or {}
+    client = entry.get("client") or UNKNOWN
+    project = entry.get("project") or UNKNOWN
+    original = re.split(r"[\\/]", entry.get("original_file", ""))[-1]
+    described = " ".join([client, project, original, filename.replace("_", " ")])
+
+    service_match = _SERVICE_LINE_RE.search(project)
+    service_line = (detect_service_type(service_match.group(1)) if service_match else None) or detect_service_type(described)
+
+    industry = entry.get("industry") or (client_industries or {}).get(client)
+    if not industry and "_industry_" in filename:
+        industry = filename.split("_industry_")[1].split("_")[0]
+    return {
+        "client": client,
+        "project": project,
+        "client_industry": industry or _industry(described) or "general",
+        "service_line": service_line or "general",
+        "year": str(entry["year"]) if entry.get("year") else _year(project, original, filename),
+    }
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Optional[Tuple[Tuple[str, Tuple[str, ...]], ...]]:
+    """Canonical, hashable form of a filters dict: field -> one value or a list of values.
+
+    Used both as part of the search result cache key and by MetadataStore.mask().
+    """
+    if not filters:
+        return None
+    normalized = []
+    for field, values in sorted(filters.items()):
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unknown metadata filter '{field}'. Choose from {', '.join(FILTER_FIELDS)}.")
+        if values is None:
+            continue
+        if isinstance(values, (str, int)):
+            values = [values]
+        normalized.append((field, tuple(sorted({str(value).strip().lower() for value in values}))))
+    return tuple(normalized) or None
+
+
+class MetadataStore:
+    """Proposal metadata of every section as categorical columns (int32 codes by section id).
+
+    A filter is a few vectorised comparisons over the code columns, so restricting a
+    search to one client or year costs O(sections) numpy work, not a pass over dicts.
+    """
+
+    def __init__(self):
+        self.categories = {field: [] for field in FILTER_FIELDS} # code -> lower-cased value
+        self._codes = {field: {} for field in FILTER_FIELDS}      # lower-cased value -> code
+        self._columns = {field: np.full(0, -1, dtype='int32') for field in FILTER_FIELDS}
+        self.size = 0 # rows in use; row i is section id i, -1 codes for removed sections
+
+    def _code(self, field: str, value: Any) -> int:
+        value = str(value).strip().lower()
+        code = self._codes[field].get(value)
+        if code is None:
+            code = len(self.categories[field])
+            self._codes[field][value] = code
+            self.categories[field].append(value)
+        return code
+
+    def _grow(self, size: int):
+        if size <= len(self._columns["client"]):
+            return
+        capacity = max(size, 2 * len(self._columns["client"]), 64)
+        for field, column in self._columns.items():
+            grown = np.full(capacity, -1, dtype='int32')
+            grown[:len(column)] = column
+            self._columns[field] = grown
+
+    def set_sections(self, doc_ids: List[int], metadatas: List[Dict[str, Any]]):
+        """Record the metadata of sections (new or re-registered)"""
+        if not doc_ids:
+            return
+        self._grow(max(doc_ids) + 1)
+        self.size = max(self.size, max(doc_ids) + 1)
+        for field, key in FILTER_FIELDS.items():
+            column = self._columns[field]
+            for doc_id, metadata in zip(doc_ids, metadatas):
+                column[doc_id] = self._code(field, metadata.get(key, UNKNOWN))
+
+    def remove(self, doc_ids: List[int]):
+        for column in self._columns.values():
+            for doc_id in doc_ids:
+                if doc_id < self.size:
+                    column[doc_id] = -1
+
+    def mask(self, filters: Union[Dict[str, Any], Tuple, None]) -> np.ndarray:
+        """Boolean mask over section ids matching every filter (values of one field are OR-ed)"""
+        if isinstance(filters, dict):
+            filters = normalize_filters(filters)
+        mask = self._columns["client"][:self.size] >= 0
+        for field, values in filters or ():
+            codes = [self._codes[field][value] for value in values if value in self._codes[field]]
+            mask &= np.isin(self._columns[field][:self.size], np.array(codes, dtype='int32'))
+        return mask
+
+    def values(self, field: str) -> List[str]:
+        """Values of one field that at least one live section has"""
+        column = self._columns[field][:self.size]
+        return sorted(self.categories[field][code] for code in np.unique(column[column >= 0]))
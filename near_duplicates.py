@@ -0,0 +1,190 @@
+import re
+import zlib
+import numpy as np
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Callable, Iterable
+
+# Sections whose word shingles overlap by at least `threshold` (estimated Jaccard) are
+# near-duplicates: company intros, team bios, terms and conditions pasted into proposal
+# after proposal. Only the first copy (the canonical section) is chunked and indexed; the
+# others point at it and are listed as its sources in search results.
+DEFAULT_NEAR_DUPLICATE_CONFIG = {
+    "enabled": True,
+    "threshold": 0.85,    # estimated Jaccard similarity of word shingles
+    "num_perm": 64,       # MinHash permutations
+    "bands": 16,          # LSH bands; num_perm / bands rows each
+    "shingle_words": 5,
+    "min_words": 20,      # shorter sections are too small to compare reliably and are never collapsed
+    "seed": 1,
+}
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r"\w+")
+
+
+def resolve_near_duplicate_config(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    resolved = dict(DEFAULT_NEAR_DUPLICATE_CONFIG)
+    resolved.update(config or {})
+    if resolved["num_perm"] % resolved["bands"] != 0:
+        print(f"near_duplicates: num_perm {resolved['num_perm']} is not a multiple of bands {resolved['bands']}; using 1 row per band.")
+        resolved["bands"] = resolved["num_perm"]
+    return resolved
+
+
+class NearDuplicateIndex:
+    """MinHash signatures with an LSH band table over the canonical sections.
+
+    add() decides, at registration time, whether a section is a near-duplicate of an
+    already indexed one; remove() promotes a surviving copy when a canonical section goes.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = resolve_near_duplicate_config(config)
+        self.enabled = bool(self.config["enabled"])
+        self.threshold = float(self.config["threshold"])
+        self.bands = int(self.config["bands"])
+        self.rows = int(self.config["num_perm"]) // self.bands
+        self.shingle_words = max(1, int(self.config["shingle_words"]))
+        self.min_words = int(self.config["min_words"])
+        rng = np.random.RandomState(int(self.config["seed"]))
+        # Universal hashing a*x + b mod p, as in datasketch; uint64 arithmetic wraps, so a is
+        # kept below 2**29 and the crc32 shingle hashes are below 2**32
+        self._a = rng.randint(1, 1 << 29, size=int(self.config["num_perm"]), dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 29, size=int(self.config["num_perm"]), dtype=np.uint64)
+        self.canonical_of = {} # duplicate section id -> canonical section id
+        self.duplicates = {}   # canonical section id -> duplicate section ids, in registration order
+        self._signatures = {}  # canonical section id -> MinHash signature
+        self._buckets = defaultdict(list) # (band, band hash) -> canonical section ids
+        self._pending = {}     # canonical section id -> text, signed on first use (opened artifacts)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of a section's word shingles, None if it is too short to compare"""
+        words = _WORD_RE.findall(text.lower())
+        if len(words) < max(self.min_words, 1):
+            return None
+        n = self.shingle_words
+        shingles = {" ".join(words[i:i + n]) for i in range(max(len(words) - n + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # (num_perm, shingles) permuted hashes; a*x stays below 2**61, no overflow
+        permuted = (self._a[:, np.newaxis] * hashes[np.newaxis, :] + self._b[:, np.newaxis]) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[tuple]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _index_canonical(self, doc_id: int, signature: np.ndarray):
+        self._signatures[doc_id] = signature
+        for key in self._band_keys(signature):
+            self._buckets[key].append(doc_id)
+
+    def _unindex_canonical(self, doc_id: int):
+        self._pending.pop(doc_id, None)
+        signature = self._signatures.pop(doc_id, None)
+        if signature is None:
+            return
+        for key in self._band_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket and doc_id in bucket:
+                bucket.remove(doc_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _sign_pending(self):
+        for doc_id, text in list(self._pending.items()):
+            signature = self.signature(text)
+            if signature is not None:
+                self._index_canonical(doc_id, signature)
+        self._pending = {}
+
+    def find(self, signature: np.ndarray) -> Optional[int]:
+        """The canonical section this signature is a near-duplicate of, if any"""
+        self._sign_pending()
+        best_id, best_similarity = None, self.threshold
+        seen = set()
+        for key in self._band_keys(signature):
+            for doc_id in self._buckets.get(key, ()):
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                similarity = float(np.mean(self._signatures[doc_id] == signature))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = doc_id, similarity
+        return best_id
+
+    def add(self, doc_id: int, text: str) -> Optional[int]:
+        """Register a new section; returns the canonical id if it is a near-duplicate, else None"""
+        if not self.enabled:
+            return None
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        canonical = self.find(signature)
+        if canonical is None:
+            self._index_canonical(doc_id, signature)
+            return None
+        self.canonical_of[doc_id] = canonical
+        self.duplicates.setdefault(canonical, []).append(doc_id)
+        return canonical
+
+    def remove(self, doc_ids: Iterable[int], text_of: Callable[[int], str]) -> List[int]:
+        """Forget removed sections. Where a canonical section is removed but copies of it
+        survive, the first survivor becomes canonical; returns those promoted ids, which
+        the caller must now index."""
+        removing = set(doc_ids)
+        promoted = []
+        for doc_id in removing:
+            canonical = self.canonical_of.pop(doc_id, None)
+            if canonical is not None:
+                copies = self.duplicates.get(canonical, [])
+                if doc_id in copies:
+                    copies.remove(doc_id)
+                if not copies:
+                    self.duplicates.pop(canonical, None)
+                continue
+            self._unindex_canonical(doc_id)
+            survivors = [d for d in self.duplicates.pop(doc_id, []) if d not in removing]
+            if not survivors:
+                continue
+            new_canonical, rest = survivors[0], survivors[1:]
+            self.canonical_of.pop(new_canonical, None)
+            for d in rest:
+                self.canonical_of[d] = new_canonical
+            if rest:
+                self.duplicates[new_canonical] = rest
+            self._pending[new_canonical] = text_of(new_canonical)
+            promoted.append(new_canonical)
+        return sorted(promoted)
+
+    def is_duplicate(self, doc_id: int) -> bool:
+        return doc_id in self.canonical_of
+
+    def canonical(self, doc_id: int) -> int:
+        return self.canonical_of.get(doc_id, doc_id)
+
+    def copies(self, doc_id: int) -> List[int]:
+        """The canonical section followed by every section collapsed into it"""
+        canonical = self.canonical(doc_id)
+        return [canonical] + self.duplicates.get(canonical, [])
+
+    def to_mapping(self) -> Dict[str, int]:
+        """duplicate id -> canonical id, JSON-ready, for the artifact manifest"""
+        return {str(doc_id): canonical for doc_id, canonical in self.canonical_of.items()}
+
+    def restore(self, mapping: Dict[str, int], documents: List[Optional[Dict[str, Any]]]):
+        """Load the decisions stored in an artifact; canonical signatures are only computed
+        when the next add() or remove() needs them"""
+        self.canonical_of = {int(doc_id): int(canonical) for doc_id, canonical in mapping.items()}
+        self.duplicates = {}
+        for doc_id in sorted(self.canonical_of):
+            self.duplicates.setdefault(self.canonical_of[doc_id], []).append(doc_id)
+        self._signatures = {}
+        self._buckets = defaultdict(list)
+        if self.enabled:
+            self._pending = {
+                doc["id"]: doc["content"] for doc in documents
+                if doc is not None and doc["id"] not in self.canonical_of
+            }
+
+    def stats(self) -> Dict[str, int]:
+        return {"duplicates": len(self.canonical_of), "canonical_with_duplicates": len(self.duplicates)}
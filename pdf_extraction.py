@@ -0,0 +1,155 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from text_cleaner import clean_text
+
+# Backends selectable through config.json -> document_processing -> pdf -> backend
+#   pypdfium2  PDFium (the Chrome PDF engine) through pypdfium2: the fastest by far
+#   pdfminer   pdfminer.six layout analysis: pure Python, slow, good reading order
+#   pypdf2     PyPDF2 (the original behaviour; always installed)
+# A backend that is not installed falls back to pypdf2 with a printed reason (once per process).
+PDF_BACKENDS = ("pypdfium2", "pdfminer", "pypdf2")
+
+DEFAULT_PDF_CONFIG = {
+    "backend": "pypdfium2",
+    "workers": None,           # processes for long PDFs; None = one per core, 1 = always in-process
+    "pages_per_task": 16,      # pages one worker extracts per task
+    "min_pages_for_pool": 48,  # below this the pool start-up costs more than it saves
+}
+
+_reported_fallbacks = set() # backends whose fallback was already printed
+
+
+def resolve_pdf_config(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """DEFAULT_PDF_CONFIG overlaid with ``config``, the backend checked against what is installed"""
+    resolved = dict(DEFAULT_PDF_CONFIG)
+    resolved.update(config or {})
+    backend = resolved["backend"]
+    if backend not in PDF_BACKENDS:
+        print(f"Unknown PDF backend '{backend}'. Falling back to 'pypdf2'. Choose one of {', '.join(PDF_BACKENDS)}.")
+        backend = "pypdf2"
+    try:
+        if backend == "pypdfium2":
+            import pypdfium2 # noqa: F401
+        elif backend == "pdfminer":
+            import pdfminer.high_level # noqa: F401
+    except ImportError as e:
+        if backend not in _reported_fallbacks:
+            _reported_fallbacks.add(backend)
+            print(f"PDF backend '{backend}' is not available ({e}). Falling back to 'pypdf2'.")
+        backend = "pypdf2"
+    resolved["backend"] = backend
+    return resolved
+
+
+def page_count(file_path: str, backend: str) -> int:
+    if backend == "pypdfium2":
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(file_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    if backend == "pdfminer":
+        from pdfminer.pdfpage import PDFPage
+        with open(file_path, 'rb') as f:
+            return sum(1 for _ in PDFPage.get_pages(f))
+    import PyPDF2
+    with open(file_path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def _pages_pypdfium2(file_path: str, start: int, end: int) -> Iterator[str]:
+    import pypdfium2
+    pdf = pypdfium2.PdfDocument(file_path)
+    try:
+        for index in range(start, end):
+            page = pdf[index]
+            text_page = page.get_textpage()
+            yield text_page.get_text_range()
+            text_page.close()
+            page.close()
+    finally:
+        pdf.close()
+
+
+def _pages_pdfminer(file_path: str, start: int, end: int) -> Iterator[str]:
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+    for page in extract_pages(file_path, page_numbers=range(start, end)):
+        yield "".join(element.get_text() for element in page if isinstance(element, LTTextContainer))
+
+
+def _pages_pypdf2(file_path: str, start: int, end: int) -> Iterator[str]:
+    import PyPDF2
+    with open(file_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        for index in range(start, end):
+            yield reader.pages[index].extract_text() or ""
+
+
+_PAGE_READERS = {"pypdfium2": _pages_pypdfium2, "pdfminer": _pages_pdfminer, "pypdf2": _pages_pypdf2}
+
+
+def iter_page_range(file_path: str, backend: str, start: int, end: int) -> Iterator[str]:
+    """Cleaned text of pages [start, end), one page at a time"""
+    for text in _PAGE_READERS[backend](file_path, start, end):
+        yield clean_text(text)
+
+
+def extract_page_range(file_path: str, backend: str, start: int, end: int) -> List[str]:
+    """Worker task: cleaned text of pages [start, end) (cleaning runs in the worker too)"""
+    return list(iter_page_range(file_path, backend, start, end))
+
+
+def iter_pdf_pages(file_path: str, config: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """Cleaned text of every page of a PDF, in page order, as a generator.
+
+    Long PDFs are split into page ranges extracted by a process pool; only a few ranges
+    are in flight at a time, so memory stays bounded by the window, not the document.
+    Without a usable pool (sandbox, no /dev/shm) the remaining pages are read in-process.
+    """
+    config = resolve_pdf_config(config)
+    backend = config["backend"]
+    pages = page_count(file_path, backend)
+    workers = config["workers"] or os.cpu_count() or 1
+    workers = max(1, min(int(workers), pages))
+    pages_per_task = max(1, int(config["pages_per_task"]))
+
+    next_page = 0
+    if workers > 1 and pages >= int(config["min_pages_for_pool"]):
+        ranges = [(start, min(start + pages_per_task, pages)) for start in range(0, pages, pages_per_task)]
+        try:
+            # spawn, not fork: the app process holds models and threads (see kb_snapshots.py)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                window = 2 * workers
+                futures = [pool.submit(extract_page_range, file_path, backend, start, end) for start, end in ranges[:window]]
+                for position in range(len(ranges)):
+                    texts = futures[position].result()
+                    if position + window < len(ranges):
+                        futures.append(pool.submit(extract_page_range, file_path, backend, *ranges[position + window]))
+                    futures[position] = None # let the finished range go
+                    for text in texts:
+                        next_page += 1
+                        yield text
+            return
+        except (OSError, RuntimeError) as e:
+            print(f"Parallel PDF extraction unavailable ({e}); reading pages {next_page + 1}-{pages} in-process.")
+    yield from iter_page_range(file_path, backend, next_page, pages)
+
+
+def time_pages(file_path: str, backend: str) -> Tuple[int, List[float]]:
+    """(page count, seconds per page) of an in-process extraction, for benchmarks"""
+    pages = page_count(file_path, backend)
+    timings = []
+    reader = iter_page_range(file_path, backend, 0, pages)
+    while True:
+        started = time.perf_counter()
+        try:
+            next(reader)
+        except StopIteration:
+            break
+        timings.append(time.perf_counter() - started)
+    return pages, timings
@@ -0,0 +1,248 @@
+import re
+import numpy as np
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+
+# Currency tokens as they appear in the (cleaned) KB text -> ISO code. The cleaner strips
+# non-latin-1 symbols such as the euro and rupee signs, so EUR and Rs/INR are what is left
+# of those amounts.
+CURRENCY_CODES = {
+    "AED": "AED", "DH": "AED", "DHS": "AED",
+    "USD": "USD", "US$": "USD", "$": "USD",
+    "EUR": "EUR",
+    "SAR": "SAR",
+    "INR": "INR", "RS": "INR",
+}
+
+_AMOUNT = r"(\d[\d,]*(?:\.\d+)?)(?:\s?(k|mn|m|million|bn|billion)\b)?"
+_PREFIX_PRICE = re.compile(r"(?<![A-Za-z])(AED|Dhs?\.?|USD|US\$|\$|EUR|SAR|INR|Rs\.?)\s?" + _AMOUNT, re.IGNORECASE)
+_SUFFIX_PRICE = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s?(AED|Dhs|USD|EUR|SAR|INR)\b", re.IGNORECASE)
+_MULTIPLIERS = {"k": 1e3, "m": 1e6, "mn": 1e6, "million": 1e6, "bn": 1e9, "billion": 1e9}
+
+# Section headings that open the commercial part of a proposal ("budget"/"cost" headings in
+# these decks are mostly campaign reporting, not quotes). The prices usually sit in the few
+# sections after such a heading ("COMMERCIAL PROPOSAL" is often a title slide followed by
+# "Website Design & Development"), so the next COMMERCIAL_RUN_SECTIONS sections count too;
+# headings that continue a price list (add-ons, totals) do not use up that window. The run
+# then ends, so campaign reports later in the same deck are not counted as quotes.
+COMMERCIAL_TERMS = ("commercial", "pricing", "price list", "quotation", "fees", "packages", "financial proposal", "financials")
+CONTINUATION_TERMS = ("add on", "add-on", "addon", "optional", "additional", "total", "summary", "package", "option")
+COMMERCIAL_RUN_SECTIONS = 3
+# Metric and reporting headings ("RESULTS", "AVG. CPC", "Revenue") are never quoted pricing
+# and end a commercial run
+REPORTING_TERMS = ("result", "cpc", "cpm", "ctr", "cpa", "roas", "roi", "conversion", "revenue", "keyword",
+                   "impression", "click", "allocation", "top performing", "performance of", "analytics")
+_REPORTING_HEADING = re.compile(r"\b(?:" + "|".join(re.escape(term) for term in REPORTING_TERMS) + ")", re.IGNORECASE)
+
+# Checked against the section name first, then the latest matching heading, then the filename
+SERVICE_TYPES = (
+    ("seo", ("seo",)),
+    ("website", ("website", "web design", "web development")),
+    ("social media", ("social media",)),
+    ("crm", ("crm", "hubspot")),
+    ("performance marketing", ("performance", "campaign", "paid media", "media buying")),
+    ("digital marketing", ("digital marketing",)),
+)
+DEFAULT_SERVICE_TYPE = "general"
+
+_LABEL_MAX_CHARS = 80
+
+
+def detect_service_type(text: str) -> Optional[str]:
+    text = text.replace("_", " ").lower()
+    for service_type, keywords in SERVICE_TYPES:
+        if any(keyword in text for keyword in keywords):
+            return service_type
+    return None
+
+
+def is_reporting_heading(section_name: str) -> bool:
+    return bool(_REPORTING_HEADING.search(section_name))
+
+
+def is_commercial_heading(section_name: str) -> bool:
+    name = section_name.lower()
+    return any(term in name for term in COMMERCIAL_TERMS) and not is_reporting_heading(section_name)
+
+
+def continues_commercial(section_name: str) -> bool:
+    """True for headings that carry on a price list (add-ons, totals) after a commercial heading"""
+    name = section_name.lower()
+    return any(term in name for term in CONTINUATION_TERMS) and not is_reporting_heading(section_name)
+
+
+def _parse_amount(number: str, multiplier: Optional[str]) -> float:
+    value = float(number.replace(",", ""))
+    if multiplier:
+        value *= _MULTIPLIERS[multiplier.lower()]
+    return value
+
+
+def _is_amount_cell(cell: str) -> bool:
+    """True for table cells that are just a number or a price, which make poor labels"""
+    stripped = _PREFIX_PRICE.sub("", _SUFFIX_PRICE.sub("", cell))
+    return not re.sub(r"[\d,.%\s\-]", "", stripped)
+
+
+def _line_item_label(line: str, position: int, fallback: str) -> str:
+    """Label for the price at ``position`` in ``line``: the nearest descriptive table cell to
+    its left, or the text before it on a prose line"""
+    if line.lstrip().startswith("|"):
+        cells = line.split("|")
+        offset, index = 0, 0
+        for index, cell in enumerate(cells):
+            if offset + len(cell) >= position:
+                break
+            offset += len(cell) + 1
+        candidates = [cell.strip() for cell in reversed(cells[:index + 1])] + [cell.strip() for cell in cells]
+        label = next((cell for cell in candidates if cell and not _is_amount_cell(cell)), "")
+    else:
+        label = line[:position]
+    label = label.strip(" -*:|\t")
+    return label[:_LABEL_MAX_CHARS].rstrip() or fallback
+
+
+def extract_prices(text: str, section_name: str = "") -> List[Dict[str, Any]]:
+    """Every currency amount in ``text`` as {amount, currency, label}"""
+    prices = []
+    for line in text.split("\n"):
+        if not any(char.isdigit() for char in line):
+            continue
+        taken = []
+        for match in _PREFIX_PRICE.finditer(line):
+            code = CURRENCY_CODES[match.group(1).upper().rstrip(".")]
+            prices.append({
+                "amount": _parse_amount(match.group(2), match.group(3)),
+                "currency": code,
+                "label": _line_item_label(line, match.start(), section_name),
+            })
+            taken.append(match.span())
+        for match in _SUFFIX_PRICE.finditer(line):
+            if any(start < match.end() and match.start() < end for start, end in taken):
+                continue
+            prices.append({
+                "amount": _parse_amount(match.group(1), None),
+                "currency": CURRENCY_CODES[match.group(2).upper()],
+                "label": _line_item_label(line, match.start(), section_name),
+            })
+    return prices
+
+
+class PricingIndex:
+    """Structured index of every price quoted in the knowledge base.
+
+    Built from the in-memory section documents (never from disk) and kept in step with
+    the KB through add_file/remove_documents. Entries are dicts with amount, currency,
+    filename, section_name, label, service_type, commercial and doc_id. Aggregates run on
+    columnar numpy copies that are rebuilt lazily after a change.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self._doc_entries = {} # section id -> positions in self.entries
+        self._removed = set() # positions of entries whose section was removed
+        self._columns = None
+        self._summary_cache = {}
+
+    def __len__(self):
+        return len(self.entries) - len(self._removed)
+
+    def add_file(self, filename: str, documents: List[Dict[str, Any]]):
+        """Index the sections of one file, given in file order"""
+        run = 0 # sections left in the current commercial run
+        file_service = detect_service_type(filename) or DEFAULT_SERVICE_TYPE
+        heading_service = None
+        for document in documents:
+            section_name = document["section_name"]
+            if is_reporting_heading(section_name):
+                run = 0
+            elif is_commercial_heading(section_name):
+                run = COMMERCIAL_RUN_SECTIONS + 1
+            elif run and not continues_commercial(section_name):
+                run -= 1
+            commercial = run > 0
+            heading_service = detect_service_type(section_name) or heading_service
+            positions = []
+            for price in extract_prices(document["content"], section_name):
+                positions.append(len(self.entries))
+                self.entries.append({
+                    **price,
+                    "filename": document["filename"],
+                    "section_name": section_name,
+                    "service_type": heading_service or file_service,
+                    "commercial": commercial,
+                    "doc_id": document["id"],
+                })
+            if positions:
+                self._doc_entries[document["id"]] = positions
+        self._invalidate()
+
+    def remove_documents(self, doc_ids: List[int]):
+        for doc_id in doc_ids:
+            self._removed.update(self._doc_entries.pop(doc_id, []))
+        self._invalidate()
+
+    def _invalidate(self):
+        self._columns = None
+        self._summary_cache = {}
+
+    def _get_columns(self) -> Dict[str, np.ndarray]:
+        if self._columns is None:
+            live = [i for i in range(len(self.entries)) if i not in self._removed]
+            self._columns = {
+                "position": np.array(live, dtype='int64'),
+                "amount": np.array([self.entries[i]["amount"] for i in live], dtype='float64'),
+                "currency": np.array([self.entries[i]["currency"] for i in live], dtype=object),
+                "service_type": np.array([self.entries[i]["service_type"] for i in live], dtype=object),
+                "commercial": np.array([self.entries[i]["commercial"] for i in live], dtype=bool),
+            }
+        return self._columns
+
+    def _mask(self, currency: Optional[str], service_type: Optional[str], commercial_only: bool) -> np.ndarray:
+        columns = self._get_columns()
+        mask = np.ones(len(columns["amount"]), dtype=bool)
+        if currency:
+            mask &= columns["currency"] == currency
+        if service_type:
+            mask &= columns["service_type"] == service_type
+        if commercial_only:
+            mask &= columns["commercial"]
+        return mask
+
+    def query(self, currency: Optional[str] = None, service_type: Optional[str] = None,
+              commercial_only: bool = True) -> List[Dict[str, Any]]:
+        """Matching entries, in KB order"""
+        positions = self._get_columns()["position"][self._mask(currency, service_type, commercial_only)]
+        return [self.entries[i] for i in positions]
+
+    def amounts(self, currency: Optional[str] = None, service_type: Optional[str] = None,
+                commercial_only: bool = True) -> np.ndarray:
+        return self._get_columns()["amount"][self._mask(currency, service_type, commercial_only)]
+
+    def summary(self, group_by_service: bool = False, commercial_only: bool = True) -> Dict[Tuple[str, ...], Dict[str, Any]]:
+        """count/min/max/median per currency, or per (currency, service type) with group_by_service"""
+        cache_key = (group_by_service, commercial_only)
+        if cache_key not in self._summary_cache:
+            columns = self._get_columns()
+            mask = self._mask(None, None, commercial_only)
+            groups = defaultdict(list)
+            if group_by_service:
+                keys = zip(columns["currency"][mask], columns["service_type"][mask])
+            else:
+                keys = ((currency,) for currency in columns["currency"][mask])
+            for key, amount in zip(keys, columns["amount"][mask]):
+                groups[tuple(key)].append(amount)
+            summary = {}
+            for group in sorted(groups):
+                selected = np.array(groups[group])
+                summary[group] = {
+                    "count": int(len(selected)),
+                    "min": float(selected.min()),
+                    "max": float(selected.max()),
+                    "median": float(np.median(selected)),
+                }
+            self._summary_cache[cache_key] = summary
+        return self._summary_cache[cache_key]
+
+    def files(self, commercial_only: bool = True) -> List[str]:
+        return sorted({entry["filename"] for entry in self.query(commercial_only=commercial_only)})
@@ -0,0 +1,49 @@
+import threading
+from typing import Any, Dict, Hashable, Optional
+from cachetools import TTLCache
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a (cleaned) query used both as cache key and as encoder input"""
+    return " ".join(query.split())
+
+
+class QueryCache:
+    """In-process LRU cache bounded by entry count and age, with hit/miss counters.
+
+    cachetools caches are not thread-safe on their own; Streamlit serves sessions from
+    several threads, so every access goes through a lock.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self._cache = TTLCache(maxsize=max(1, int(max_entries)), ttl=float(ttl_seconds))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._cache[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,124 @@
+import math
+import time
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+from embedding_cache import content_hash
+from query_cache import QueryCache, normalize_query
+from search_hits import SearchHit
+
+DEFAULT_RERANKER_CONFIG = {
+    "enabled": False,
+    "model": "cross-encoder/ms-marco-MiniLM-L-6-v2",
+    "candidates": 20,     # retrieval results scored per query
+    "budget_ms": 250,     # per-query time budget; unscored candidates keep their retrieval order
+    "batch_size": 8,
+    "max_length": 256,    # tokens of (query, passage) the cross-encoder reads
+    "max_chars": 2000,    # passage text sent to the tokenizer
+    "cache_entries": 20000,
+    "cache_ttl_seconds": 24 * 3600,
+}
+
+
+def resolve_reranker_config(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    resolved = dict(DEFAULT_RERANKER_CONFIG)
+    resolved.update(config or {})
+    return resolved
+
+
+def _sigmoid(logit: float) -> float:
+    if logit >= 0:
+        return 1.0 / (1.0 + math.exp(-logit))
+    z = math.exp(logit)
+    return z / (1.0 + z)
+
+
+class CrossEncoderReranker:
+    """Re-orders retrieval results with a local cross-encoder, within a per-query time budget.
+
+    Scores are the cross-encoder's relevance probability (sigmoid of its logit) and only set
+    the order; each hit keeps its fused score as ``retrieval_score`` and its cosine-scale
+    ``relevance``, which is what generate_section's cut-offs read. Scores of (query, passage)
+    pairs are cached, so repeated queries over an unchanged KB cost nothing. The model is
+    loaded on first use.
+
+    One instance serves every session sharing the knowledge base (kb_registry.py), so it
+    keeps no per-query state: rerank_with_stats returns each call's stats with its results.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = resolve_reranker_config(config)
+        self.model_name = self.config["model"]
+        self._model = None
+        self._model_lock = threading.Lock() # concurrent first searches load the model once
+        self.pair_cache = QueryCache(self.config["cache_entries"], self.config["cache_ttl_seconds"])
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, max_length=int(self.config["max_length"]), device='cpu')
+                    print(f"CrossEncoder loaded on CPU for model: {self.model_name}")
+        return self._model
+
+    def _passage(self, result: SearchHit) -> str:
+        document = result.document
+        return f"{document.section_name}\n{document.content}"[:int(self.config["max_chars"])]
+
+    def rerank(self, query: str, results: List[SearchHit], top_k: Optional[int] = None) -> List[SearchHit]:
+        """Return ``results`` re-ordered by cross-encoder score (best first), cut to ``top_k``"""
+        return self.rerank_with_stats(query, results, top_k)[0]
+
+    def rerank_with_stats(self, query: str, results: List[SearchHit],
+                          top_k: Optional[int] = None) -> Tuple[List[SearchHit], Dict[str, Any]]:
+        """rerank, plus this call's stats (candidates, cached, scored, skipped, ms).
+
+        Candidates are scored in retrieval order, cached pairs first; once the budget would be
+        exceeded the rest are placed after the scored ones, in retrieval order with their
+        retrieval scores. Each returned result keeps its fused score as ``retrieval_score``.
+        """
+        started = time.perf_counter()
+        budget = float(self.config["budget_ms"]) / 1000.0
+        candidates = results[:int(self.config["candidates"])]
+        query_key = normalize_query(query)
+        keys = [(self.model_name, query_key, content_hash(self._passage(result))) for result in candidates]
+
+        scores = [self.pair_cache.get(key) for key in keys]
+        cached = sum(score is not None for score in scores)
+        pending = [i for i, score in enumerate(scores) if score is None]
+        batch_size = max(1, int(self.config["batch_size"]))
+        last_batch = 0.0
+        scored_now = 0
+        for start in range(0, len(pending), batch_size):
+            elapsed = time.perf_counter() - started
+            # The first batch always runs; later ones only if they are expected to fit
+            if start and elapsed + last_batch > budget:
+                break
+            batch = pending[start:start + batch_size]
+            batch_started = time.perf_counter()
+            logits = self.model.predict([(query, self._passage(candidates[i])) for i in batch], batch_size=batch_size)
+            last_batch = time.perf_counter() - batch_started
+            for i, logit in zip(batch, logits):
+                scores[i] = _sigmoid(float(logit))
+                self.pair_cache.put(keys[i], scores[i])
+            scored_now += len(batch)
+
+        reranked, unscored = [], []
+        for result, score in zip(candidates, scores):
+            # A new hit sharing the same document view; the fused score moves to retrieval_score
+            if score is None:
+                unscored.append(result.rescored())
+            else:
+                reranked.append(result.rescored(score))
+        reranked.sort(key=lambda entry: entry.score, reverse=True)
+        ordered = reranked + unscored + list(results[len(candidates):])
+
+        stats = {
+            "candidates": len(candidates),
+            "cached": cached,
+            "scored": scored_now,
+            "skipped": len(unscored),
+            "ms": (time.perf_counter() - started) * 1000.0,
+        }
+        return (ordered[:top_k] if top_k is not None else ordered), stats
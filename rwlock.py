@@ -0,0 +1,79 @@
+import threading
+import functools
+
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer.
+
+    The writer lock is re-entrant for the thread holding it (sync_directory calls
+    add_document), and that thread may also take read locks. A thread holding a read lock
+    must not ask for the write lock.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None # ident of the thread holding the write lock
+        self._writer_depth = 0
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._writer_depth += 1 # read inside our own write
+                return
+            while self._writer is not None:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._writer_depth -= 1
+                return
+            self._readers -= 1
+            if self._readers == 0:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            while self._writer is not None or self._readers > 0:
+                self._condition.wait()
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        with self._condition:
+            self._writer_depth -= 1
+            if self._writer_depth == 0:
+                self._writer = None
+                self._condition.notify_all()
+
+
+def read_locked(method):
+    """Run a method under ``self._rwlock`` as a reader"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._rwlock.acquire_read()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._rwlock.release_read()
+    return wrapper
+
+
+def write_locked(method):
+    """Run a method under ``self._rwlock`` as the single writer"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._rwlock.acquire_write()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._rwlock.release_write()
+    return wrapper
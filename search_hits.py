@@ -0,0 +1,138 @@
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional
+
+# Search results reference the knowledge base's stored section documents instead of copying
+# them: section bodies were cleaned once at load, so a hit hands out that same string.
+# Both classes are read-only and also answer the dict-style access older callers use
+# (hit["score"], hit["document"]["content"], hit.get("score", 0)).
+
+_DOCUMENT_FIELDS = ("id", "filename", "section_name", "content", "metadata", "sources")
+
+
+class DocumentView:
+    """Read-only view of one stored section; ``sources`` is resolved on first access"""
+    __slots__ = ("_document", "_owner", "_sources")
+
+    def __init__(self, document: Dict[str, Any], owner=None):
+        object.__setattr__(self, "_document", document)
+        object.__setattr__(self, "_owner", owner) # the knowledge base, asked for collapsed copies
+        object.__setattr__(self, "_sources", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Search results are read-only")
+
+    @property
+    def id(self) -> int:
+        return self._document["id"]
+
+    @property
+    def filename(self) -> str:
+        return self._document["filename"]
+
+    @property
+    def section_name(self) -> str:
+        return self._document["section_name"]
+
+    @property
+    def content(self) -> str:
+        return self._document["content"]
+
+    @property
+    def metadata(self) -> Mapping[str, Any]:
+        # A read-only proxy: the dict itself is the knowledge base's stored metadata
+        return MappingProxyType(self._document["metadata"])
+
+    @property
+    def sources(self) -> List[Dict[str, Any]]:
+        """Every section collapsed into this one, itself first (see near_duplicates.py)"""
+        if self._sources is None:
+            sources = self._owner.source_refs(self.id) if self._owner is not None else \
+                [{"id": self.id, "filename": self.filename, "section_name": self.section_name}]
+            object.__setattr__(self, "_sources", sources)
+        return self._sources
+
+    def __getitem__(self, key: str):
+        if key not in _DOCUMENT_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in _DOCUMENT_FIELDS else default
+
+    def __contains__(self, key) -> bool:
+        return key in _DOCUMENT_FIELDS
+
+    def keys(self):
+        return _DOCUMENT_FIELDS
+
+    def to_dict(self) -> Dict[str, Any]:
+        """A plain dict copy, for JSON export and the like"""
+        document = {key: getattr(self, key) for key in _DOCUMENT_FIELDS}
+        document["metadata"] = dict(document["metadata"])
+        return document
+
+    def __repr__(self):
+        return f"DocumentView(id={self.id}, filename={self.filename!r}, section_name={self.section_name!r})"
+
+
+class SearchHit:
+    """One search result: a score and a view of the stored section.
+
+    ``score`` orders results (fused retrieval score, or the reranker's); ``relevance`` is the
+    query similarity on the dense cosine scale (fusion.dense_relevance) and is what absolute
+    cut-offs should compare against. It falls back to ``score`` when not set.
+    """
+    __slots__ = ("score", "document", "retrieval_score", "_relevance")
+
+    def __init__(self, score: float, document: DocumentView, retrieval_score: Optional[float] = None,
+                 relevance: Optional[float] = None):
+        object.__setattr__(self, "score", score)
+        object.__setattr__(self, "document", document)
+        # Set once a reranker has replaced the fused retrieval score
+        object.__setattr__(self, "retrieval_score", retrieval_score)
+        object.__setattr__(self, "_relevance", relevance)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Search results are read-only")
+
+    @property
+    def id(self) -> int:
+        return self.document.id
+
+    @property
+    def content(self) -> str:
+        return self.document.content
+
+    @property
+    def relevance(self) -> float:
+        return self.score if self._relevance is None else self._relevance
+
+    def rescored(self, score: Optional[float] = None) -> "SearchHit":
+        """A copy with a reranker score; the original fused score is kept as retrieval_score"""
+        retrieval_score = self.score if self.retrieval_score is None else self.retrieval_score
+        return SearchHit(self.score if score is None else score, self.document, retrieval_score, self._relevance)
+
+    def __getitem__(self, key: str):
+        if key == "retrieval_score" and self.retrieval_score is None:
+            raise KeyError(key)
+        if key not in ("score", "document", "retrieval_score", "relevance"):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key) -> bool:
+        return key in ("score", "document", "relevance") or (key == "retrieval_score" and self.retrieval_score is not None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {"score": self.score, "relevance": self.relevance, "document": self.document.to_dict()}
+        if self.retrieval_score is not None:
+            result["retrieval_score"] = self.retrieval_score
+        return result
+
+    def __repr__(self):
+        return f"SearchHit(score={self.score:.4f}, relevance={self.relevance:.4f}, id={self.id}, section_name={self.document.section_name!r})"
@@ -0,0 +1,147 @@
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Any, List, Optional
+
+# Header variants such as "Scope of Work", "SCOPE OF WORK", "2. Scope Of Works:" are one
+# section. Names are first reduced to a key (lower case, no enumerator, no filler words,
+# crude singular forms); keys that still differ are merged when their character trigrams
+# are similar enough, their lengths are close (an extra word is a different section:
+# "Competitor Ads Analysis") and they carry the same numbers ("Phase 1" is not "Phase 2",
+# "B2B" is not "B2C").
+DEFAULT_SECTION_NAME_CONFIG = {
+    "similarity": 0.8,      # trigram Jaccard between keys to put them in one group
+    "min_fuzzy_length": 6,  # shorter keys only match exactly
+    "min_length_ratio": 0.9, # shorter key / longer key
+}
+
+# "2.", "2.1)", "3-", "Section 4:" or a bare "2 " in front of the header; not years ("2024 Highlights")
+_ENUMERATOR_RE = re.compile(r"^\s*(?:section\s+)?\d{1,2}(?:\.\d+)*(?:\s*[.)\-:]+\s*|\s+)", re.IGNORECASE)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_FILLER_WORDS = {"a", "an", "the", "of", "and", "for", "to", "in", "our", "your"}
+
+
+def _singular(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def section_key(name: str) -> str:
+    """Normalized form of a section header; variants of one header share a key"""
+    lowered = _ENUMERATOR_RE.sub("", name.lower().replace("&", " and "), count=1)
+    tokens = [_singular(token) for token in _TOKEN_RE.findall(lowered) if token not in _FILLER_WORDS]
+    if not tokens: # e.g. a header that is only an enumerator or only filler words
+        tokens = _TOKEN_RE.findall(name.lower())
+    return " ".join(tokens)
+
+
+def _trigrams(key: str) -> set:
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _numbers(key: str) -> tuple:
+    return tuple(token for token in key.split() if any(char.isdigit() for char in token))
+
+
+class SectionNameIndex:
+    """Groups of header variants with precomputed section counts.
+
+    Lookups of a known variant are a dict access; an unseen variant is keyed and, failing
+    that, matched against the known keys through a trigram inverted index.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = dict(DEFAULT_SECTION_NAME_CONFIG)
+        self.config.update(config or {})
+        self.similarity = float(self.config["similarity"])
+        self.min_fuzzy_length = int(self.config["min_fuzzy_length"])
+        self.min_length_ratio = float(self.config["min_length_ratio"])
+        self._group_of_variant = {} # raw section name -> group id
+        self._group_of_key = {}     # section_key -> group id
+        self._key_trigrams = {}     # section_key -> its trigrams
+        self._trigram_keys = defaultdict(set) # trigram -> keys containing it
+        self._variants = []         # group id -> Counter(raw name -> live sections)
+        self._counts = []           # group id -> live sections in the group
+
+    def _fuzzy_key(self, key: str) -> Optional[str]:
+        """The known key most similar to ``key`` above the threshold, if any"""
+        if len(key) < self.min_fuzzy_length:
+            return None
+        trigrams = _trigrams(key)
+        shared = Counter()
+        for trigram in trigrams:
+            for other in self._trigram_keys.get(trigram, ()):
+                shared[other] += 1
+        numbers = _numbers(key)
+        best_key, best_similarity = None, self.similarity
+        for other, overlap in shared.items():
+            similarity = overlap / (len(trigrams) + len(self._key_trigrams[other]) - overlap)
+            close_length = min(len(key), len(other)) >= self.min_length_ratio * max(len(key), len(other))
+            if similarity >= best_similarity and close_length and _numbers(other) == numbers:
+                best_key, best_similarity = other, similarity
+        return best_key
+
+    def _find_group(self, name: str) -> Optional[int]:
+        group = self._group_of_variant.get(name)
+        if group is not None:
+            return group
+        key = section_key(name)
+        group = self._group_of_key.get(key)
+        if group is not None:
+            return group
+        fuzzy = self._fuzzy_key(key)
+        return self._group_of_key[fuzzy] if fuzzy is not None else None
+
+    def add(self, name: str, count: int = 1):
+        """Count ``count`` more sections under this header"""
+        group = self._find_group(name)
+        if group is None:
+            group = len(self._variants)
+            self._variants.append(Counter())
+            self._counts.append(0)
+        key = section_key(name)
+        if key not in self._group_of_key:
+            self._group_of_key[key] = group
+            self._key_trigrams[key] = _trigrams(key)
+            if len(key) >= self.min_fuzzy_length:
+                for trigram in self._key_trigrams[key]:
+                    self._trigram_keys[trigram].add(key)
+        self._group_of_variant[name] = group
+        self._variants[group][name] += count
+        self._counts[group] += count
+
+    def remove(self, name: str, count: int = 1):
+        """Count ``count`` fewer sections under this header (the variant stays known)"""
+        group = self._group_of_variant.get(name)
+        if group is None:
+            return
+        removed = min(count, self._variants[group][name])
+        self._variants[group][name] -= removed
+        self._counts[group] -= removed
+
+    def variants(self, name: str) -> List[str]:
+        """Every header in the same group as ``name`` that still has sections"""
+        group = self._find_group(name)
+        if group is None:
+            return []
+        return [variant for variant, count in self._variants[group].items() if count > 0]
+
+    def canonical_name(self, name: str) -> Optional[str]:
+        """The most used header of the group ``name`` belongs to"""
+        group = self._find_group(name)
+        if group is None or self._counts[group] <= 0:
+            return None
+        return self._variants[group].most_common(1)[0][0]
+
+    def common(self, top_n: int = 15) -> List[str]:
+        """Canonical names of the groups with the most sections, most frequent first"""
+        ranked = sorted((group for group, count in enumerate(self._counts) if count > 0),
+                        key=lambda group: -self._counts[group])[:top_n]
+        return [self._variants[group].most_common(1)[0][0] for group in ranked]
+
+    def stats(self) -> Dict[str, int]:
+        return {"variants": sum(1 for variants in self._variants for count in variants.values() if count > 0),
+                "groups": sum(1 for count in self._counts if count > 0)}
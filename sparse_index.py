@@ -0,0 +1,220 @@
+import re
+import heapq
+import math
+import numpy as np
+from collections import Counter, defaultdict
+from operator import itemgetter
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+DEFAULT_BM25_CONFIG = {
+    "k1": 1.2, # term frequency saturation
+    "b": 0.75, # document length normalisation
+}
+
+# Same token pattern as sklearn's vectorizers (the TF-IDF retriever this replaces), minus stopwords
+_TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# Arrays that make up a compacted index, as written to / read from a KB artifact
+BM25_ARRAYS = ("term_offsets", "posting_docs", "posting_tfs", "doc_lengths", "alive")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in ENGLISH_STOP_WORDS]
+
+
+def resolve_bm25_config(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    resolved = dict(DEFAULT_BM25_CONFIG)
+    resolved.update(config or {})
+    return resolved
+
+
+class BM25Index:
+    """Inverted index scored with Okapi BM25.
+
+    Postings live in two places: a compacted CSR-style block (``term_offsets`` into
+    ``posting_docs``/``posting_tfs``, possibly memory-mapped from an artifact) and a small
+    append-only delta of per-term lists for documents added since the last compaction.
+    Raw term frequencies are stored, so k1 and b can change without rebuilding.
+
+    Removed documents are tombstoned: they stop matching immediately and are dropped from
+    the collection statistics, but their postings remain until the index is rebuilt. The
+    document frequency used for idf counts live postings only, so it never exceeds num_docs.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = resolve_bm25_config(config)
+        self.k1 = float(config["k1"])
+        self.b = float(config["b"])
+        self.vocabulary = {} # term -> term id
+        self._term_offsets = np.zeros(1, dtype='int64')
+        self._posting_docs = np.zeros(0, dtype='int64')
+        self._posting_tfs = np.zeros(0, dtype='float32')
+        self._delta_docs = defaultdict(list) # term id -> doc ids added since the last compaction
+        self._delta_tfs = defaultdict(list)
+        self._delta_size = 0
+        self._doc_lengths = np.zeros(0, dtype='float32')
+        self._alive = np.zeros(0, dtype=bool)
+        self.num_docs = 0 # live documents
+        self._total_length = 0.0 # summed length of live documents
+        self._length_norm = None # k1 * (1 - b + b * len / avgdl) per document, rebuilt after changes
+
+    def __len__(self):
+        return self.num_docs
+
+    # --- Building ---
+
+    def add(self, doc_ids: Iterable[int], texts: Iterable[str]):
+        """Index new documents under the given ids (ids never reused; gaps become empty documents)"""
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return
+        size = max(doc_ids) + 1
+        if size > len(self._doc_lengths):
+            grow = size - len(self._doc_lengths)
+            self._doc_lengths = np.concatenate([self._doc_lengths, np.zeros(grow, dtype='float32')])
+            self._alive = np.concatenate([self._alive, np.zeros(grow, dtype=bool)])
+
+        for doc_id, text in zip(doc_ids, texts):
+            if self._alive[doc_id]:
+                raise ValueError(f"Document {doc_id} is already in the BM25 index.")
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                term_id = self.vocabulary.get(term)
+                if term_id is None:
+                    term_id = self.vocabulary[term] = len(self.vocabulary)
+                self._delta_docs[term_id].append(doc_id)
+                self._delta_tfs[term_id].append(tf)
+            self._delta_size += len(counts)
+            length = sum(counts.values())
+            self._doc_lengths[doc_id] = length
+            self._alive[doc_id] = True
+            self.num_docs += 1
+            self._total_length += length
+        self._length_norm = None
+
+        # Amortise the copy of the compacted block: only merge once the delta is sizeable
+        if self._delta_size > max(4096, len(self._posting_docs) // 8):
+            self.compact()
+
+    def remove(self, doc_ids: Iterable[int]):
+        """Tombstone documents; they are never returned again"""
+        for doc_id in doc_ids:
+            if 0 <= doc_id < len(self._alive) and self._alive[doc_id]:
+                self._alive[doc_id] = False
+                self.num_docs -= 1
+                self._total_length -= float(self._doc_lengths[doc_id])
+        self._length_norm = None
+
+    def compact(self):
+        """Merge the delta postings into the CSR block (postings sorted by doc id within each term)"""
+        if not self._delta_size:
+            return
+        self._term_offsets, self._posting_docs, self._posting_tfs = self._merged_postings()
+        self._delta_docs = defaultdict(list)
+        self._delta_tfs = defaultdict(list)
+        self._delta_size = 0
+
+    def _merged_postings(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(term_offsets, posting_docs, posting_tfs) of the CSR block and the delta merged; reads only"""
+        if not self._delta_size:
+            return self._term_offsets, self._posting_docs, self._posting_tfs
+        num_terms = len(self.vocabulary)
+        base_terms = np.repeat(np.arange(len(self._term_offsets) - 1, dtype='int64'), np.diff(self._term_offsets))
+        delta_terms = np.concatenate([np.full(len(docs), term_id, dtype='int64') for term_id, docs in self._delta_docs.items()])
+        delta_docs = np.concatenate([np.asarray(docs, dtype='int64') for docs in self._delta_docs.values()])
+        delta_tfs = np.concatenate([np.asarray(tfs, dtype='float32') for tfs in self._delta_tfs.values()])
+
+        terms = np.concatenate([base_terms, delta_terms])
+        docs = np.concatenate([np.asarray(self._posting_docs), delta_docs])
+        tfs = np.concatenate([np.asarray(self._posting_tfs), delta_tfs])
+        order = np.lexsort((docs, terms))
+        term_offsets = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=num_terms))]).astype('int64')
+        return term_offsets, docs[order], tfs[order]
+
+    # --- Querying ---
+
+    def _norms(self) -> np.ndarray:
+        if self._length_norm is None:
+            avgdl = self._total_length / self.num_docs if self.num_docs else 1.0
+            self._length_norm = (self.k1 * (1.0 - self.b + self.b * self._doc_lengths / max(avgdl, 1e-9))).astype('float32')
+        return self._length_norm
+
+    def _postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self._term_offsets[term_id:term_id + 2] if term_id < len(self._term_offsets) - 1 else (0, 0)
+        docs, tfs = self._posting_docs[start:end], self._posting_tfs[start:end]
+        if term_id in self._delta_docs:
+            docs = np.concatenate([docs, np.asarray(self._delta_docs[term_id], dtype='int64')])
+            tfs = np.concatenate([tfs, np.asarray(self._delta_tfs[term_id], dtype='float32')])
+        return docs, tfs
+
+    def search(self, query: str, k: int = 10, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (doc ids, BM25 scores), best first. Only documents sharing a term with the query
+        are touched; ``allowed`` optionally restricts scoring to those doc ids."""
+        term_ids = [self.vocabulary[term] for term in set(tokenize(query)) if term in self.vocabulary]
+        if not term_ids or k <= 0 or not self.num_docs:
+            return np.zeros(0, dtype='int64'), np.zeros(0, dtype='float32')
+
+        # Term-at-a-time: contributions of every posting of every query term, summed per document
+        norms = self._norms()
+        allowed_mask = None
+        if allowed is not None:
+            allowed_mask = np.zeros(len(self._doc_lengths), dtype=bool)
+            allowed_mask[np.asarray(allowed, dtype='int64')] = True
+        all_docs, all_scores = [], []
+        for term_id in term_ids:
+            docs, tfs = self._postings(term_id)
+            # Live documents only: tombstoned postings would push df past num_docs and idf below zero
+            df = int(np.count_nonzero(self._alive[docs]))
+            if allowed_mask is not None:
+                keep = allowed_mask[docs]
+                docs, tfs = docs[keep], tfs[keep]
+            idf = math.log(1.0 + (self.num_docs - df + 0.5) / (df + 0.5))
+            all_docs.append(docs)
+            all_scores.append(idf * tfs * (self.k1 + 1.0) / (tfs + norms[docs]))
+        docs = np.concatenate(all_docs)
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        live = self._alive[candidates]
+        candidates, scores = candidates[live], scores[live]
+
+        # Heap top-k over the candidates only; ties keep the lower doc id first
+        top = heapq.nlargest(k, zip(scores.tolist(), candidates.tolist()), key=itemgetter(0))
+        return (np.array([doc for _, doc in top], dtype='int64'),
+                np.array([score for score, _ in top], dtype='float32'))
+
+    def search_many(self, queries: List[str], k: int = 10) -> List[Tuple[np.ndarray, np.ndarray]]:
+        return [self.search(query, k) for query in queries]
+
+    # --- Persistence ---
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], List[str], Dict[str, Any]]:
+        """(arrays, vocabulary in term id order, stats) for writing to disk, with the delta merged
+        in. The index itself is not changed, so this is safe while other threads search it."""
+        term_offsets, posting_docs, posting_tfs = self._merged_postings()
+        arrays = {
+            "term_offsets": term_offsets,
+            "posting_docs": posting_docs,
+            "posting_tfs": posting_tfs,
+            "doc_lengths": self._doc_lengths,
+            "alive": self._alive,
+        }
+        vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+        stats = {"num_docs": self.num_docs, "total_length": self._total_length}
+        return arrays, vocabulary, stats
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], vocabulary: List[str], stats: Dict[str, Any],
+                    config: Optional[Dict[str, Any]] = None) -> "BM25Index":
+        """Restore an index; the posting arrays may be read-only memory maps, they are never written to"""
+        index = cls(config)
+        index.vocabulary = {term: term_id for term_id, term in enumerate(vocabulary)}
+        index._term_offsets = arrays["term_offsets"]
+        index._posting_docs = arrays["posting_docs"]
+        index._posting_tfs = arrays["posting_tfs"]
+        # Small per-document arrays are copied since add/remove update them in place
+        index._doc_lengths = np.array(arrays["doc_lengths"], dtype='float32')
+        index._alive = np.array(arrays["alive"], dtype=bool)
+        index.num_docs = int(stats["num_docs"])
+        index._total_length = float(stats["total_length"])
+        return index
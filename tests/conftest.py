@@ -0,0 +1,61 @@
+import os
+import re
+import sys
+import zlib
+import numpy as np
+import pytest
+
+# The modules live flat in the repository root (app.py imports them the same way)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class HashEncoder:
+    """Stand-in for a SentenceTransformer: deterministic hashed bag-of-words vectors, no download"""
+    max_seq_length = 256
+    tokenizer = None # chunking falls back to its word/punctuation splitter
+
+    def __init__(self, dimension=64):
+        self.dimension = dimension
+        self.calls = 0
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        self.calls += 1
+        vectors = np.zeros((len(texts), self.dimension), dtype='float32')
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                code = zlib.crc32(word.encode('utf-8'))
+                vectors[row, code % self.dimension] += 1.0 if (code >> 16) & 1 else -1.0
+        return vectors
+
+
+@pytest.fixture
+def hash_model():
+    from knowledge_base import HierarchicalEmbeddingModel
+    model = HierarchicalEmbeddingModel.__new__(HierarchicalEmbeddingModel)
+    model.model_name = "test-hash-encoder"
+    model.backend = "torch"
+    model.backend_options = {}
+    model.model = HashEncoder()
+    return model
+
+
+@pytest.fixture
+def make_kb(hash_model):
+    """Build a ProposalKnowledgeBase over a directory with the hash encoder and no artifact"""
+    from knowledge_base import ProposalKnowledgeBase
+
+    def make(kb_directory, **config):
+        config = {"use_artifact": False, "ingest_workers": 1, **config}
+        return ProposalKnowledgeBase(str(kb_directory), hash_model.model_name, config, model=hash_model)
+    return make
+
+
+def write_files(directory, files):
+    """Write {filename: text} into directory, removing files mapped to None"""
+    for filename, text in files.items():
+        path = os.path.join(str(directory), filename)
+        if text is None:
+            os.remove(path)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
@@ -0,0 +1,51 @@
+import pytest
+
+docx = pytest.importorskip("docx")
+from docx_extraction import iter_docx_blocks
+
+
+def build_document(path):
+    document = docx.Document()
+    document.add_heading("Executive Summary", level=1)
+    document.add_paragraph("We propose a phased migration.")
+    table = document.add_table(rows=3, cols=3)
+    for row, values in enumerate([("Item", "Qty", "Price"), ("Licences", "10", "AED 5,000"), ("Support", "1", "AED 2,000")]):
+        for column, value in enumerate(values):
+            table.cell(row, column).text = value
+    # Horizontal merge (one w:tc with gridSpan) and vertical merge (continuation cell left empty)
+    table.cell(0, 1).merge(table.cell(0, 2)).text = "Quantity and price"
+    table.cell(1, 0).merge(table.cell(2, 0)).text = "Services"
+    document.add_heading("Timeline", level=2)
+    outer = document.add_table(rows=1, cols=2)
+    outer.cell(0, 0).text = "Phase 1"
+    inner = outer.cell(0, 1).add_table(rows=1, cols=2)
+    inner.cell(0, 0).text = "Discovery"
+    inner.cell(0, 1).text = "4 weeks"
+    document.add_paragraph("Closing remarks \u2013 thank you.")
+    document.save(str(path))
+
+
+def test_blocks_come_out_in_document_order(tmp_path):
+    path = tmp_path / "proposal.docx"
+    build_document(path)
+    blocks = list(iter_docx_blocks(str(path)))
+
+    assert blocks[0] == "# Executive Summary"
+    assert blocks[1] == "We propose a phased migration."
+    assert blocks.index("## Timeline") < blocks.index("Closing remarks - thank you.")
+    assert blocks[-1] == "Closing remarks - thank you."
+
+
+def test_merged_cells_are_read_once(tmp_path):
+    path = tmp_path / "proposal.docx"
+    build_document(path)
+    blocks = list(iter_docx_blocks(str(path)))
+
+    table_rows = blocks[2:5]
+    assert table_rows == [
+        "Item | Quantity and price",
+        "Services | 10 | AED 5,000",
+        "1 | AED 2,000",
+    ]
+    # A table nested in a cell becomes lines of that cell
+    assert any(block.startswith("Phase 1 |") and "Discovery | 4 weeks" in block for block in blocks)
@@ -0,0 +1,76 @@
+import gc
+import pytest
+from conftest import write_files
+
+import kb_registry
+
+
+@pytest.fixture
+def registry(tmp_path, hash_model, monkeypatch):
+    """A clean registry whose models are the hash encoder, over a two-file KB"""
+    monkeypatch.setattr(kb_registry, "HierarchicalEmbeddingModel", lambda *args, **kwargs: hash_model)
+    for state in (kb_registry._knowledge_bases, kb_registry._models, kb_registry._idle_order, kb_registry._pending_releases):
+        state.clear()
+    write_files(tmp_path, {
+        "alpha.md": "# Scope of Work\nCloud migration of the finance platform with a phased cutover.\n",
+        "bravo.md": "# Pricing\nFixed fee of AED 120,000 covering discovery, build and hypercare support.\n",
+    })
+    yield kb_registry
+    for state in (kb_registry._knowledge_bases, kb_registry._models, kb_registry._idle_order, kb_registry._pending_releases):
+        state.clear()
+
+
+CONFIG = {"use_artifact": False, "ingest_workers": 1}
+
+
+def refcounts(registry):
+    return [entry["refcount"] for entry in registry.registry_stats()["knowledge_bases"]]
+
+
+def test_sessions_share_one_knowledge_base_and_an_idle_one_is_kept(tmp_path, registry):
+    first = registry.acquire_knowledge_base(str(tmp_path), "test-hash-encoder", CONFIG)
+    second = registry.acquire_knowledge_base(str(tmp_path), "test-hash-encoder", CONFIG)
+    assert first.kb is second.kb
+    assert refcounts(registry) == [2]
+
+    first.release()
+    first.release() # a lease is released at most once
+    second.release()
+    assert first.released and second.released
+    stats = registry.registry_stats()["knowledge_bases"]
+    assert [(entry["refcount"], entry["idle"]) for entry in stats] == [(0, True)]
+
+    # A page reload gets the idle knowledge base back instead of a rebuild
+    again = registry.acquire_knowledge_base(str(tmp_path), "test-hash-encoder", CONFIG)
+    assert again.kb is first.kb
+    assert registry.registry_stats()["knowledge_bases"][0]["idle"] is False
+
+
+def test_garbage_collected_lease_is_released(tmp_path, registry):
+    lease = registry.acquire_knowledge_base(str(tmp_path), "test-hash-encoder", CONFIG)
+    assert refcounts(registry) == [1]
+    del lease
+    gc.collect()
+    assert refcounts(registry) == [0]
+
+
+def test_release_while_the_registry_lock_is_held_is_queued_not_blocked(tmp_path, registry):
+    lease = registry.acquire_knowledge_base(str(tmp_path), "test-hash-encoder", CONFIG)
+    # As when the garbage collector runs a finalizer on a thread inside the registry
+    with registry._lock:
+        lease.release()
+        assert list(registry._pending_releases) == [lease.key]
+    assert refcounts(registry) == [0]
+    assert not registry._pending_releases
+
+
+def test_only_max_idle_knowledge_bases_are_kept(tmp_path, registry):
+    leases = [registry.acquire_knowledge_base(str(tmp_path), "test-hash-encoder", dict(CONFIG, chunk_tokens=tokens))
+              for tokens in (64, 128)]
+    for lease in leases:
+        lease.release()
+    stats = registry.registry_stats()["knowledge_bases"]
+    assert len(stats) == registry.MAX_IDLE_KNOWLEDGE_BASES == 1
+    assert stats[0]["refcount"] == 0
+    # The most recently released one survives
+    assert registry.knowledge_base_key(str(tmp_path), "test-hash-encoder", dict(CONFIG, chunk_tokens=128)) in registry._knowledge_bases
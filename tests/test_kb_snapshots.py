@@ -0,0 +1,57 @@
+import os
+import threading
+import pytest
+from conftest import write_files
+
+FILES = {
+    "alpha.md": "# Scope of Work\nCloud migration of the finance platform with a phased cutover.\n",
+    "bravo.md": "# Pricing\nFixed fee of AED 120,000 covering discovery, build and hypercare support.\n",
+}
+
+
+@pytest.fixture
+def holder(tmp_path, hash_model):
+    from kb_snapshots import KnowledgeBaseSnapshots
+    write_files(tmp_path, FILES)
+    return KnowledgeBaseSnapshots(str(tmp_path), hash_model.model_name, {"use_artifact": False, "ingest_workers": 1}, model=hash_model)
+
+
+def section_names(kb, query):
+    return [hit.document.section_name for hit in kb.hybrid_search(query, k=5)]
+
+
+def test_refresh_publishes_a_new_snapshot_and_leaves_the_old_one_intact(tmp_path, holder):
+    before = holder.snapshot()
+    write_files(tmp_path, {"charlie.md": "# Kanban Method\nKanban delivery with weekly demos and a shared backlog.\n"})
+
+    assert holder.refresh(wait=True)
+    after = holder.snapshot()
+    assert after is not before
+    assert holder.snapshot_id == 2 and holder.rebuild_status["state"] == "idle"
+    assert "Kanban Method" in section_names(holder, "kanban weekly demos")
+    # A search that started on the old snapshot still sees the old corpus
+    assert "Kanban Method" not in section_names(before, "kanban weekly demos")
+    assert sorted(before.file_hashes) == ["alpha.md", "bravo.md"]
+
+
+def test_mutating_methods_are_refused_on_the_holder(holder):
+    with pytest.raises(AttributeError):
+        holder.add_document("charlie.md")
+
+
+def test_build_artifact_never_locks_the_serving_snapshot(tmp_path, holder):
+    serving = holder.snapshot()
+    # Hold the serving snapshot's write lock: a build that needed any lock on it would hang
+    serving._rwlock.acquire_write()
+    result = {}
+    try:
+        worker = threading.Thread(target=lambda: result.update(build_dir=holder.build_artifact()))
+        worker.start()
+        worker.join(timeout=60)
+        assert not worker.is_alive()
+    finally:
+        serving._rwlock.release_write()
+
+    assert os.path.isfile(os.path.join(result["build_dir"], "manifest.json"))
+    assert holder.snapshot() is not serving
+    assert holder.rebuild_status["build_dir"] == result["build_dir"]
@@ -0,0 +1,88 @@
+import numpy as np
+from conftest import write_files
+
+BOILERPLATE = ("Our company has delivered digital transformation programmes for government and enterprise "
+               "clients across the region for over fifteen years with certified delivery teams and local support")
+
+KANBAN = ("Kanban delivery with weekly demos, a product owner from the client, a shared backlog, "
+          "work in progress limits per stage and a monthly steering committee with the sponsor")
+
+INITIAL = {
+    "alpha.md": f"# Company Profile\n{BOILERPLATE}\n# Scope of Work\nCloud migration of the finance platform with a phased cutover.\n",
+    "bravo.md": "# Pricing\nFixed fee of AED 120,000 covering discovery, build and hypercare support.\n",
+    "charlie.md": "# Approach\nAgile delivery in two week sprints with a product owner from the client.\n",
+    "echo.md": f"# About Us\n{BOILERPLATE} and managed services\n# Team\nA solution architect, two engineers and a tester.\n",
+}
+# alpha goes (its boilerplate section is promoted to echo's copy), charlie changes, delta
+# arrives with a copy of charlie's new section and nothing else
+CHANGES = {
+    "alpha.md": None,
+    "charlie.md": f"# Approach\n{KANBAN}\n",
+    "delta.md": f"# Method\n{KANBAN}\n",
+}
+QUERIES = ["cloud migration cutover", "kanban weekly demos backlog", "company profile digital transformation",
+           "fixed fee pricing", "solution architect engineers"]
+
+
+def proposal_vectors_by_file(kb):
+    return {filename: kb.proposal_index.reconstruct(proposal_id) for filename, proposal_id in kb._proposal_ids.items()}
+
+
+def search_view(kb, **kwargs):
+    """Hits per query as (filename, section, relevance). Section and chunk ids differ between an
+    updated KB and a rebuild, and ties are ranked by id, so the order within ties is ignored."""
+    return [sorted((hit.document.filename, hit.document.section_name, round(hit.relevance, 5)) for hit in kb.hybrid_search(query, k=4, **kwargs))
+            for query in QUERIES]
+
+
+def test_document_vectors_after_sync_match_a_rebuild(tmp_path, make_kb):
+    write_files(tmp_path, INITIAL)
+    kb = make_kb(tmp_path, search_mode="two_stage", two_stage_documents=2)
+    write_files(tmp_path, CHANGES)
+    kb.sync_directory()
+    rebuilt = make_kb(tmp_path, search_mode="two_stage", two_stage_documents=2)
+
+    synced, expected = proposal_vectors_by_file(kb), proposal_vectors_by_file(rebuilt)
+    assert sorted(synced) == sorted(expected) == ["bravo.md", "charlie.md", "delta.md", "echo.md"]
+    for filename, vector in expected.items():
+        assert np.allclose(synced[filename], vector, atol=1e-6), filename
+    assert search_view(kb) == search_view(rebuilt)
+
+
+def test_sync_matches_a_rebuild(tmp_path, make_kb):
+    write_files(tmp_path, INITIAL)
+    kb = make_kb(tmp_path)
+    write_files(tmp_path, CHANGES)
+    changes = kb.sync_directory()
+    assert changes == {"added": ["delta.md"], "updated": ["charlie.md"], "removed": ["alpha.md"]}
+    rebuilt = make_kb(tmp_path)
+
+    assert search_view(kb) == search_view(rebuilt)
+    assert kb.file_hashes == rebuilt.file_hashes
+    assert sorted(kb.section_map) == sorted(rebuilt.section_map)
+    # A second sync with nothing changed on disk touches nothing
+    assert kb.sync_directory() == {"added": [], "updated": [], "removed": []}
+
+
+def test_sync_writes_the_embedding_cache_once(tmp_path, make_kb, monkeypatch):
+    from embedding_cache import EmbeddingCache
+    write_files(tmp_path, INITIAL)
+    kb = make_kb(tmp_path)
+    writes = []
+    save = EmbeddingCache.save
+
+    def counting_save(cache):
+        dirty = cache._dirty
+        save(cache)
+        if dirty:
+            writes.append(cache.path)
+    monkeypatch.setattr(EmbeddingCache, "save", counting_save)
+
+    write_files(tmp_path, {**CHANGES, "foxtrot.md": "# Risks\nData migration risks are mitigated with rehearsals and rollback plans.\n"})
+    kb.sync_directory()
+    assert len(writes) == 1
+
+    # Outside a batch every add still persists its new embeddings
+    write_files(tmp_path, {"golf.md": "# Warranty\nTwelve months of warranty support after go-live.\n"})
+    kb.add_document("golf.md")
+    assert len(writes) == 2
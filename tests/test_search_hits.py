@@ -0,0 +1,37 @@
+import json
+import pytest
+from search_hits import SearchHit, DocumentView
+
+
+def make_hit(**kwargs):
+    document = {"id": 7, "filename": "alpha.md", "section_name": "Pricing", "content": "Fixed fee.",
+                "metadata": {"client_industry": "finance", "key_differentiators": ["quality"]}}
+    return document, SearchHit(0.5, DocumentView(document), **kwargs)
+
+
+def test_hits_are_read_only_views_of_the_stored_section():
+    stored, hit = make_hit()
+    assert hit.document.content is stored["content"]
+    with pytest.raises(AttributeError):
+        hit.score = 1.0
+    with pytest.raises(AttributeError):
+        hit.document.content = "changed"
+    with pytest.raises(TypeError):
+        hit.document.metadata["client_industry"] = "retail"
+    assert stored["metadata"]["client_industry"] == "finance"
+
+
+def test_dict_style_access_and_export():
+    stored, hit = make_hit(relevance=0.72)
+    assert hit["score"] == hit.get("score", 0) == 0.5
+    assert hit["relevance"] == 0.72
+    assert hit["document"]["section_name"] == "Pricing"
+    assert "retrieval_score" not in hit and hit.get("retrieval_score") is None
+
+    rescored = hit.rescored(0.9)
+    assert (rescored.score, rescored.retrieval_score, rescored.relevance) == (0.9, 0.5, 0.72)
+
+    exported = rescored.to_dict()
+    exported["document"]["metadata"]["client_industry"] = "retail" # a copy, not the stored dict
+    assert stored["metadata"]["client_industry"] == "finance"
+    assert json.loads(json.dumps(exported))["document"]["filename"] == "alpha.md"
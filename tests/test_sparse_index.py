@@ -0,0 +1,55 @@
+import numpy as np
+from sparse_index import BM25Index
+
+TEXTS = {
+    0: "cloud migration scope and timeline for the migration",
+    1: "pricing schedule with optional support package",
+    2: "security assessment and penetration testing",
+    3: "cloud security posture review",
+    4: "migration runbook and cloud cutover plan",
+    5: "support desk staffing and pricing",
+}
+QUERIES = ["cloud migration", "pricing support", "security", "cutover plan runbook"]
+
+
+def scores_by_doc(index, query):
+    docs, scores = index.search(query, k=len(TEXTS) + 5)
+    return dict(zip(docs.tolist(), scores.tolist()))
+
+
+def assert_same_scores(index, fresh):
+    for query in QUERIES:
+        got, expected = scores_by_doc(index, query), scores_by_doc(fresh, query)
+        assert got.keys() == expected.keys(), query
+        for doc_id, score in expected.items():
+            assert np.isclose(got[doc_id], score, rtol=1e-5), (query, doc_id)
+
+
+def test_idf_after_remove_add_compact_matches_fresh_build():
+    index = BM25Index()
+    index.add([0, 1, 2, 3], [TEXTS[i] for i in (0, 1, 2, 3)])
+    index.compact()
+    index.remove([0, 3])
+    index.add([4, 5], [TEXTS[4], TEXTS[5]]) # stays in the delta until compacted
+
+    fresh = BM25Index()
+    fresh.add([1, 2, 4, 5], [TEXTS[i] for i in (1, 2, 4, 5)])
+
+    assert index.num_docs == fresh.num_docs == 4
+    assert_same_scores(index, fresh)
+    index.compact()
+    assert_same_scores(index, fresh)
+
+    arrays, vocabulary, stats = index.to_arrays()
+    assert_same_scores(BM25Index.from_arrays(arrays, vocabulary, stats), fresh)
+
+
+def test_removed_documents_never_match_and_scores_stay_positive():
+    index = BM25Index()
+    index.add(range(len(TEXTS)), [TEXTS[i] for i in range(len(TEXTS))])
+    index.compact()
+    # Every "cloud" document but one removed: tombstoned postings must not count towards df
+    index.remove([0, 3])
+    docs, scores = index.search("cloud", k=10)
+    assert docs.tolist() == [4]
+    assert (scores > 0).all()
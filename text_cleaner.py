@@ -0,0 +1,81 @@
+from typing import List, Any
+
+# Engine behind utils.remove_problematic_chars. The old cleaner made eleven str.replace
+# passes, a latin-1 encode/decode round trip and a regex substitution; their combined effect:
+#   - typographic characters are spelled out in ASCII (dashes, quotes, ellipsis, TM, ...)
+#   - printable ASCII, newline, carriage return, tab and the non-breaking space are kept
+#   - everything else (control characters, other non-ASCII) is dropped
+# Every step now runs in C:
+#   - ASCII text (most KB sections) is encoded to ASCII and the unwanted control bytes are
+#     deleted with bytes.translate; when nothing was deleted the input is not decoded again.
+#   - Other text (bilingual RFPs are full of Arabic) gets str.replace only for typographic
+#     characters it actually contains, then a latin-1 encode that drops everything outside
+#     latin-1 and one bytes.translate that deletes the unwanted bytes. The cost does not
+#     depend on how much of the text is non-ASCII (see benchmarks/text_cleaner.py).
+#
+# Cleaned strings come back as CleanText, a str subclass that marks them as clean. Text
+# is cleaned where it enters the system (KB ingest, RFP extraction, LLM responses) and
+# cleaning a CleanText again returns it as is, so passing a section through search,
+# generation and export no longer re-scans it at every step. Anything built from a
+# CleanText (slices, f-strings, joins) is a plain str again and gets cleaned normally.
+# Wrapping is a copy (a str subclass cannot adopt an existing str), also on the ASCII fast
+# path: about a quarter of the cost of cleaning a typical section, and less than one rescan
+# it saves later (benchmarks/text_cleaner.py prints the share).
+REPLACEMENTS = {
+    '\u2013': '-',     # En dash
+    '\u2014': '-',     # Em dash
+    '\u2018': "'",     # Left single quote
+    '\u2019': "'",     # Right single quote (apostrophe)
+    '\u201c': '"',     # Left double quote
+    '\u201d': '"',     # Right double quote
+    '\u2026': '...',   # Ellipsis
+    '\u2022': '*',     # Bullet point
+    '\u2122': '(TM)',  # Trade Mark symbol
+    '\u00AE': '(R)',   # Registered symbol
+    '\u00A9': '(C)',   # Copyright symbol
+}
+
+_KEPT = set(range(0x20, 0x7F)) | {ord('\n'), ord('\r'), ord('\t'), 0xA0}
+_REPLACEMENT_ITEMS = tuple(REPLACEMENTS.items())
+
+# ASCII and latin-1 characters the cleaner drops
+_DELETED_BYTES = bytes(code_point for code_point in range(0x80) if code_point not in _KEPT)
+_DELETED_LATIN1_BYTES = bytes(code_point for code_point in range(0x100) if code_point not in _KEPT)
+
+
+class CleanText(str):
+    """A str that has been through clean_text (or is a slice/join of such strings)"""
+    __slots__ = ()
+
+
+def mark_clean(text: str) -> CleanText:
+    """Mark text built only from cleaned strings (a slice, a join) as clean without scanning it"""
+    return text if isinstance(text, CleanText) else CleanText(text)
+
+
+def is_clean(text) -> bool:
+    return isinstance(text, CleanText)
+
+
+def clean_text(text):
+    """Removes characters that might cause encoding or display issues (see module comment).
+
+    Returns a CleanText; non-strings are returned unchanged, and so is text already marked clean.
+    """
+    if not isinstance(text, str):
+        return text # Return as is if not a string
+    if isinstance(text, CleanText):
+        return text # Cleaned before: no second pass
+    if text.isascii():
+        cleaned = text.encode('ascii').translate(None, _DELETED_BYTES)
+        # ASCII can only lose characters, so the same length means nothing changed
+        return CleanText(text if len(cleaned) == len(text) else cleaned.decode('ascii'))
+    for char, replacement in _REPLACEMENT_ITEMS:
+        if char in text:
+            text = text.replace(char, replacement)
+    return CleanText(text.encode('latin-1', errors='ignore').translate(None, _DELETED_LATIN1_BYTES).decode('latin-1'))
+
+
+def clean_texts(texts: List[Any]) -> List[Any]:
+    """clean_text over a list of strings (non-strings pass through); a convenience, not a faster path"""
+    return [clean_text(text) for text in texts]
@@ -8,61 +8,24 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 import streamlit as st # For st.error in PDF export if fpdf is missing
 # Conditional import for fpdf will be handled within the export_to_pdf function
 import unicodedata
+from text_cleaner import clean_text, clean_texts
 
 
 
-# Helper function to remove problematic Unicode characters
+# Helper functions to remove problematic Unicode characters; the cleaning itself is one
+# pass over the text in text_cleaner.py (benchmarks/text_cleaner.py checks it against the
+# old chained-replace version)
 def remove_problematic_chars(text):
     """Removes characters that might cause encoding or display issues,
        especially those outside common encodings like latin-1, by replacing
-       common problematic characters and filtering others."""
-    if not isinstance(text, str):
-        return text # Return as is if not a string
-
-    # Replace common problematic characters with safe alternatives
-    cleaned_text = text.replace('\u2013', '-') # En dash
-    cleaned_text = cleaned_text.replace('\u2014', '-') # Em dash
-    cleaned_text = cleaned_text.replace('\u2018', "'") # Left single quote
-    cleaned_text = cleaned_text.replace('\u2019', "'") # Right single quote (apostrophe)
-    cleaned_text = cleaned_text.replace('\u201c', '"') # Left double quote
-    cleaned_text = cleaned_text.replace('\u201d', '"') # Right double quote
-    cleaned_text = cleaned_text.replace('\u2026', '...') # Ellipsis
-    cleaned_text = cleaned_text.replace('\u2022', '*') # Bullet point
-    cleaned_text = cleaned_text.replace('\u2122', '(TM)') # Trade Mark symbol
-    cleaned_text = cleaned_text.replace('\u00AE', '(R)') # Registered symbol
-    cleaned_text = cleaned_text.replace('\u00A9', '(C)') # Copyright symbol
-
-
-    # Attempt standard encode/decode with 'ignore' errors for characters still problematic
-    # This is a fallback and might lose some characters not explicitly handled above
-    try:
-        # Try encoding to latin-1 and then decoding. Characters not in latin-1 will be ignored.
-        cleaned_text = cleaned_text.encode('latin-1', errors='ignore').decode('latin-1')
-    except UnicodeEncodeError:
-        # If latin-1 encoding still fails unexpectedly, try a more aggressive UTF-8 encode/decode with replace
-        cleaned_text = cleaned_text.encode('utf-8', errors='replace').decode('utf-8')
-    except Exception as e:
-        # Catch any other potential encoding errors during this step
-        print(f"Warning: Error during initial encoding cleanup: {e}. Proceeding with filtering.")
-
+       common problematic characters and filtering others.
+       Returns a text_cleaner.CleanText, which later calls return unchanged."""
+    return clean_text(text)
 
-    # Further filter potentially problematic Unicode characters using a stricter regex
-    # This regex aims to keep printable ASCII, common whitespace, and a limited set of safe Unicode.
-    # It removes control characters, surrogates, and many other non-ASCII characters.
-    # Keeping only printable ASCII and basic whitespace:
-    # \x20-\x7E : Printable ASCII characters (space to tilde)
-    # \n\r\t : Newline, carriage return, tab
-    # \u00A0 : Non-breaking space (often useful)
-    # \u20AC : Euro sign (common) - can add others if needed
-    # This regex is stricter than the previous one to avoid latin-1 issues.
-    # Adjust the regex based on what characters are expected/allowed in the output documents.
-    # Current regex keeps printable ASCII, newline, carriage return, tab, and non-breaking space.
-    problematic_chars_regex = re.compile(r'[^\x20-\x7E\n\r\t\u00A0]')
 
-
-    filtered_text = problematic_chars_regex.sub('', cleaned_text)
-
-    return filtered_text
+def remove_problematic_chars_many(texts):
+    """remove_problematic_chars for a list of strings"""
+    return clean_texts(texts)
 
 
 # Load configuration
@@ -87,7 +50,28 @@ def load_config():
         "knowledge_base": {
             "directory": "markdown_responses",
             "embedding_model": "all-MiniLM-L6-v2",
-            "metadata_fields": ["client_industry", "proposal_success", "project_size", "key_differentiators"]
+            "embedding_backend": "torch", # torch | torch-int8 | onnx | onnx-int8, see embedding_backends.py
+            "embedding_cache": True,
+            "use_artifact": True,
+            "index": {"backend": "flat"}, # flat | ivf | hnsw | ivfpq, see vector_index.py
+            "chunk_tokens": 256,
+            "chunk_overlap": 32,
+            "fusion": {"mode": "rrf", "rrf_k": 60, "dense_weight": 0.5}, # rrf | weighted, see fusion.py
+            "bm25": {"k1": 1.2, "b": 0.75}, # sparse retriever, see sparse_index.py
+            "ingest_workers": None, # max processes for load_documents (None = one per core, 1 = serial); small KBs always load serially
+            "search_mode": "hybrid", # hybrid | two_stage (closest proposals first, then their sections)
+            "two_stage_documents": 5,
+            "reranker": {"enabled": False, "model": "cross-encoder/ms-marco-MiniLM-L-6-v2", "candidates": 20, "budget_ms": 250}, # see reranker.py
+            "query_cache": {"max_entries": 1024, "ttl_seconds": 3600}, # LRU caches for query embeddings and search results
+            "near_duplicates": {"enabled": True, "threshold": 0.85}, # boilerplate sections indexed once, see near_duplicates.py
+            "section_names": {"similarity": 0.8}, # header variants grouped by trigram similarity, see section_names.py
+            "rebuild_mode": "thread", # thread | process: where refresh() re-embeds the corpus, see kb_snapshots.py
+            "client_industries": {}, # client name -> industry; overrides the keyword guess in metadata_store.py
+            "metadata_fields": ["client", "project", "client_industry", "service_line", "year", "proposal_success", "project_size", "key_differentiators"]
+        },
+        "document_processing": {
+            "extraction_cache_mb": 256, # text of uploaded documents by content hash, see extraction_cache.py
+            "pdf": {"backend": "pypdfium2", "workers": None} # pypdfium2 | pdfminer | pypdf2, see pdf_extraction.py
         },
         "proposal_settings": {
             "default_sections": [],
@@ -214,7 +198,8 @@ def export_to_word(proposal_data, company_name, client_name, output_path, compan
         cleaned_section_name = remove_problematic_chars(section_name)
         doc.add_heading(cleaned_section_name, 1)
 
-        # Ensure section_content is cleaned before processing lines
+        # Ensure section_content is cleaned before processing lines; the lines, headings,
+        # list items and table cells below are pieces of it and need no second pass
         cleaned_section_content = remove_problematic_chars(section_content)
         lines = cleaned_section_content.split('\n')
         i = 0
@@ -222,20 +207,15 @@ def export_to_word(proposal_data, company_name, client_name, output_path, compan
             line = lines[i].strip()
 
             if line.startswith('### '):
-                # Ensure heading text is cleaned
-                doc.add_heading(remove_problematic_chars(line[4:].strip()), 3)
+                doc.add_heading(line[4:].strip(), 3)
             elif line.startswith('## '):
-                # Ensure heading text is cleaned
-                doc.add_heading(remove_problematic_chars(line[3:].strip()), 2)
+                doc.add_heading(line[3:].strip(), 2)
             elif line.startswith('# '):
-                # Ensure heading text is cleaned
-                doc.add_heading(remove_problematic_chars(line[2:].strip()), 1)
+                doc.add_heading(line[2:].strip(), 1)
             elif line.startswith('- ') or line.startswith('* '):
-                # Ensure list item text is cleaned
-                p = doc.add_paragraph(remove_problematic_chars(line[2:]), style='List Bullet')
+                p = doc.add_paragraph(line[2:], style='List Bullet')
             elif re.match(r'^\d+\.\s', line):
-                # Ensure list item text is cleaned
-                p = doc.add_paragraph(remove_problematic_chars(re.sub(r'^\d+\.\s', '', line)), style='List Number')
+                p = doc.add_paragraph(re.sub(r'^\d+\.\s', '', line), style='List Number')
             elif line.startswith('|') and i+1 < len(lines) and '|--' in lines[i+1]:
                 # Basic table parsing
                 table_rows = []
@@ -246,7 +226,7 @@ def export_to_word(proposal_data, company_name, client_name, output_path, compan
                     i += 1
                 if len(table_rows) > 1: # Need at least header and one data row (or just header if parsing allows)
                     # Assuming header is the first row and separator is the second
-                    header_cells = [remove_problematic_chars(cell.strip()) for cell in table_rows[0].split('|')[1:-1]] # Clean header cells
+                    header_cells = [cell.strip() for cell in table_rows[0].split('|')[1:-1]]
                     num_cols = len(header_cells)
                     if num_cols > 0:
                         # Count data rows (excluding header and separator)
@@ -263,7 +243,7 @@ def export_to_word(proposal_data, company_name, client_name, output_path, compan
 
                              # Add data rows
                              for row_idx, row_text in enumerate(data_rows):
-                                 cells = [remove_problematic_chars(cell.strip()) for cell in row_text.split('|')[1:-1]] # Clean data cells
+                                 cells = [cell.strip() for cell in row_text.split('|')[1:-1]]
                                  for j, cell_text in enumerate(cells):
                                      if j < num_cols: # Ensure we don't go out of bounds
                                          table.cell(row_idx+1, j).text = cell_text # Data cells are already cleaned
@@ -276,8 +256,7 @@ def export_to_word(proposal_data, company_name, client_name, output_path, compan
 
                 i -= 1 # Decrement i because the while loop incremented it past the table
             elif line:
-                # Ensure paragraph text is cleaned
-                p = doc.add_paragraph(remove_problematic_chars(line))
+                p = doc.add_paragraph(line)
             i += 1
 
         if section_name != list(proposal_data["sections"].keys())[-1]:
@@ -335,8 +314,8 @@ def export_to_pdf(proposal_data, company_name, client_name, output_path, company
          # Estimate pages for the next section - a rough estimate
          # This is highly dependent on font size, line height, page margins, etc.
          # A more accurate method would involve rendering the content and counting pages.
-         # Ensure content used for estimation is cleaned
-         content = remove_problematic_chars(proposal_data["sections"][section_name])
+         # Only lines are counted here, and cleaning never removes a newline
+         content = proposal_data["sections"][section_name]
          lines_per_page_estimate = 40 # Rough estimate
          estimated_lines = len(content.split('\n'))
          estimated_pages = max(1, estimated_lines // lines_per_page_estimate)
@@ -359,9 +338,8 @@ def export_to_pdf(proposal_data, company_name, client_name, output_path, company
         for line in lines:
             # Handle basic markdown like bold/italic if needed, fpdf requires specific commands
             # For simplicity here, just print lines. More complex formatting requires parsing markdown.
-            # Ensure line is cleaned before printing
-            cleaned_line = remove_problematic_chars(line)
-            cleaned_line = re.sub(r'[\*_`]', '', cleaned_line) # Remove basic markdown chars
+            # The line is part of cleaned_content, so it is clean already
+            cleaned_line = re.sub(r'[\*_`]', '', line) # Remove basic markdown chars
             if cleaned_line.strip(): # Avoid adding empty lines
                  pdf.multi_cell(0, 6, txt=cleaned_line, border=0)
                  pdf.ln(1) # Reduced line break between paragraphs
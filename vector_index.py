@@ -0,0 +1,152 @@
+import math
+import numpy as np
+import faiss
+from typing import Dict, Any, Optional
+
+# Backends selectable through config.json -> knowledge_base -> index -> backend
+INDEX_BACKENDS = ("flat", "ivf", "hnsw", "ivfpq")
+
+DEFAULT_INDEX_CONFIG = {
+    "backend": "flat",
+    "nlist": 256,          # IVF: number of coarse clusters (capped by corpus size)
+    "nprobe": 16,          # IVF: clusters visited per query
+    "hnsw_m": 32,          # HNSW: graph degree
+    "ef_construction": 80, # HNSW: build-time beam width
+    "ef_search": 64,       # HNSW: query-time beam width
+    "pq_m": 16,            # IVF-PQ: sub-quantizers (must divide the embedding dimension)
+    "pq_bits": 8,          # IVF-PQ: bits per sub-quantizer code
+}
+
+# Keys that change how the index is built; the rest (nprobe, ef_search) only affect queries
+INDEX_BUILD_KEYS = ("backend", "nlist", "hnsw_m", "ef_construction", "pq_m", "pq_bits")
+
+# Below this many training points per IVF cluster k-means gives poor centroids
+MIN_POINTS_PER_CENTROID = 39
+
+
+def resolve_index_config(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge a user supplied index block over the defaults and validate the backend"""
+    resolved = dict(DEFAULT_INDEX_CONFIG)
+    resolved.update(config or {})
+    if resolved["backend"] not in INDEX_BACKENDS:
+        print(f"Unknown index backend '{resolved['backend']}'. Falling back to 'flat'. Choose one of {', '.join(INDEX_BACKENDS)}.")
+        resolved["backend"] = "flat"
+    return resolved
+
+
+def index_build_signature(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The part of an index config that a prebuilt artifact must match"""
+    config = resolve_index_config(config)
+    return {key: config[key] for key in INDEX_BUILD_KEYS}
+
+
+def _effective_nlist(requested: int, num_vectors: int) -> int:
+    """Cap nlist so every cluster gets enough training points"""
+    return max(1, min(int(requested), num_vectors // MIN_POINTS_PER_CENTROID, int(4 * math.sqrt(num_vectors))))
+
+
+def create_vector_index(dimension: int, config: Optional[Dict[str, Any]] = None,
+                        training_vectors: Optional[np.ndarray] = None,
+                        metric: int = faiss.METRIC_L2) -> faiss.Index:
+    """Create an empty, trained FAISS index that accepts add_with_ids for the configured backend.
+
+    IVF variants are trained on ``training_vectors``; when there are too few of them to
+    train meaningful clusters the corpus is small enough that a flat index is used instead.
+    """
+    config = resolve_index_config(config)
+    backend = config["backend"]
+    num_vectors = 0 if training_vectors is None else len(training_vectors)
+
+    if backend in ("ivf", "ivfpq"):
+        nlist = _effective_nlist(config["nlist"], num_vectors)
+        if nlist < 2:
+            print(f"Only {num_vectors} vectors available; using a flat index instead of '{backend}'.")
+            backend = "flat"
+        elif backend == "ivfpq" and (dimension % int(config["pq_m"]) != 0 or num_vectors < 2 ** int(config["pq_bits"]) * MIN_POINTS_PER_CENTROID):
+            print(f"IVF-PQ needs pq_m to divide {dimension} and at least {2 ** int(config['pq_bits']) * MIN_POINTS_PER_CENTROID} vectors; using plain IVF.")
+            backend = "ivf"
+
+    if backend == "flat":
+        index = faiss.IndexIDMap2(faiss.IndexFlat(dimension, metric))
+    elif backend == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dimension, int(config["hnsw_m"]), metric)
+        hnsw.hnsw.efConstruction = int(config["ef_construction"])
+        index = faiss.IndexIDMap2(hnsw)
+    else:
+        quantizer = faiss.IndexFlat(dimension, metric)
+        if backend == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, metric)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, int(config["pq_m"]), int(config["pq_bits"]), metric)
+        index.train(np.ascontiguousarray(training_vectors, dtype='float32'))
+
+    configure_search(index, config)
+    return index
+
+
+def _inner_index(index: faiss.Index) -> faiss.Index:
+    """The index doing the actual search, looking through an IndexIDMap wrapper"""
+    if isinstance(index, faiss.IndexIDMap) or isinstance(index, faiss.IndexIDMap2):
+        return faiss.downcast_index(index.index)
+    return faiss.downcast_index(index)
+
+
+def configure_search(index: faiss.Index, config: Optional[Dict[str, Any]] = None):
+    """Apply query-time parameters (nprobe, efSearch) to an index, e.g. one read from disk"""
+    config = resolve_index_config(config)
+    params = faiss.ParameterSpace()
+    inner = _inner_index(index)
+    if isinstance(inner, faiss.IndexIVF):
+        params.set_index_parameter(index, "nprobe", int(config["nprobe"]))
+    elif isinstance(inner, faiss.IndexHNSW):
+        params.set_index_parameter(index, "efSearch", int(config["ef_search"]))
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    """HNSW graphs cannot delete vectors; their removed ids must be filtered at query time"""
+    return not isinstance(_inner_index(index), faiss.IndexHNSW)
+
+
+def describe_index(index: faiss.Index) -> str:
+    return f"{type(_inner_index(index)).__name__}(ntotal={index.ntotal}, d={index.d})"
+
+
+def search_subset(index: faiss.Index, queries: np.ndarray, candidate_ids: np.ndarray, k: int,
+                  config: Optional[Dict[str, Any]] = None):
+    """Like index.search, but only among ``candidate_ids``; returns (distances, ids) padded with -1.
+
+    Flat and HNSW indexes behind an IndexIDMap2 store full vectors, so the candidates are
+    reconstructed and scored exactly: the cost is proportional to the number of candidates
+    and HNSW's graph walk cannot miss them. Other backends search with an ID selector.
+    """
+    queries = np.ascontiguousarray(queries, dtype='float32')
+    candidate_ids = np.ascontiguousarray(candidate_ids, dtype='int64')
+    distances = np.full((len(queries), k), -np.inf if index.metric_type == faiss.METRIC_INNER_PRODUCT else np.inf, dtype='float32')
+    labels = np.full((len(queries), k), -1, dtype='int64')
+    if len(candidate_ids) == 0 or k <= 0:
+        return distances, labels
+
+    inner = _inner_index(index)
+    if isinstance(index, faiss.IndexIDMap2) and isinstance(inner, (faiss.IndexFlat, faiss.IndexHNSW)):
+        vectors = index.reconstruct_batch(candidate_ids)
+        if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            scores = queries @ vectors.T # higher is better
+        else:
+            scores = -((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+        top = min(k, len(candidate_ids))
+        for qi in range(len(queries)):
+            best = np.argpartition(-scores[qi], top - 1)[:top]
+            best = best[np.argsort(-scores[qi][best], kind='stable')]
+            labels[qi, :top] = candidate_ids[best]
+            distances[qi, :top] = scores[qi][best] if index.metric_type == faiss.METRIC_INNER_PRODUCT else -scores[qi][best]
+        return distances, labels
+
+    config = resolve_index_config(config)
+    selector = faiss.IDSelectorBatch(candidate_ids)
+    if isinstance(inner, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=int(config["nprobe"]))
+    elif isinstance(inner, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=max(int(config["ef_search"]), k))
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    return index.search(queries, k, params=params)